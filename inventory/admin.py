@@ -1,20 +1,74 @@
 from django.contrib import admin
-from .models import EntraUser, Asset, Assignment
+from django.db.models import Q
+from .models import EntraUser, Asset, Assignment, ChangeLogEntry, Job
+from . import jobs, search
+
+# Admin search through the full-text index (see search.py) instead of
+# LIKE '%term%' scans over search_fields. search_related maps foreign keys
+# to the indexed model they point to, to also match on related objects.
+class IndexedSearchMixin:
+    search_related = {}
+
+    # Best matches kept per indexed model
+    search_limit = 5000
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+
+        condition = Q(pk__in=search.matching_ids(self.model, search_term, self.search_limit))
+        for field, model in self.search_related.items():
+            condition |= Q(**{f'{field}__in': search.matching_ids(model, search_term, self.search_limit)})
+
+        return queryset.filter(condition), False
 
 @admin.register(EntraUser)
-class EntraUserAdmin(admin.ModelAdmin):
+class EntraUserAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('display_name', 'upn', 'department', 'is_active', 'deleted_at')
     search_fields = ('display_name', 'upn')
     list_filter = ('is_active', 'department', 'deleted_at')
 
 @admin.register(Asset)
-class AssetAdmin(admin.ModelAdmin):
+class AssetAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'serial_number', 'category', 'status', 'location')
     search_fields = ('name', 'serial_number', 'brand', 'model')
     list_filter = ('status', 'category', 'brand')
 
 @admin.register(Assignment)
-class AssignmentAdmin(admin.ModelAdmin):
+class AssignmentAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('asset', 'entra_user', 'assigned_date', 'returned_date')
     search_fields = ('asset__name', 'entra_user__display_name', 'entra_user__upn', 'location')
+    search_related = {'asset': Asset, 'entra_user': EntraUser}
     list_filter = ('returned_date', 'location', 'assignment_reason')
+
+# Read-only: the change log is append-only
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'seq', 'created_at', 'action', 'kind', 'object_id')
+    list_filter = ('action', 'kind')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+# Background jobs are queued by the app and run by the run_jobs worker
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'done', 'total', 'attempts', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = [field.name for field in Job._meta.fields]
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Retry the selected failed jobs")
+    def retry_jobs(self, request, queryset):
+        retried = sum(jobs.retry(job) for job in queryset)
+        self.message_user(request, f"Queued {retried} failed job(s) again.")
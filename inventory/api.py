@@ -0,0 +1,462 @@
+import base64
+import datetime
+import hashlib
+import json
+
+from django import forms
+from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.forms.models import model_to_dict
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+
+from . import changelog, invalidation
+from .filters import filter_assets, filter_assignments, filter_users
+from .forms import AssetForm, AssignmentEditForm, AssignmentForm
+from .models import Asset, Assignment, ChangeLogEntry, EntraUser, OSOption
+from .pagination import paginate_keyset
+
+# JSON API for integrations (MDM, helpdesk): /api/<resource>/ and
+# /api/<resource>/<id>/.
+#
+# - GET list: objects in id order, one keyset page at a time (?limit=,
+#   the "next" URL carries the cursor), filtered with the same GET
+#   parameters as the list pages (see filters.py)
+# - ?fields=a,b: only those fields are loaded (.only()) and returned
+# - GET responses carry a strong ETag and Last-Modified derived from the
+#   data versions of invalidation.py, so a conditional request
+#   (If-None-Match / If-Modified-Since) for unchanged data is answered with
+#   304 Not Modified from the cache, without querying the tables
+# - POST list: creates one object or an array of them; PATCH list: updates
+#   an array of objects identified by "id"; PATCH detail: updates one.
+#   Writes go through the model forms of the HTML views, all or nothing in
+#   one transaction.
+#
+# Requests are authenticated by the session (browser) or HTTP Basic auth
+# (scripts, with a local Django account), and need the model's view / add /
+# change permission. A verified Basic username and password is remembered
+# for a while (see _basic_auth_user()), so scripts don't pay for hashing
+# the password on every request.
+
+# Objects per page (default and maximum of ?limit=)
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Objects per POST/PATCH request
+MAX_BULK = 500
+
+# Seconds a verified HTTP Basic username and password is remembered
+BASIC_AUTH_CACHE_SECONDS = 300
+
+
+class OSOptionForm(forms.ModelForm):
+    class Meta:
+        model = OSOption
+        fields = ['name']
+
+
+# Resource name -> model, readable fields (all returned unless ?fields=),
+# list filter, create/update forms (None: read-only) and the models whose
+# versions its responses depend on
+RESOURCES = {
+    'assets': {
+        'model': Asset,
+        'fields': [
+            'id', 'name', 'category', 'brand', 'model', 'os', 'serial_number',
+            'purchase_date', 'status', 'location', 'notes',
+        ],
+        'filter': filter_assets,
+        'create_form': AssetForm,
+        'update_form': AssetForm,
+        # Deleting an OS option clears Asset.os without an Asset signal;
+        # ?unassigned=true filters on the assignments
+        'depends_on': [Asset, OSOption, Assignment],
+    },
+    'assignments': {
+        'model': Assignment,
+        'fields': [
+            'id', 'asset', 'entra_user', 'assigned_date', 'returned_date',
+            'location', 'assignment_reason', 'notes',
+        ],
+        'filter': filter_assignments,
+        'create_form': AssignmentForm,
+        'update_form': AssignmentEditForm,
+        'depends_on': [Assignment, EntraUser],
+    },
+    # Users are written by the Entra ID sync only
+    'users': {
+        'model': EntraUser,
+        'fields': ['id', 'entra_user_id', 'display_name', 'upn', 'is_active', 'department', 'deleted_at'],
+        'filter': filter_users,
+        'create_form': None,
+        'update_form': None,
+        'depends_on': [EntraUser],
+    },
+    'os-options': {
+        'model': OSOption,
+        'fields': ['id', 'name'],
+        'filter': None,
+        'create_form': OSOptionForm,
+        'update_form': OSOptionForm,
+        'depends_on': [OSOption],
+    },
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': message, **extra}
+
+
+def _error_response(error):
+    response = JsonResponse(error.body, status=error.status)
+    if error.status == 401:
+        response['WWW-Authenticate'] = 'Basic realm="inventory"'
+    return response
+
+
+def _credentials_digest(*values):
+    return salted_hmac('inventory.api.basic', ':'.join(values)).hexdigest()
+
+
+def _basic_auth_user(request, username, password):
+    """
+    Returns the active user with this username and password, or None.
+
+    Checking a password runs its full hash (PBKDF2, about 0.3 s), so a
+    successful check is cached for BASIC_AUTH_CACHE_SECONDS under a keyed
+    digest of the credentials, with a digest of the user's password hash:
+    changing the password or deactivating the user takes effect at once.
+    """
+    key = f"inventory:api:basic:{_credentials_digest(username, password)}"
+    cached = cache.get(key)
+
+    if cached is not None:
+        user_id, password_digest = cached
+        user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+        if user is not None and constant_time_compare(_credentials_digest(user.password), password_digest):
+            return user
+
+    user = authenticate(request, username=username, password=password)
+    if user is None or not user.is_active:
+        return None
+
+    cache.set(key, (user.pk, _credentials_digest(user.password)), BASIC_AUTH_CACHE_SECONDS)
+    return user
+
+
+def _authenticate(request):
+    """
+    Returns the user of the session or of an HTTP Basic Authorization
+    header. Session requests that write must pass the CSRF check.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+
+    if header.startswith('Basic '):
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode().partition(':')
+        except (ValueError, UnicodeDecodeError):
+            raise ApiError(401, "Malformed Basic authorization header.")
+
+        user = _basic_auth_user(request, username, password)
+        if user is None:
+            raise ApiError(401, "Invalid credentials.")
+        request.user = user
+        return user
+
+    if not request.user.is_authenticated:
+        raise ApiError(401, "Authentication required.")
+
+    if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        reason = CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+        if reason is not None:
+            raise ApiError(403, "CSRF check failed.")
+
+    return request.user
+
+
+def _check_permission(user, resource, action):
+    model = RESOURCES[resource]['model']
+    permission = f"{model._meta.app_label}.{action}_{model._meta.model_name}"
+    if not user.has_perm(permission):
+        raise ApiError(403, f"Permission {permission} required.")
+
+
+def _selected_fields(request, resource):
+    """
+    Returns the fields requested with ?fields=a,b (id always included), or
+    every field of the resource.
+    """
+    allowed = RESOURCES[resource]['fields']
+    requested = request.GET.get('fields')
+    if not requested:
+        return allowed
+
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ApiError(400, f"Unknown fields: {', '.join(unknown)}.", allowed=allowed)
+
+    return ['id'] + [name for name in fields if name != 'id']
+
+
+def serialize(obj, fields):
+    """
+    Returns obj as a dict of fields; foreign keys as their id.
+    """
+    data = {}
+    for name in fields:
+        field = obj._meta.get_field(name)
+        data[name] = getattr(obj, field.attname)
+    return data
+
+
+def _etag(request, resource, *args, **kwargs):
+    """
+    Strong ETag of a GET response: the data versions of the resource's
+    models and the full request path (filters, fields, cursor). Changes
+    whenever any of those rows is written.
+    """
+    version = invalidation.get_version(*RESOURCES[resource]['depends_on'])
+    digest = hashlib.sha256(f"{version}:{request.get_full_path()}".encode()).hexdigest()
+    return digest[:32]
+
+
+def _last_modified(request, resource, *args, **kwargs):
+    # HTTP dates have a one second resolution; clients should prefer the ETag
+    timestamp = max(invalidation.get_versions(*RESOURCES[resource]['depends_on']))
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+def _parse_body(request):
+    try:
+        return json.loads(request.body or b'null')
+    except ValueError:
+        raise ApiError(400, "Request body is not valid JSON.")
+
+
+def _as_list(payload):
+    """
+    Returns the objects of a POST/PATCH body: one object or an array.
+    """
+    items = payload if isinstance(payload, list) else [payload]
+
+    if not items or not all(isinstance(item, dict) for item in items):
+        raise ApiError(400, "Expected a JSON object or a non-empty array of objects.")
+    if len(items) > MAX_BULK:
+        raise ApiError(400, f"At most {MAX_BULK} objects per request.")
+
+    return items
+
+
+def _save_forms(bound_forms, fields):
+    """
+    Validates every form and saves them all in one transaction, or none.
+    Returns the serialized saved objects.
+    """
+    errors = {index: form.errors.get_json_data() for index, form in enumerate(bound_forms) if not form.is_valid()}
+    if errors:
+        raise ApiError(400, "Validation failed.", errors=errors)
+
+    try:
+        with transaction.atomic():
+            objects = [form.save() for form in bound_forms]
+    except IntegrityError:
+        # e.g. two new assignments of one asset in the same request
+        raise ApiError(409, "The objects conflict with each other or with existing data.")
+
+    return [serialize(obj, fields) for obj in objects]
+
+
+def _create(request, resource, items):
+    """
+    Creates objects from a list of {field: value} with the create form.
+    Returns them serialized.
+    """
+    config = RESOURCES[resource]
+    if config['create_form'] is None:
+        raise ApiError(405, f"{resource} are read-only.")
+    _check_permission(request.user, resource, 'add')
+
+    bound_forms = [config['create_form'](item) for item in items]
+    return _save_forms(bound_forms, config['fields'])
+
+
+def _update(request, resource, items):
+    """
+    Applies partial updates ({"id": ..., field: value}) with the update
+    form, loading every object in one query. Returns them serialized.
+    """
+    config = RESOURCES[resource]
+    if config['update_form'] is None:
+        raise ApiError(405, f"{resource} are read-only.")
+    _check_permission(request.user, resource, 'change')
+
+    ids = [item.get('id') for item in items]
+    # JSON true/false are ints to isinstance()
+    if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        raise ApiError(400, "Every object needs an integer \"id\".")
+
+    objects = config['model'].objects.in_bulk(ids)
+    missing = [pk for pk in ids if pk not in objects]
+    if missing:
+        raise ApiError(404, f"Not found: {', '.join(map(str, missing))}.")
+
+    form_class = config['update_form']
+    bound_forms = []
+    for item in items:
+        instance = objects[item['id']]
+        # Fields left out of the request keep their current value
+        data = model_to_dict(instance, fields=form_class._meta.fields)
+        data.update({name: value for name, value in item.items() if name != 'id'})
+        bound_forms.append(form_class(data, instance=instance))
+
+    return _save_forms(bound_forms, config['fields'])
+
+
+def _list(request, resource):
+    config = RESOURCES[resource]
+    fields = _selected_fields(request, resource)
+
+    queryset = config['model'].objects.only(*fields)
+    if config['filter']:
+        queryset = config['filter'](queryset, request.GET)
+
+    try:
+        page_size = min(max(int(request.GET.get('limit', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ApiError(400, "limit must be an integer.")
+
+    page = paginate_keyset(queryset, 'pk', request, page_size)
+
+    return JsonResponse({
+        'results': [serialize(obj, fields) for obj in page.object_list],
+        'next': request.build_absolute_uri(page.next_url) if page.next_url else None,
+    })
+
+
+# GET/HEAD answered with ETag/Last-Modified, or 304 when unchanged (before
+# any table is queried)
+
+@condition(etag_func=_etag, last_modified_func=_last_modified)
+def _cached_list(request, resource):
+    return _list(request, resource)
+
+
+@condition(etag_func=_etag, last_modified_func=_last_modified)
+def _cached_detail(request, resource, pk):
+    config = RESOURCES[resource]
+    fields = _selected_fields(request, resource)
+
+    obj = config['model'].objects.only(*fields).filter(pk=pk).first()
+    if obj is None:
+        raise ApiError(404, "Not found.")
+
+    return JsonResponse(serialize(obj, fields))
+
+
+# API list endpoint: /api/<resource>/
+@csrf_exempt
+def resource_list(request, resource):
+    """
+    GET: one page of objects. POST: creates an object or an array of them.
+    PATCH: updates an array of objects (with their "id").
+    Errors are returned as {"error": message, ...}.
+    """
+    if resource not in RESOURCES:
+        return _error_response(ApiError(404, f"Unknown resource {resource}."))
+
+    try:
+        _authenticate(request)
+        if request.method in ('GET', 'HEAD'):
+            _check_permission(request.user, resource, 'view')
+            return _cached_list(request, resource)
+        if request.method == 'POST':
+            return JsonResponse({'results': _create(request, resource, _as_list(_parse_body(request)))}, status=201)
+        if request.method == 'PATCH':
+            return JsonResponse({'results': _update(request, resource, _as_list(_parse_body(request)))})
+        raise ApiError(405, f"Method {request.method} not allowed.")
+    except ApiError as error:
+        return _error_response(error)
+
+
+# API detail endpoint: /api/<resource>/<id>/
+@csrf_exempt
+def resource_detail(request, resource, pk):
+    """
+    GET: one object. PATCH: updates it with the fields of a JSON object.
+    """
+    if resource not in RESOURCES:
+        return _error_response(ApiError(404, f"Unknown resource {resource}."))
+
+    try:
+        _authenticate(request)
+        if request.method in ('GET', 'HEAD'):
+            _check_permission(request.user, resource, 'view')
+            return _cached_detail(request, resource, pk)
+        if request.method == 'PATCH':
+            payload = _parse_body(request)
+            if not isinstance(payload, dict):
+                raise ApiError(400, "Expected a JSON object.")
+            return JsonResponse(_update(request, resource, [{**payload, 'id': pk}])[0])
+        raise ApiError(405, f"Method {request.method} not allowed.")
+    except ApiError as error:
+        return _error_response(error)
+
+
+def _change_lines(entries):
+    encoder = DjangoJSONEncoder()
+    chunk = []
+
+    for seq, kind, object_id, action, data, created_at in entries:
+        chunk.append(encoder.encode({
+            'seq': seq, 'kind': kind, 'object_id': object_id,
+            'action': action, 'data': data, 'created_at': created_at,
+        }) + '\n')
+        if len(chunk) == 500:
+            yield ''.join(chunk)
+            chunk = []
+
+    yield ''.join(chunk)
+
+
+# Change feed endpoint: /api/changes/?since=<seq>
+def change_feed(request):
+    """
+    Streams the change log entries after ?since= (default 0) in order, as
+    JSON lines ({"seq", "kind", "object_id", "action", "data",
+    "created_at"}), at most ?limit= of them. ?kind= (repeatable: asset,
+    assignment, entrauser) keeps only those objects. Consumers pass the
+    seq of the last line they processed as the next since.
+    """
+    try:
+        _authenticate(request)
+        if request.method != 'GET':
+            raise ApiError(405, f"Method {request.method} not allowed.")
+        if not request.user.has_perm('inventory.view_changelogentry'):
+            raise ApiError(403, "Permission inventory.view_changelogentry required.")
+
+        try:
+            since = int(request.GET.get('since', 0))
+            limit = min(max(int(request.GET.get('limit', changelog.PAGE_SIZE)), 1), changelog.MAX_PAGE_SIZE)
+        except ValueError:
+            raise ApiError(400, "since and limit must be integers.")
+
+        kinds = request.GET.getlist('kind')
+        unknown = [kind for kind in kinds if kind not in changelog.KINDS]
+        if unknown:
+            raise ApiError(400, f"Unknown kinds: {', '.join(unknown)}.", allowed=list(changelog.KINDS))
+    except ApiError as error:
+        return _error_response(error)
+
+    entries = changelog.changes_since(since, kinds, limit)
+    rows = ((entry.seq, entry.kind, entry.object_id, entry.action, entry.data, entry.created_at) for entry in entries)
+
+    return StreamingHttpResponse(_change_lines(rows), content_type='application/x-ndjson')
@@ -0,0 +1,75 @@
+import string
+
+from django.db import connections
+from django.db.models.functions import Lower
+
+from .models import Asset, EntraUser
+
+# Typeahead lookups behind the autocomplete endpoints and widgets.
+# Matches are case-insensitive prefixes of a few columns, written as a range
+# on LOWER(column) (LOWER(column) >= 'abc' AND < 'abc' + MAX_CHAR) so they
+# use the *_lower_idx expression indexes; LIKE/ILIKE 'abc%' can't use a
+# plain index on SQLite (case-insensitive LIKE) nor PostgreSQL (collation).
+# SQLite's LOWER() only folds ASCII letters, so there the term is folded the
+# same way and non-ASCII letters match with their case ("É" finds "École",
+# "é" doesn't); a Unicode LOWER() would not match the expression indexes.
+
+# Results returned per lookup
+LIMIT = 20
+
+# Sorts after any character, closes the prefix range
+MAX_CHAR = '\U0010ffff'
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _lower(term, vendor):
+    # The term lowercased like LOWER() of the database does
+    if vendor == 'sqlite':
+        return term.translate(ASCII_LOWER)
+    return term.lower()
+
+
+def prefix_filter(queryset, field, term):
+    """
+    Filters queryset to the rows whose field starts with term, ignoring case.
+    """
+    term = _lower(term, connections[queryset.db].vendor)
+    return queryset.alias(
+        **{f'{field}_lower': Lower(field)}
+    ).filter(
+        **{f'{field}_lower__gte': term, f'{field}_lower__lt': term + MAX_CHAR}
+    )
+
+
+def _lookup(queryset, fields, term, limit):
+    """
+    Returns up to limit objects of queryset with one of fields starting with
+    term, one indexed query per field, sorted by their string value.
+    """
+    term = term.strip()
+    if not term:
+        return []
+
+    found = {}
+    for field in fields:
+        for obj in prefix_filter(queryset, field, term).order_by(Lower(field))[:limit]:
+            found.setdefault(obj.pk, obj)
+
+    return sorted(found.values(), key=lambda obj: str(obj).lower())[:limit]
+
+
+def lookup_assets(term, available=False, limit=LIMIT):
+    """
+    Assets whose name or serial number starts with term. With available=True
+    only assets without an active assignment.
+    """
+    assets = Asset.objects.unassigned() if available else Asset.objects.all()
+    return _lookup(assets, ['name', 'serial_number'], term, limit)
+
+
+def lookup_users(term, limit=LIMIT):
+    """
+    Active Entra users whose display name or UPN starts with term.
+    """
+    return _lookup(EntraUser.objects.filter(is_active=True), ['display_name', 'upn'], term, limit)
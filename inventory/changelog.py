@@ -0,0 +1,163 @@
+from django.db import connection, transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from .models import Asset, Assignment, ChangeLogEntry, ChangeLogSequence, EntraUser, OSOption
+
+# Change feed of assets, assignments and Entra users.
+#
+# Every write adds one ChangeLogEntry per object in the same transaction:
+# model saves and deletes through the signals (see signals.py, and
+# AtomicSaveMixin for the transaction), bulk writes (mark_returned(), the
+# importer, the Entra sync) by calling record() / record_ids() themselves.
+# Consumers keep the seq of the last entry they processed and ask for the
+# entries after it (changes_since()), so catching up costs O(changes).
+#
+# Ids are assigned at insert time but become visible at commit time, so
+# with concurrent writers a transaction can commit an id lower than one a
+# consumer already read, however long it stays open. The feed is ordered
+# by seq instead, a position stamped on the entries after their
+# transaction commits (stamp(), run on commit and before the feed is read).
+# Stampers take turns on the ChangeLogSequence row, so positions become
+# visible in increasing order and no entry lands behind a consumer. SQLite
+# serializes writers, so there the id is the position, stamped by the
+# writing transaction itself.
+
+# Row of ChangeLogSequence (created by migration 0013)
+SEQUENCE_ID = 1
+
+# Entries returned per request (default and maximum)
+PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 50000
+
+# Models logged, by ChangeLogEntry.kind
+KINDS = {model._meta.model_name: model for model in [Asset, Assignment, EntraUser]}
+
+
+# Deleting one of these clears a foreign key of logged rows with an UPDATE
+# (on_delete=SET_NULL) that sends no signals: model -> (logged model, field)
+SET_NULL_RELATIONS = {
+    EntraUser: (Assignment, 'entra_user'),
+    OSOption: (Asset, 'os'),
+}
+
+
+def _kind(model):
+    return model._meta.model_name
+
+
+def snapshot(obj):
+    """
+    Returns the loaded field values of obj (deferred fields are left out
+    rather than loaded), foreign keys as ids.
+    """
+    return {
+        field.attname: obj.__dict__[field.attname]
+        for field in obj._meta.concrete_fields
+        if field.attname in obj.__dict__
+    }
+
+
+def record(objects, action):
+    """
+    Adds one entry per object (all of one model) with one bulk insert.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+
+    kind = _kind(type(objects[0]))
+    now = timezone.now()
+
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(
+            kind=kind,
+            object_id=obj.pk,
+            action=action,
+            data=None if action == ChangeLogEntry.ACTION_DELETE else snapshot(obj),
+            created_at=now,
+        )
+        for obj in objects
+    ], batch_size=500)
+
+    # SQLite serializes writers, so no other transaction commits before
+    # this one: it stamps its own entries (see _stamp())
+    if connection.vendor == 'sqlite':
+        _stamp()
+    else:
+        transaction.on_commit(stamp)
+
+
+def stamp():
+    """
+    Gives the committed entries without a feed position the next ones, in
+    id order. Returns how many there were.
+    """
+    if not ChangeLogEntry.objects.filter(seq__isnull=True).exists():
+        return 0
+
+    return _stamp()
+
+
+def _stamp():
+    # SQLite serializes writers, so ids already follow the commit order
+    if connection.vendor == 'sqlite':
+        return ChangeLogEntry.objects.filter(seq__isnull=True).update(seq=F('pk'))
+
+    with transaction.atomic():
+        # Writing the row first locks it (on SQLite, the database) until
+        # commit, before the entries are read
+        if not ChangeLogSequence.objects.filter(pk=SEQUENCE_ID).update(last_seq=F('last_seq')):
+            # Deleted (e.g. by a flush): continue after the last position
+            last_seq = ChangeLogEntry.objects.aggregate(last=Max('seq'))['last'] or 0
+            ChangeLogSequence.objects.create(pk=SEQUENCE_ID, last_seq=last_seq)
+
+        last_seq = ChangeLogSequence.objects.values_list('last_seq', flat=True).get(pk=SEQUENCE_ID)
+        span = ChangeLogEntry.objects.filter(seq__isnull=True).aggregate(first=Min('pk'), last=Max('pk'))
+        if span['first'] is None:
+            return 0
+
+        # Positions follow the ids (gaps and all) from after the last one.
+        # Entries committed meanwhile outside the span wait for the next stamp
+        offset = last_seq + 1 - span['first']
+        stamped = ChangeLogEntry.objects.filter(
+            seq__isnull=True, pk__gte=span['first'], pk__lte=span['last'],
+        ).update(seq=F('pk') + offset)
+        ChangeLogSequence.objects.filter(pk=SEQUENCE_ID).update(last_seq=span['last'] + offset)
+
+    return stamped
+
+
+def record_ids(model, ids, action=ChangeLogEntry.ACTION_UPDATE):
+    """
+    Logs rows changed by update() (which has no instances to record), with
+    one query to read their new values.
+    """
+    ids = list(ids)
+    if ids:
+        record(model.objects.filter(pk__in=ids).order_by('pk'), action)
+
+
+def set_null_ids(obj):
+    """
+    Returns the ids of the logged rows whose foreign key to obj will be
+    cleared when obj is deleted (see SET_NULL_RELATIONS).
+    """
+    model, field = SET_NULL_RELATIONS[type(obj)]
+    return list(model.objects.filter(**{field: obj}).values_list('pk', flat=True))
+
+
+def changes_since(since=0, kinds=None, limit=PAGE_SIZE):
+    """
+    Returns the entries with a seq above since (of the given kinds, or
+    all), in seq order, as an iterator over at most limit entries.
+    """
+    # Entries whose on-commit stamp didn't run (e.g. the process died)
+    stamp()
+
+    entries = ChangeLogEntry.objects.filter(seq__gt=since).order_by('seq')
+
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+
+    return entries[:limit].iterator(chunk_size=2000)
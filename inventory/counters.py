@@ -0,0 +1,232 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Asset, Assignment, DashboardCounter
+
+# Dashboard counters stored in DashboardCounter, one row per name:
+# - TOTAL: number of assets
+# - UNASSIGNED_OPERATIONAL: "Operational" assets without an active assignment
+# - STATUS_PREFIX + status: assets per status
+# - LOCATION_PREFIX + location: assets per Asset.location
+# Asset and Assignment save/delete signals (see signals.py) adjust only the
+# counters an asset moves in or out of. recompute() rebuilds them all from
+# the tables (manage.py recompute_counters) to repair drift, e.g. after
+# raw SQL or update() calls that bypass the signals.
+
+TOTAL = "total"
+UNASSIGNED_OPERATIONAL = "unassigned_operational"
+STATUS_PREFIX = "status:"
+LOCATION_PREFIX = "location:"
+
+# Statuses counted by the "Requires Attention" KPI
+NEED_WORK_STATUSES = [Asset.STATUS_MAINTENANCE, Asset.STATUS_PENDING]
+
+
+def asset_counters(status, location, assigned):
+    """
+    Returns the names of the counters an asset in the given state counts in.
+    """
+    names = [TOTAL, STATUS_PREFIX + status, LOCATION_PREFIX + location]
+
+    if status == Asset.STATUS_OPERATIONAL and not assigned:
+        names.append(UNASSIGNED_OPERATIONAL)
+
+    return names
+
+
+def adjust(changes):
+    """
+    Adds the deltas of changes ({counter name: delta}) to the counters with
+    one UPDATE per non-zero delta. Missing counters are created.
+    """
+    for name, delta in changes.items():
+        if not delta:
+            continue
+
+        if DashboardCounter.objects.filter(name=name).update(value=F("value") + delta):
+            continue
+
+        try:
+            with transaction.atomic():
+                DashboardCounter.objects.create(name=name, value=delta)
+        except IntegrityError:
+            # Created by a concurrent request in the meantime
+            DashboardCounter.objects.filter(name=name).update(value=F("value") + delta)
+
+
+def _move(old_names, new_names):
+    """
+    Returns the {counter name: delta} of an asset leaving the counters in
+    old_names and entering those in new_names.
+    """
+    changes = Counter(new_names)
+    changes.subtract(old_names)
+    return changes
+
+
+def _has_active_assignment(asset_id):
+    return Assignment.objects.filter(asset_id=asset_id, returned_date__isnull=True).exists()
+
+
+def asset_saved(asset, created):
+    """
+    post_save handler of Asset.
+    """
+    if created:
+        adjust(_move([], asset_counters(asset.status, asset.location, False)))
+        return
+
+    loaded = getattr(asset, "_loaded_values", {})
+    if "status" not in loaded or "location" not in loaded:
+        # Previous state unknown (instance not loaded from the DB)
+        return
+
+    old_status, old_location = loaded["status"], loaded["location"]
+    if (old_status, old_location) == (asset.status, asset.location):
+        return
+
+    # Saving an asset doesn't change its assignment, only whether it counts
+    # as "unassigned operational", which only needs a lookup if either
+    # status is Operational
+    assigned = False
+    if Asset.STATUS_OPERATIONAL in (old_status, asset.status):
+        assigned = _has_active_assignment(asset.pk)
+
+    adjust(_move(
+        asset_counters(old_status, old_location, assigned),
+        asset_counters(asset.status, asset.location, assigned),
+    ))
+
+
+def asset_deleted(asset):
+    """
+    post_delete handler of Asset. Its assignments are deleted before it.
+    """
+    loaded = getattr(asset, "_loaded_values", {})
+    status = loaded.get("status", asset.status)
+    location = loaded.get("location", asset.location)
+
+    adjust(_move(asset_counters(status, location, False), []))
+
+
+def _active_asset_change(old_asset_id, new_asset_id):
+    """
+    Adjusts UNASSIGNED_OPERATIONAL when the asset holding an active
+    assignment changes from old_asset_id to new_asset_id (either None).
+    """
+    if old_asset_id == new_asset_id:
+        return
+
+    statuses = dict(
+        Asset.objects.filter(pk__in=[pk for pk in (old_asset_id, new_asset_id) if pk]).values_list("pk", "status")
+    )
+
+    delta = 0
+    if statuses.get(old_asset_id) == Asset.STATUS_OPERATIONAL:
+        delta += 1
+    if statuses.get(new_asset_id) == Asset.STATUS_OPERATIONAL:
+        delta -= 1
+
+    adjust({UNASSIGNED_OPERATIONAL: delta})
+
+
+def assignment_saved(assignment, created):
+    """
+    post_save handler of Assignment.
+    """
+    old_asset_id = None
+    if not created:
+        loaded = getattr(assignment, "_loaded_values", {})
+        if "asset_id" not in loaded or "returned_date" not in loaded:
+            # Previous state unknown (instance not loaded from the DB)
+            return
+        if loaded["returned_date"] is None:
+            old_asset_id = loaded["asset_id"]
+
+    new_asset_id = assignment.asset_id if assignment.returned_date is None else None
+
+    _active_asset_change(old_asset_id, new_asset_id)
+
+
+def assignment_deleted(assignment):
+    """
+    post_delete handler of Assignment.
+    """
+    if assignment.returned_date is None:
+        _active_asset_change(assignment.asset_id, None)
+
+
+def compute(asset_model=Asset):
+    """
+    Computes every counter from the asset and assignment tables and returns
+    them as a Counter. asset_model can be a historical model (migrations).
+    """
+    counts = Counter()
+
+    rows = asset_model.objects.order_by().values_list("status", "location").annotate(count=Count("pk"))
+    for status, location, count in rows:
+        counts[TOTAL] += count
+        counts[STATUS_PREFIX + status] += count
+        counts[LOCATION_PREFIX + location] += count
+
+    # Same as Asset.objects.unassigned(), which historical models lack
+    assignment_model = asset_model._meta.get_field("assignments").related_model
+    counts[UNASSIGNED_OPERATIONAL] = asset_model.objects.filter(
+        status=Asset.STATUS_OPERATIONAL
+    ).exclude(
+        pk__in=assignment_model.objects.filter(returned_date__isnull=True).values("asset_id")
+    ).count()
+
+    return counts
+
+
+def get_counters():
+    """
+    Returns the stored counters as a Counter (missing counters are 0).
+    """
+    return Counter(dict(DashboardCounter.objects.values_list("name", "value")))
+
+
+def recompute():
+    """
+    Replaces the stored counters with freshly computed ones.
+    Returns the counters before and after, to report any drift.
+    """
+    with transaction.atomic():
+        before = get_counters()
+        after = compute()
+
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create(
+            DashboardCounter(name=name, value=value) for name, value in after.items() if value
+        )
+
+    return before, after
+
+
+def get_dashboard():
+    """
+    Returns the home page KPIs and breakdowns, read from the stored counters
+    in one query:
+    - total_assets, unassigned_operational, need_work
+    - statuses: [(status, count)] in STATUS_CHOICES order
+    - locations: [(location, count)] with the most assets first
+    """
+    counts = get_counters()
+
+    locations = [
+        (name[len(LOCATION_PREFIX):], value)
+        for name, value in counts.items()
+        if name.startswith(LOCATION_PREFIX) and value > 0
+    ]
+    locations.sort(key=lambda item: (-item[1], item[0]))
+
+    return {
+        "total_assets": counts[TOTAL],
+        "unassigned_operational": counts[UNASSIGNED_OPERATIONAL],
+        "need_work": sum(counts[STATUS_PREFIX + status] for status in NEED_WORK_STATUSES),
+        "statuses": [(status, counts[STATUS_PREFIX + status]) for status, _ in Asset.STATUS_CHOICES],
+        "locations": locations,
+    }
@@ -0,0 +1,267 @@
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from . import changelog, invalidation, search
+from .graph_api import PAGE_SIZE, DeltaLinkExpired, iter_users_delta
+from .models import ChangeLogEntry, EntraUser, GraphDeltaLink
+
+# Rows per DB write batch (keeps SQLite under its variable limit)
+BATCH_SIZE = 500
+
+# EntraUser fields owned by the sync
+SYNCED_FIELDS = ["upn", "display_name", "department", "is_active", "deleted_at"]
+
+# GraphDeltaLink.resource of the users delta query
+USERS_DELTA_RESOURCE = "users"
+
+# Graph property -> (EntraUser field, conversion of the Graph value)
+GRAPH_FIELDS = {
+    "userPrincipalName": ("upn", lambda value: value),
+    "displayName": ("display_name", lambda value: value or "None"),
+    "department": ("department", lambda value: value or "None"),
+    "accountEnabled": ("is_active", lambda value: value),
+}
+
+
+def user_fields(user_data, partial=False):
+    """
+    Maps a Microsoft Graph user dictionary to EntraUser field values.
+
+    With partial=True only the properties present in user_data are mapped
+    (delta query results only carry the properties that changed).
+    """
+    fields = {"deleted_at": None}
+
+    for graph_name, (field_name, convert) in GRAPH_FIELDS.items():
+        if not partial or graph_name in user_data:
+            fields[field_name] = convert(user_data.get(graph_name))
+
+    return fields
+
+
+def _new_counts():
+    return {"created": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+
+
+def _soft_delete(pks, batch_size, today):
+    """
+    Marks the given EntraUser rows as deleted in batched update() calls,
+    and logs them in the change log.
+    """
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start:start + batch_size]
+        EntraUser.objects.filter(pk__in=batch).update(
+            is_active=False,
+            deleted_at=Coalesce("deleted_at", Value(today)),
+        )
+        changelog.record_ids(EntraUser, batch)
+
+
+def _apply_batch(latest, counts, partial, batch_size):
+    """
+    Writes one batch of Graph users (a dict keyed by entra_user_id holding
+    the last entry per user) to the DB in its own transaction.
+
+    Only the EntraUser rows of the batch are loaded and diffed in memory,
+    then written with bulk_update(), bulk_create() and update() for the
+    "@removed" entries of delta rounds. With partial=True existing users
+    only get the properties present in their entry.
+    """
+    existing = {user.entra_user_id: user for user in EntraUser.objects.filter(entra_user_id__in=list(latest))}
+
+    to_create = []
+    to_update = []
+    to_delete = []
+
+    for entra_user_id, user_data in latest.items():
+        user = existing.get(entra_user_id)
+
+        if "@removed" in user_data:
+            if user is not None and (user.is_active or user.deleted_at is None):
+                to_delete.append(user.pk)
+            continue
+
+        if user is None:
+            to_create.append(EntraUser(entra_user_id=entra_user_id, **user_fields(user_data)))
+            continue
+
+        fields = user_fields(user_data, partial=partial)
+
+        if any(getattr(user, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(user, name, value)
+            to_update.append(user)
+        else:
+            counts["unchanged"] += 1
+
+    with transaction.atomic():
+        # Updates first, so a UPN freed by a renamed user can be reused by a new one
+        EntraUser.objects.bulk_update(to_update, SYNCED_FIELDS, batch_size=batch_size)
+        EntraUser.objects.bulk_create(to_create, batch_size=batch_size)
+        _soft_delete(to_delete, batch_size, timezone.localdate())
+
+        # Bulk writes bypass the model signals
+        search.index_objects(to_update)
+        search.index_objects(to_create)
+        changelog.record(to_update, ChangeLogEntry.ACTION_UPDATE)
+        changelog.record(to_create, ChangeLogEntry.ACTION_CREATE)
+
+    if to_create or to_update or to_delete:
+        invalidation.bump(EntraUser)
+
+    counts["created"] += len(to_create)
+    counts["updated"] += len(to_update)
+    counts["deleted"] += len(to_delete)
+
+
+def _apply_pages(pages, counts, partial, batch_size, progress=None):
+    """
+    Buffers users from pages and applies them batch_size users at a time.
+    Returns the set of entra_user_ids seen and the last delta link found.
+
+    pages yields lists of Graph users, or (users, delta_link) tuples as
+    produced by graph_api.iter_users_delta(). progress, if given, is called
+    with the number of users applied so far after each batch.
+    """
+    seen_ids = set()
+    delta_link = None
+    batch = {}
+    applied = 0
+
+    for page in pages:
+        if isinstance(page, tuple):
+            page, delta_link = page[0], page[1] or delta_link
+
+        for user_data in page:
+            # A user can be listed more than once; the last entry wins
+            batch[user_data["id"]] = user_data
+            seen_ids.add(user_data["id"])
+
+            if len(batch) >= batch_size:
+                _apply_batch(batch, counts, partial, batch_size)
+                applied += len(batch)
+                batch = {}
+
+                if progress:
+                    progress(applied)
+
+    if batch:
+        _apply_batch(batch, counts, partial, batch_size)
+        applied += len(batch)
+
+        if progress:
+            progress(applied)
+
+    return seen_ids, delta_link
+
+
+def sync_users(pages, batch_size=BATCH_SIZE, progress=None):
+    """
+    Makes the EntraUser table match the complete list of Graph users.
+
+    pages is an iterable of user lists (e.g. graph_api.iter_users()) that
+    is consumed lazily. Users are diffed and written in fixed-size batches
+    of batch_size, each in its own short transaction, so memory use and
+    write-lock time don't grow with the tenant:
+    - new users with bulk_create()
+    - changed users with bulk_update()
+    Once every page has been applied, users missing from Graph are soft
+    deleted with update() (deleted_at is only stamped once, is_active is
+    set to False).
+
+    Returns a dict with the number of created, updated, unchanged and
+    deleted users, plus the last delta link found in pages (or None).
+    progress is passed on to _apply_pages().
+    """
+    counts = _new_counts()
+    seen_ids, delta_link = _apply_pages(pages, counts, False, batch_size, progress)
+
+    # Users not soft deleted yet, streamed so only ids are held in memory
+    candidates = EntraUser.objects.filter(
+        Q(is_active=True) | Q(deleted_at__isnull=True)
+    ).values_list("pk", "entra_user_id")
+
+    to_delete = [
+        pk for pk, entra_user_id in candidates.iterator(chunk_size=batch_size * 4)
+        if entra_user_id not in seen_ids
+    ]
+
+    with transaction.atomic():
+        _soft_delete(to_delete, batch_size, timezone.localdate())
+
+    if to_delete:
+        invalidation.bump(EntraUser)
+
+    counts["deleted"] += len(to_delete)
+    counts["delta_link"] = delta_link
+
+    return counts
+
+
+def apply_user_changes(pages, batch_size=BATCH_SIZE, progress=None):
+    """
+    Applies the result of a Graph users delta query to the EntraUser table.
+
+    Unlike sync_users(), users absent from pages are left untouched:
+    - entries with "@removed" are soft deleted
+    - other entries are created, or update only the properties they carry
+
+    Returns the same counts dict as sync_users().
+    """
+    counts = _new_counts()
+    _, delta_link = _apply_pages(pages, counts, True, batch_size, progress)
+    counts["delta_link"] = delta_link
+
+    return counts
+
+
+def get_delta_link(resource=USERS_DELTA_RESOURCE):
+    """
+    Returns the stored Graph delta link for resource, or None.
+    """
+    return GraphDeltaLink.objects.filter(resource=resource).values_list("delta_link", flat=True).first()
+
+
+def save_delta_link(delta_link, resource=USERS_DELTA_RESOURCE):
+    """
+    Stores the Graph delta link to resume from on the next sync.
+    """
+    GraphDeltaLink.objects.update_or_create(resource=resource, defaults={"delta_link": delta_link})
+
+
+def run_sync(full=False, batch_size=BATCH_SIZE, page_size=PAGE_SIZE, progress=None):
+    """
+    Syncs the EntraUser table with Microsoft Graph: only the changes since
+    the stored delta link, or every user (soft deleting the missing ones)
+    with full=True, when there is no delta link yet or when it expired.
+
+    Returns the counts of sync_users() plus "mode" ("incremental" or
+    "full") and "expired" (whether the stored delta link had expired).
+    progress, if given, is called with the number of users applied so far.
+    """
+    delta_link = None if full else get_delta_link()
+    counts = None
+    expired = False
+
+    if delta_link:
+        try:
+            # Only users changed since the last sync
+            counts = apply_user_changes(
+                iter_users_delta(delta_link, page_size=page_size), batch_size=batch_size, progress=progress,
+            )
+            counts["mode"] = "incremental"
+        except DeltaLinkExpired:
+            expired = True
+
+    if counts is None:
+        # Initial delta round: every user, soft delete the missing ones
+        counts = sync_users(iter_users_delta(page_size=page_size), batch_size=batch_size, progress=progress)
+        counts["mode"] = "full"
+
+    # Saved last, so an interrupted sync resumes from the previous link
+    if counts["delta_link"]:
+        save_delta_link(counts["delta_link"])
+
+    counts["expired"] = expired
+    return counts
@@ -0,0 +1,168 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import BooleanField, ExpressionWrapper, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# Rows fetched from the DB (and written to the response) per chunk
+CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = ['csv', 'json']
+
+# First characters that make a spreadsheet read a CSV cell as a formula
+# (e.g. "=HYPERLINK(...)" in an asset note). Such cells are written with a
+# leading "'", which spreadsheets hide, and importers.iter_rows() removes.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# (column name, queryset value path) of each export
+ASSET_COLUMNS = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('category', 'category'),
+    ('brand', 'brand'),
+    ('model', 'model'),
+    ('os', 'os__name'),
+    ('serial_number', 'serial_number'),
+    ('purchase_date', 'purchase_date'),
+    ('status', 'status'),
+    ('location', 'location'),
+    ('notes', 'notes'),
+    ('assigned', 'assigned'),
+    ('current_user_upn', 'active_assignment__entra_user__upn'),
+    ('current_user_name', 'active_assignment__entra_user__display_name'),
+    ('current_location', 'current_location'),
+]
+
+ASSIGNMENT_COLUMNS = [
+    ('id', 'id'),
+    ('asset_id', 'asset_id'),
+    ('asset_name', 'asset__name'),
+    ('asset_serial_number', 'asset__serial_number'),
+    ('user_upn', 'entra_user__upn'),
+    ('user_name', 'entra_user__display_name'),
+    ('assigned_date', 'assigned_date'),
+    ('returned_date', 'returned_date'),
+    ('location', 'location'),
+    ('assignment_reason', 'assignment_reason'),
+    ('notes', 'notes'),
+]
+
+
+def asset_export_rows(assets):
+    """
+    Returns assets as tuples of ASSET_COLUMNS values. The active assignment
+    and its user are LEFT JOINed (at most one per asset), so the export is
+    one query; like get_current_location(), the current location is the
+    assignment's, or the asset's when unassigned.
+    """
+    rows = assets.annotate(
+        active_assignment=FilteredRelation('assignments', condition=Q(assignments__returned_date__isnull=True)),
+        assigned=ExpressionWrapper(Q(active_assignment__id__isnull=False), output_field=BooleanField()),
+        current_location=Coalesce('active_assignment__location', 'location'),
+    ).values_list(*[path for _, path in ASSET_COLUMNS])
+
+    return rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+def assignment_export_rows(assignments):
+    """
+    Returns assignments as tuples of ASSIGNMENT_COLUMNS values, joined to
+    their asset and user in one query.
+    """
+    rows = assignments.values_list(*[path for _, path in ASSIGNMENT_COLUMNS])
+    return rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+# File-like object whose write() returns the data, for csv.writer
+class Echo:
+    def write(self, value):
+        return value
+
+
+def escape_formula(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def unescape_formula(value):
+    # Reverses escape_formula() for a cell read back from a CSV file
+    if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def _csv_chunks(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in columns])
+
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow([escape_formula(value) for value in row]))
+        if len(chunk) == CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+
+    yield ''.join(chunk)
+
+
+def _json_chunks(columns, rows):
+    names = [name for name, _ in columns]
+    encoder = DjangoJSONEncoder()
+    separator = '\n'
+
+    yield '['
+
+    chunk = []
+    for row in rows:
+        chunk.append(separator + encoder.encode(dict(zip(names, row))))
+        separator = ',\n'
+        if len(chunk) == CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+
+    yield ''.join(chunk) + '\n]\n'
+
+
+def export_query(params):
+    """
+    Returns the query string of a list page (its filters and sort) for its
+    export links, without the paging parameters.
+    """
+    params = params.copy()
+    for name in ['cursor', 'stream', 'format']:
+        params.pop(name, None)
+    return params.urlencode()
+
+
+def export_chunks(columns, rows, export_format):
+    """
+    Returns a generator of the text chunks of rows as CSV, or as a JSON
+    array for export_format 'json'.
+    """
+    if export_format == 'json':
+        return _json_chunks(columns, rows)
+    return _csv_chunks(columns, rows)
+
+
+def export_filename(name, export_format):
+    return f"{name}-{timezone.localdate().isoformat()}.{export_format}"
+
+
+def export_response(name, columns, rows, export_format):
+    """
+    Streams rows (an iterator, consumed lazily) as a CSV or JSON array
+    attachment, so the first bytes go out before the query is exhausted and
+    memory use doesn't depend on the number of rows.
+    """
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'csv'
+
+    filename = export_filename(name, export_format)
+    content_type = 'application/json' if export_format == 'json' else 'text/csv'
+
+    response = StreamingHttpResponse(export_chunks(columns, rows, export_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
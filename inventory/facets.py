@@ -0,0 +1,53 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import invalidation
+
+# Seconds a facet result is kept (it is invalidated on writes anyway)
+FACET_TIMEOUT = 60 * 60
+
+
+def get_facets(name, queryset, params, filter_func, filter_params, fields, depends_on=()):
+    """
+    Returns the sidebar options of a list view with match counts:
+    {GET parameter: [(value, count), ...]} for every (GET parameter ->
+    model field) pair in fields.
+
+    Counts are scoped to the current filter selection: each field is
+    counted with every filter of filter_func applied except its own, so
+    the other options of a field stay visible with the number of rows
+    they would add. Selected values without matches are kept with 0.
+
+    Results are cached per filter selection and per data version of the
+    queryset model plus depends_on models, which model save/delete
+    signals bump, so a repeated request costs one cache hit.
+    """
+    models = [queryset.model, *depends_on]
+    selection = {param: sorted(params.getlist(param)) for param in filter_params if params.getlist(param)}
+    digest = hashlib.md5(json.dumps(selection, sort_keys=True).encode()).hexdigest()
+    key = f"inventory:facets:{name}:{invalidation.get_version(*models)}:{digest}"
+
+    facets = cache.get(key)
+    if facets is None:
+        facets = {}
+
+        for param, field in fields.items():
+            rows = (
+                filter_func(queryset, params, skip=param)
+                .order_by(field)
+                .values_list(field)
+                .annotate(count=Count('pk'))
+            )
+            counts = dict(rows)
+
+            for value in params.getlist(param):
+                counts.setdefault(value, 0)
+
+            facets[param] = sorted(counts.items(), key=lambda item: (item[0] is None, item[0] or ''))
+
+        cache.set(key, facets, FACET_TIMEOUT)
+
+    return facets
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit
+
+from .graph_client import GRAPH_URL
+
+# Hosts a FakeMicrosoft stands in for (see reroute())
+LOGIN_URL = "https://login.microsoftonline.com"
+
+# Profile returned by /v1.0/me
+FAKE_PROFILE = {"mail": "loadtest@example.com", "displayName": "Load Test"}
+
+# Retry-After of the throttled responses, in seconds
+THROTTLE_SECONDS = 120
+
+
+def answer(method, path, throttled=False):
+    """
+    Returns the (status, JSON data) a FakeMicrosoft answers a request with:
+    - OIDC (authority) discovery of any tenant
+    - the token endpoint (any authorization code is accepted)
+    - Graph /v1.0/me (FAKE_PROFILE), or 429 with a Retry-After of
+      THROTTLE_SECONDS if throttled
+    """
+    tenant = path.strip("/").split("/")[0]
+    authority = f"{LOGIN_URL}/{tenant}"
+
+    if method == "GET" and path.endswith("/.well-known/openid-configuration"):
+        return 200, {
+            "issuer": f"{authority}/v2.0",
+            "authorization_endpoint": f"{authority}/oauth2/v2.0/authorize",
+            "token_endpoint": f"{authority}/oauth2/v2.0/token",
+        }
+
+    if method == "POST" and path.endswith("/oauth2/v2.0/token"):
+        return 200, {"token_type": "Bearer", "access_token": "fake-access-token", "expires_in": 3600, "scope": "User.Read"}
+
+    if method == "GET" and path == "/v1.0/me":
+        if throttled:
+            return 429, {"error": {"code": "TooManyRequests"}}
+        return 200, FAKE_PROFILE
+
+    return 404, {"error": "not_found"}
+
+
+class FakeMicrosoft:
+    """
+    Local stand-in for the Microsoft endpoints of a sign-in (see answer()),
+    for the tests and login benchmarks: a threaded HTTP server answering
+    every request after `latency` seconds, like a round trip to Microsoft.
+    Set self.throttled to answer /v1.0/me with 429.
+    self.requests counts the requests per path.
+    """
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.throttled = False
+        self.requests = Counter()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes: without this, keep-alive
+            # responses wait for a delayed ACK (about 40 ms)
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, data):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429:
+                    self.send_header("Retry-After", str(THROTTLE_SECONDS))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.reply(*fake.respond("GET", urlsplit(self.path).path))
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self.reply(*fake.respond("POST", urlsplit(self.path).path))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def respond(self, method, path):
+        self.requests[path] += 1
+        time.sleep(self.latency)
+        return answer(method, path, self.throttled)
+
+    def install(self, *sessions):
+        """
+        Reroutes the Microsoft login and Graph requests of the given
+        requests.Session objects to this server, until uninstall().
+        """
+        self._installed = sessions
+        reroute(self.url, *sessions)
+
+    def uninstall(self):
+        for session in getattr(self, "_installed", []):
+            for prefix in [f"{LOGIN_URL}/", f"{GRAPH_URL}/"]:
+                session.adapters.pop(prefix, None)
+        self._installed = []
+
+
+def reroute(url, *sessions):
+    """
+    Sends the Microsoft login and Graph requests of the given
+    requests.Session objects to the fake Microsoft server at url instead
+    (MSAL only accepts https authorities, so it can't be configured to go
+    there).
+    """
+    from requests.adapters import HTTPAdapter
+
+    local = urlsplit(url)
+
+    class LocalAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            request.url = urlunsplit(urlsplit(request.url)._replace(scheme=local.scheme, netloc=local.netloc))
+            return super().send(request, **kwargs)
+
+    for session in sessions:
+        for prefix in [f"{LOGIN_URL}/", f"{GRAPH_URL}/"]:
+            session.mount(prefix, LocalAdapter())
+
+
+class FakeMicrosoftApp:
+    """
+    ASGI version of FakeMicrosoft, to serve with uvicorn: answers every
+    request after `latency` seconds without holding a thread, so thousands
+    of sign-ins can wait on it at once.
+    """
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        # Read (and drop) the request body
+        more_body = True
+        while more_body:
+            message = await receive()
+            more_body = message.get("more_body", False)
+
+        await asyncio.sleep(self.latency)
+        status, data = answer(scope["method"], scope["path"])
+
+        body = json.dumps(data).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
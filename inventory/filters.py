@@ -0,0 +1,97 @@
+# Filters of the list views, built from the GET parameters of their filter
+# forms and shared by the views and their sidebar facet counts.
+# skip names one GET parameter whose filter is left out (facets use it to
+# count the options of their own field).
+
+# GET parameters of each list's filter form
+ASSET_FILTER_PARAMS = ['unassigned', 'status', 'category', 'brand', 'location', 'start_date', 'end_date']
+ASSIGNMENT_FILTER_PARAMS = ['status', 'location', 'assigned_start', 'assigned_end', 'returned_start', 'returned_end']
+USER_FILTER_PARAMS = ['department', 'is_active']
+
+
+def filter_assets(assets, params, skip=None):
+    """
+    Applies the asset_list filters (status, category, brand, location,
+    purchase date range and "unassigned only") to assets.
+    """
+    def get(name):
+        return None if name == skip else params.get(name)
+
+    def getlist(name):
+        return [] if name == skip else params.getlist(name)
+
+    # Apply "available" filter (status=Operational and unassigned)
+    if get('unassigned') == "true":
+        assets = assets.unassigned()
+
+    # Apply status filter
+    if getlist('status'):
+        assets = assets.filter(status__in=getlist('status'))
+
+    # Apply category filter
+    if getlist('category'):
+        assets = assets.filter(category__in=getlist('category'))
+
+    # Apply brand filter
+    if getlist('brand'):
+        assets = assets.filter(brand__in=getlist('brand'))
+
+    # Apply location filter
+    if getlist('location'):
+        assets = assets.filter(location__in=getlist('location'))
+
+    # Filter by purchase date range if provided
+    if get('start_date'):
+        assets = assets.filter(purchase_date__gte=get('start_date'))
+    if get('end_date'):
+        assets = assets.filter(purchase_date__lte=get('end_date'))
+
+    return assets
+
+
+def filter_assignments(assignments, params, skip=None):
+    """
+    Applies the assignment_list filters (active/returned, location,
+    assigned and returned date ranges) to assignments.
+    """
+    def get(name):
+        return None if name == skip else params.get(name)
+
+    status_filter = get('status')
+    if status_filter == "active":
+        assignments = assignments.filter(returned_date__isnull=True)
+    elif status_filter == "returned":
+        assignments = assignments.filter(returned_date__isnull=False)
+
+    location_filter = [] if skip == 'location' else params.getlist('location')
+    if location_filter:
+        assignments = assignments.filter(location__in=location_filter)
+
+    if get('assigned_start'):
+        assignments = assignments.filter(assigned_date__gte=get('assigned_start'))
+    if get('assigned_end'):
+        assignments = assignments.filter(assigned_date__lte=get('assigned_end'))
+
+    if get('returned_start'):
+        assignments = assignments.filter(returned_date__gte=get('returned_start'))
+    if get('returned_end'):
+        assignments = assignments.filter(returned_date__lte=get('returned_end'))
+
+    return assignments
+
+
+def filter_users(users, params, skip=None):
+    """
+    Applies the user_list filters (department, active status) to users.
+    """
+    department_filter = [] if skip == 'department' else params.getlist('department')
+    if department_filter:
+        users = users.filter(department__in=department_filter)
+
+    is_active_filter = None if skip == 'is_active' else params.get('is_active', 'all')
+    if is_active_filter == 'true':
+        users = users.filter(is_active=True)
+    elif is_active_filter == 'false':
+        users = users.filter(is_active=False)
+
+    return users
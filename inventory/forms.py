@@ -1,5 +1,7 @@
 from django import forms
+from django.utils import timezone
 from .models import Asset, Assignment
+from .widgets import AutocompleteSelect
 
 # Asset Create/Edit form
 class AssetForm(forms.ModelForm):
@@ -48,10 +50,24 @@ class AssignmentForm(forms.ModelForm):
             'notes': forms.Textarea(attrs={'rows': 3, 'class': 'form-control'}),
             'assignment_reason': forms.TextInput(attrs={'class': 'form-control'}),
             'location': forms.TextInput(attrs={'class': 'form-control'}),
-            'asset': forms.Select(attrs={'class': 'form-select'}),
-            'entra_user': forms.Select(attrs={'class': 'form-select'}),
+            # Typeahead instead of an <option> per asset / user
+            'asset': AutocompleteSelect('autocomplete_assets', attrs={'class': 'form-select'}, query='available=1'),
+            'entra_user': AutocompleteSelect('autocomplete_users', attrs={'class': 'form-select'}),
         }
 
+    def clean_asset(self):
+        """
+        Rejects assets that already have an active assignment (enforced in
+        the DB by the unique_active_assignment_per_asset constraint, which
+        the form can't validate as returned_date isn't one of its fields).
+        """
+        asset = self.cleaned_data['asset']
+
+        if asset.assignments.filter(returned_date__isnull=True).exists():
+            raise forms.ValidationError("This asset is already assigned. Close its active assignment first.")
+
+        return asset
+
 # Assignment edit form page
 class AssignmentEditForm(forms.ModelForm):
     class Meta:
@@ -64,4 +80,49 @@ class AssignmentEditForm(forms.ModelForm):
             'returned_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'location': forms.TextInput(attrs={'class': 'form-control'}),
             'notes': forms.Textarea(attrs={'rows': 3, 'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+    def clean(self):
+        """
+        Rejects reopening a returned assignment (clearing its returned date)
+        while its asset has another active assignment: model validation
+        skips the unique_active_assignment_per_asset constraint as asset
+        isn't a field of this form, so the save would fail on it.
+        """
+        cleaned_data = super().clean()
+
+        if (
+            'returned_date' in cleaned_data
+            and cleaned_data['returned_date'] is None
+            and self.instance.asset.assignments.filter(returned_date__isnull=True).exclude(pk=self.instance.pk).exists()
+        ):
+            self.add_error('returned_date', "This asset has another active assignment. Close it before reopening this one.")
+
+        return cleaned_data
+
+# Bulk return of the assignments ticked in the assignment list
+class ReturnAssignmentsForm(forms.Form):
+    assignment = forms.ModelMultipleChoiceField(
+        queryset=Assignment.objects.all(),
+        error_messages={'required': "No active assignments selected."},
+    )
+    returned_date = forms.DateField(required=False)
+
+    def clean(self):
+        """
+        Rejects a returned date (default: today) before the assigned date
+        of any selected assignment.
+        """
+        cleaned_data = super().clean()
+        assignments = cleaned_data.get('assignment')
+
+        if assignments is not None and 'returned_date' in cleaned_data:
+            returned_date = cleaned_data['returned_date'] or timezone.localdate()
+            early = assignments.filter(returned_date__isnull=True, assigned_date__gt=returned_date).count()
+
+            if early:
+                self.add_error(
+                    'returned_date',
+                    f"{early} selected assignment(s) started after {returned_date:%Y-%m-%d}. Pick a later returned date.",
+                )
+
+        return cleaned_data
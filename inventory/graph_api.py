@@ -1,77 +1,138 @@
-from azure.identity import ClientSecretCredential
-import requests
-from requests.exceptions import RequestException
-import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Get the client ID and tenant ID from environment variables
-CLIENT_ID = os.getenv("CLIENT_ID")
-TENANT_ID = os.getenv("TENANT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+import threading
+import time
+from django.conf import settings
+from .graph_client import GRAPH_URL, graph_client
 
 # Microsoft Graph scope needed to read users
 SCOPES = ["https://graph.microsoft.com/.default"]
 
-# Create a DeviceCodeCredential for interactive login
-credential = ClientSecretCredential(
-    client_id=CLIENT_ID,
-    tenant_id=TENANT_ID,
-    client_secret=CLIENT_SECRET
-)
+# User properties synced into the EntraUser table
+USER_SELECT = "id,displayName,userPrincipalName,department,accountEnabled"
 
-def get_access_token():
+# Users per Graph page (999 is the Graph maximum for users)
+PAGE_SIZE = 999
+
+# Get a new token this many seconds before the cached one expires
+TOKEN_REFRESH_MARGIN = 300
+
+# Credential and token, created on first use (see get_access_token)
+_credential = None
+_token = None
+_token_lock = threading.Lock()
+
+class DeltaLinkExpired(Exception):
     """
-    Authenticate using client credentials flow and return a bearer token.
+    Raised when Graph no longer accepts a stored delta link (HTTP 410 Gone),
+    so a full resync is required.
     """
 
-    token = credential.get_token(*SCOPES)
-    return token.token
+def get_credential():
+    """
+    Returns the client secret credential for the app registration.
 
-def get_all_users():
+    The azure SDK is imported and the credential built on first use, so
+    importing this module stays cheap for processes that never call Graph.
     """
-    Query Microsoft Graph API for all users and return a list of dictionaries for each user.
+    global _credential
+
+    if _credential is None:
+        from azure.identity import ClientSecretCredential
+
+        _credential = ClientSecretCredential(
+            client_id=settings.MICROSOFT_CLIENT_ID,
+            tenant_id=settings.MICROSOFT_TENANT_ID,
+            client_secret=settings.MICROSOFT_CLIENT_SECRET
+        )
+
+    return _credential
+
+def get_access_token():
     """
-    # Acquire access token
-    token = get_access_token()
+    Authenticate using client credentials flow and return a bearer token.
 
-    # API endpoint
-    url = "https://graph.microsoft.com/v1.0/users"
+    The token is cached in memory and reused until TOKEN_REFRESH_MARGIN
+    seconds before it expires.
+    """
+    global _token
 
-    params = {
-    "$select": "id,displayName,userPrincipalName,department,accountEnabled"
-    }
+    with _token_lock:
+        if _token is None or _token.expires_on - TOKEN_REFRESH_MARGIN <= time.time():
+            _token = get_credential().get_token(*SCOPES)
+
+        return _token.token
 
+def iter_pages(url, params=None, page_size=None):
+    """
+    Generator that follows @odata.nextLink from url and yields the JSON body
+    of one page at a time, so callers never hold more than one page.
+
+    page_size is sent as $top on collection queries and as an
+    odata.maxpagesize preference on delta queries (which ignore $top).
+    """
     headers = {
-        "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
 
-    # List of users(dictionaries)
-    all_users = []
+    if page_size:
+        headers["Prefer"] = f"odata.maxpagesize={page_size}"
+        if params is not None and "/delta" not in url:
+            params = {**params, "$top": page_size}
 
     # Handle pagination if any
     while url:
 
-        try:
-            response = requests.get(
-                url,
-                headers=headers, 
-                params=params if not all_users else None
-            )
-            
-            response.raise_for_status()
-        except RequestException as e:
-            raise e
+        # Cached access token (renewed if it expires during a long sync)
+        headers["Authorization"] = f"Bearer {get_access_token()}"
+
+        # Pooled session; throttling (429/Retry-After) is retried by the client
+        response = graph_client.get(url, headers=headers, params=params)
+
+        if response.status_code == 410:
+            raise DeltaLinkExpired(url)
+
+        response.raise_for_status()
 
         data = response.json()
-        users = data.get("value", [])
-        all_users.extend(users)
+        yield data
 
         # Get the URL for the next page, or None if there isn’t one
+        # (next links already carry the query parameters)
         url = data.get("@odata.nextLink")
+        params = None
 
-    return all_users
+def iter_users(page_size=PAGE_SIZE):
+    """
+    Generator that yields the users of Microsoft Graph one page (a list of
+    dictionaries, at most page_size long) at a time.
+    """
+    for page in iter_pages(f"{GRAPH_URL}/v1.0/users", {"$select": USER_SELECT}, page_size):
+        yield page.get("value", [])
+
+def iter_users_delta(delta_link=None, page_size=PAGE_SIZE):
+    """
+    Generator over the Microsoft Graph users delta query, one page at a time.
+
+    Without a delta_link this is the initial round and lists every user.
+    With the delta_link saved from a previous round it lists only the users
+    changed since then; removed users carry an "@removed" key.
 
+    Yields (users, new_delta_link) tuples; new_delta_link is None except on
+    the last page. Raises DeltaLinkExpired when Graph rejects delta_link.
+    """
+    if delta_link:
+        pages = iter_pages(delta_link, None, page_size)
+    else:
+        pages = iter_pages(f"{GRAPH_URL}/v1.0/users/delta", {"$select": USER_SELECT}, page_size)
+
+    for page in pages:
+        yield page.get("value", []), page.get("@odata.deltaLink")
+
+def get_all_users():
+    """
+    Query Microsoft Graph API for all users and return a list of dictionaries for each user.
+    """
+    all_users = []
+    for users in iter_users():
+        all_users.extend(users)
+
+    return all_users
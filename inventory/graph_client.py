@@ -0,0 +1,163 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Graph base URL (can point to a local fake Graph server for testing)
+GRAPH_URL = os.getenv("GRAPH_URL", "https://graph.microsoft.com").rstrip("/")
+
+# HTTP client settings, overridable from the environment
+GRAPH_TIMEOUT = float(os.getenv("GRAPH_TIMEOUT", "30"))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "5"))
+GRAPH_BACKOFF = float(os.getenv("GRAPH_BACKOFF", "1"))
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", "10"))
+
+# Longest single wait between two attempts, in seconds
+MAX_WAIT = 120
+
+# Budget of the sign-in requests (authority discovery, token exchange,
+# Graph /me): a user and a request worker wait on them, so they give up
+# after seconds where a sync can wait out minutes of throttling
+LOGIN_TIMEOUT = float(os.getenv("LOGIN_TIMEOUT", "10"))
+LOGIN_MAX_RETRIES = int(os.getenv("LOGIN_MAX_RETRIES", "1"))
+LOGIN_MAX_WAIT = 2
+
+# Responses worth retrying (throttling and transient server errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GraphClient:
+    """
+    HTTP client shared by every Microsoft Graph call in the process.
+
+    - One requests.Session with a pooled HTTPAdapter, so pages and logins
+      reuse keep-alive TLS connections.
+    - A default timeout on every request.
+    - Retries on connection errors and RETRY_STATUSES with exponential
+      backoff (plus jitter), honouring the Retry-After header Graph sends
+      with 429/503 throttling responses, up to max_wait seconds per wait.
+    - Counters in self.metrics for requests, retries, throttled responses
+      and the total time spent waiting on throttling.
+    """
+
+    def __init__(self, timeout=GRAPH_TIMEOUT, max_retries=GRAPH_MAX_RETRIES, backoff=GRAPH_BACKOFF, pool_size=GRAPH_POOL_SIZE, max_wait=MAX_WAIT):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.pool_size = pool_size
+
+        self._session = None
+        self._lock = threading.Lock()
+        self.reset_metrics()
+
+    @property
+    def session(self):
+        """
+        The pooled requests.Session, created (and requests imported) on
+        first use to keep this module cheap to import.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+
+        return self._session
+
+    def reset_metrics(self):
+        with self._lock:
+            self.metrics = {
+                "requests": 0,
+                "retries": 0,
+                "throttled": 0,
+                "throttle_wait_seconds": 0.0,
+            }
+
+    def get_metrics(self):
+        """
+        Returns a copy of the metrics counters.
+        """
+        with self._lock:
+            return dict(self.metrics)
+
+    def _record(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.metrics[name] += value
+
+    def _backoff_wait(self, attempt):
+        """
+        Exponential backoff with jitter for the given attempt (0-based).
+        """
+        return min(self.backoff * 2 ** attempt + random.uniform(0, self.backoff), self.max_wait)
+
+    def _retry_after(self, response):
+        """
+        Returns the Retry-After header of response in seconds, or None.
+        The header is either a number of seconds or an HTTP date.
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+
+        try:
+            return min(max(float(value), 0), self.max_wait)
+        except ValueError:
+            pass
+
+        try:
+            return min(max(parsedate_to_datetime(value).timestamp() - time.time(), 0), self.max_wait)
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, url, **kwargs):
+        """
+        Sends a GET request, retrying throttled and transient failures.
+        Returns the final requests.Response (raise_for_status() is left to
+        the caller); re-raises the connection error once retries run out.
+        """
+        from requests.exceptions import ConnectionError, Timeout
+
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+
+        while True:
+            self._record(requests=1)
+
+            try:
+                response = self.session.get(url, **kwargs)
+            except (ConnectionError, Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                wait = self._backoff_wait(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+
+                retry_after = self._retry_after(response)
+                wait = self._backoff_wait(attempt) if retry_after is None else retry_after
+
+                if response.status_code == 429 or retry_after is not None:
+                    self._record(throttled=1, throttle_wait_seconds=wait)
+
+                # Release the connection back to the pool before sleeping
+                response.close()
+
+            self._record(retries=1)
+            time.sleep(wait)
+            attempt += 1
+
+
+# Shared client used by graph_api (Entra sync)
+graph_client = GraphClient()
+
+# Shared client of the SSO views and the MSAL client
+login_client = GraphClient(timeout=LOGIN_TIMEOUT, max_retries=LOGIN_MAX_RETRIES, max_wait=LOGIN_MAX_WAIT)
@@ -0,0 +1,243 @@
+import datetime
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Assignment
+
+# Point-in-time queries over the assignment history ("who had what when").
+#
+# An assignment covers the days from assigned_date to returned_date, both
+# included; an active one runs on indefinitely. Finding the assignments
+# that cover a day (or overlap a period) uses a range index over these
+# intervals (created by migration 0014):
+# - SQLite: inventory_assignment_rtree, a one-dimensional R*Tree of
+#   (assignment id, first day, last day) with days as YYYYMMDD integers.
+#   Triggers on inventory_assignment keep it in sync, so the bulk paths
+#   (bulk_create(), update(), raw DELETEs) need no extra code. Migrations
+#   that rebuild the table (the SQLite schema editor does for most
+#   AlterField / AddField operations) drop them, so repair_range_index()
+#   re-creates them after every migrate.
+# - PostgreSQL: a GiST index over the daterange of PERIOD_SQL.
+# - Other backends: plain filters on the two date columns.
+# The range index answers counts directly and collects the matches of a
+# quiet period cheaply. On a busy date (over SPARSE_LIMIT matches) sorting
+# them all for one page costs more than reading the assigned_date index
+# newest first from the end of the period, where nearly every row still
+# covers it, so assignments_between() probes the range index to choose.
+# Queries for one asset or one Entra user filter on its foreign key index
+# instead: their histories are short.
+
+RTREE_TABLE = 'inventory_assignment_rtree'
+
+# Last day of an active assignment in the R*Tree
+OPEN_END = 99991231
+
+# The period of an assignment; same expression as the GiST index of
+# migration 0014, so queries can use it (a NULL returned_date is an
+# unbounded range, a returned_date before assigned_date a single day)
+PERIOD_SQL = (
+    "daterange(assigned_date, CASE WHEN returned_date < assigned_date "
+    "THEN assigned_date ELSE returned_date END, '[]')"
+)
+
+# Days of an assignment row in the R*Tree, as in migration 0014: YYYYMMDD
+# integers from the 'YYYY-MM-DD' text of the dates, an active assignment
+# ending on OPEN_END; the R*Tree rejects a last day before the first, so
+# such rows cover their first day only
+RTREE_DAYS_SQL = (
+    "CAST(replace({row}.assigned_date, '-', '') AS INTEGER), "
+    "max(CAST(replace({row}.assigned_date, '-', '') AS INTEGER), "
+    f"COALESCE(CAST(replace({{row}}.returned_date, '-', '') AS INTEGER), {OPEN_END}))"
+)
+
+# Triggers keeping the R*Tree in sync with inventory_assignment, by name
+RTREE_TRIGGERS = {
+    'inventory_assignment_rtree_ai': f"""
+        CREATE TRIGGER inventory_assignment_rtree_ai AFTER INSERT ON inventory_assignment BEGIN
+            INSERT INTO {RTREE_TABLE} (id, first_day, last_day) VALUES (new.id, {RTREE_DAYS_SQL.format(row='new')});
+        END
+    """,
+    'inventory_assignment_rtree_au': f"""
+        CREATE TRIGGER inventory_assignment_rtree_au AFTER UPDATE OF id, assigned_date, returned_date
+        ON inventory_assignment BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+            INSERT INTO {RTREE_TABLE} (id, first_day, last_day) VALUES (new.id, {RTREE_DAYS_SQL.format(row='new')});
+        END
+    """,
+    'inventory_assignment_rtree_ad': f"""
+        CREATE TRIGGER inventory_assignment_rtree_ad AFTER DELETE ON inventory_assignment BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+        END
+    """,
+}
+
+# Matches up to which assignments_between() goes through the range index
+SPARSE_LIMIT = 5000
+
+# Range index of each backend, as named in query plans
+RANGE_INDEXES = {
+    'sqlite': RTREE_TABLE,
+    'postgresql': 'inventory_assignment_period_gist',
+}
+
+
+def day_number(day):
+    """
+    Returns day as the YYYYMMDD integer stored in the R*Tree.
+    """
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def _period_ids_sql(vendor, start, end):
+    """
+    Returns (sql, params) selecting the ids of the assignments covering at
+    least one day of start..end through the range index of vendor, or
+    (None, None) if it has none.
+    """
+    if vendor == 'sqlite':
+        return (
+            f"SELECT id FROM {RTREE_TABLE} WHERE first_day <= %s AND last_day >= %s",
+            [day_number(end), day_number(start)],
+        )
+
+    if vendor == 'postgresql':
+        return (
+            f"SELECT id FROM inventory_assignment WHERE {PERIOD_SQL} && daterange(%s, %s, '[]')",
+            [start, end],
+        )
+
+    return None, None
+
+
+def _overlap_filter(start, end):
+    # Same periods as the range indexes (a returned_date before
+    # assigned_date covers the assigned day only)
+    return Q(assigned_date__lte=end) & (
+        Q(returned_date__isnull=True) | Q(returned_date__gte=start) | Q(assigned_date__gte=start)
+    )
+
+
+def overlapping(queryset, start, end):
+    """
+    Narrows an assignment queryset to the assignments covering at least
+    one day of start..end (both included) through the range index.
+    """
+    sql, params = _period_ids_sql(connections[queryset.db].vendor, start, end)
+
+    if sql is None:
+        return queryset.filter(_overlap_filter(start, end))
+
+    return queryset.filter(pk__in=RawSQL(sql, params))
+
+
+def _of(assignments, asset, entra_user):
+    if asset is not None:
+        assignments = assignments.filter(asset=asset)
+    if entra_user is not None:
+        assignments = assignments.filter(entra_user=entra_user)
+
+    return assignments
+
+
+def count_between(start, end, asset=None, entra_user=None, limit=None):
+    """
+    Returns the number of assignments (of asset and/or entra_user, if
+    given) covering at least one day of start..end, counting no further
+    than limit if given.
+    """
+    start, end = min(start, end), max(start, end)
+    connection = connections[Assignment.objects.db]
+    sql, params = _period_ids_sql(connection.vendor, start, end)
+
+    if sql is not None and asset is None and entra_user is None:
+        if limit is not None:
+            sql, params = f"{sql} LIMIT %s", params + [limit]
+
+        # Counted in the index alone, without reading the assignment rows
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({sql}) period_ids", params)
+            return cursor.fetchone()[0]
+
+    assignments = _of(Assignment.objects.filter(_overlap_filter(start, end)), asset, entra_user)
+    return (assignments[:limit] if limit is not None else assignments).count()
+
+
+def assignments_between(start, end, asset=None, entra_user=None):
+    """
+    Returns the assignments (of asset and/or entra_user, if given) covering
+    at least one day of start..end, both included. Without asset and user
+    it probes the range index (one query) to pick the plan, which assumes
+    the caller orders them newest first (-assigned_date).
+    """
+    start, end = min(start, end), max(start, end)
+    assignments = Assignment.objects.select_related('asset', 'entra_user')
+
+    if asset is None and entra_user is None:
+        vendor = connections[assignments.db].vendor
+        if vendor in RANGE_INDEXES and count_between(start, end, limit=SPARSE_LIMIT + 1) <= SPARSE_LIMIT:
+            return overlapping(assignments, start, end)
+
+    return _of(assignments, asset, entra_user).filter(_overlap_filter(start, end))
+
+
+def assignments_as_of(day, asset=None, entra_user=None):
+    """
+    Returns the assignments (of asset and/or entra_user, if given) that
+    were active on day: who had what on that date.
+    """
+    return assignments_between(day, day, asset=asset, entra_user=entra_user)
+
+
+def missing_range_triggers(connection):
+    """
+    Returns the names of the RTREE_TRIGGERS missing from a SQLite database
+    that has the R*Tree (none on other backends, or before migration 0014).
+    """
+    if connection.vendor != 'sqlite':
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE (type = 'table' AND name = %s) OR type = 'trigger'",
+            [RTREE_TABLE],
+        )
+        names = {name for name, in cursor.fetchall()}
+
+    if RTREE_TABLE not in names:
+        return []
+
+    return [name for name in RTREE_TRIGGERS if name not in names]
+
+
+def repair_range_index(connection):
+    """
+    Re-creates the missing R*Tree triggers and, if there were any, refills
+    the R*Tree, which missed the writes made without them.
+    Returns the names of the re-created triggers.
+    """
+    missing = missing_range_triggers(connection)
+
+    if missing:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for name in missing:
+                cursor.execute(RTREE_TRIGGERS[name])
+
+            cursor.execute(f"DELETE FROM {RTREE_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {RTREE_TABLE} (id, first_day, last_day) "
+                f"SELECT id, {RTREE_DAYS_SQL.format(row='a')} FROM inventory_assignment a"
+            )
+
+    return missing
+
+
+def parse_day(value):
+    """
+    Parses a YYYY-MM-DD string. Returns None for a missing or invalid date.
+    """
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
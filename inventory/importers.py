@@ -0,0 +1,260 @@
+import csv
+import io
+from collections import Counter
+
+from django import forms
+from django.db import IntegrityError, transaction
+
+from . import changelog, counters, exports, invalidation, search
+from .forms import AssetForm
+from .models import Asset, ChangeLogEntry, OSOption
+
+# Rows validated, checked for duplicate serial numbers and inserted at a time
+CHUNK_SIZE = 1000
+
+# File extensions read by iter_rows()
+IMPORT_FORMATS = [".csv", ".xlsx"]
+
+
+# AssetForm rules for one import row
+class AssetImportForm(AssetForm):
+    # OS by name instead of by OSOption id, matched against preloaded options
+    os = forms.CharField(required=False)
+
+    def __init__(self, *args, os_options=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.os_options = os_options or {}
+
+        # Files may leave the status column out or blank
+        self.fields['status'].required = False
+
+        # clean_<field>() methods, looked up once rather than per row
+        self.field_cleaners = {
+            name: getattr(self, f'clean_{name}') for name in self.fields if hasattr(self, f'clean_{name}')
+        }
+
+    def clean_status(self):
+        return self.cleaned_data['status'] or Asset.STATUS_OPERATIONAL
+
+    def clean_os(self):
+        name = self.cleaned_data['os'].strip()
+        if not name:
+            return None
+
+        os_option = self.os_options.get(name.lower())
+        if os_option is None:
+            raise forms.ValidationError(f"Unknown OS \"{name}\".")
+
+        return os_option
+
+    def clean_row(self, data):
+        """
+        Validates one row with the form fields and clean_<field>() methods.
+        Returns an unsaved Asset, or None and {field: [messages]}.
+
+        Skips the per-form field copies, BoundFields and model validation of
+        is_valid() (the form fields carry the same required, max_length,
+        choices and date rules), which would cost more than the insert
+        itself. One form is reused for every row of an import.
+        """
+        self.cleaned_data = {}
+        errors = {}
+
+        for name, field in self.fields.items():
+            try:
+                self.cleaned_data[name] = field.clean(data.get(name, ''))
+                if name in self.field_cleaners:
+                    self.cleaned_data[name] = self.field_cleaners[name]()
+            except forms.ValidationError as error:
+                errors[name] = error.messages
+
+        if errors:
+            return None, errors
+
+        return Asset(**self.cleaned_data), None
+
+    def validate_unique(self):
+        # serial_number uniqueness is checked once per chunk by import_assets()
+        pass
+
+
+def _header_names():
+    """
+    Maps accepted column headers (field names and form labels, any case) to
+    AssetForm field names.
+    """
+    names = {}
+    for name, field in AssetImportForm.base_fields.items():
+        names[name] = name
+        names[name.replace('_', ' ')] = name
+        names[str(field.label or name).lower()] = name
+
+    return names
+
+
+def _normalize_header(header):
+    return str(header or '').strip().lower()
+
+
+def iter_rows(file, filename):
+    """
+    Yields (row number, {field name: value}) for each data row of an
+    uploaded CSV or XLSX file, reading it row by row. The first row holds
+    the column headers; unknown columns are ignored.
+    """
+    header_names = _header_names()
+
+    if filename.lower().endswith('.xlsx'):
+        # Optional dependency, only needed for Excel files
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("Reading .xlsx files requires the openpyxl package.")
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    elif filename.lower().endswith('.csv'):
+        # Cells escaped against formulas by the CSV export read back as-is
+        rows = (
+            [exports.unescape_formula(value) for value in row]
+            for row in csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        )
+    else:
+        raise ValueError(f"Unsupported file type, expected one of: {', '.join(IMPORT_FORMATS)}.")
+
+    headers = next(rows, None)
+    if headers is None:
+        return
+
+    columns = [header_names.get(_normalize_header(header)) for header in headers]
+
+    for row_number, values in enumerate(rows, start=2):
+        # Skip blank lines
+        if not any(value not in (None, '') for value in values):
+            continue
+
+        yield row_number, {
+            name: '' if value is None else value
+            for name, value in zip(columns, values)
+            if name
+        }
+
+
+def _format_errors(errors):
+    return "; ".join(f"{field}: {' '.join(messages)}" for field, messages in errors.items())
+
+
+def _existing_serials(serials):
+    """
+    Returns the given serial numbers that are already in the DB (one query).
+    """
+    return set(Asset.objects.filter(serial_number__in=serials).values_list('serial_number', flat=True))
+
+
+def _create_assets(assets):
+    """
+    Inserts assets with one bulk_create() in a transaction, with what the
+    model signals it skips would do (counters, search index, change log).
+    """
+    with transaction.atomic():
+        Asset.objects.bulk_create(assets)
+
+        changes = Counter()
+        for asset in assets:
+            changes.update(counters.asset_counters(asset.status, asset.location, False))
+        counters.adjust(changes)
+        search.index_objects(assets)
+        changelog.record(assets, ChangeLogEntry.ACTION_CREATE)
+
+
+def _import_chunk(chunk, os_options, seen_serials):
+    """
+    Validates one chunk of (row number, data) pairs and inserts its valid
+    rows with one bulk_create(). Returns the created assets and the list of
+    (row number, error message) of the rejected rows.
+    """
+    valid = []
+    errors = []
+    form = AssetImportForm(os_options=os_options)
+
+    for row_number, data in chunk:
+        asset, row_errors = form.clean_row(data)
+        if asset is not None:
+            valid.append((row_number, asset))
+        else:
+            errors.append((row_number, _format_errors(row_errors)))
+
+    existing = _existing_serials([asset.serial_number for _, asset in valid])
+
+    to_create = []
+    for row_number, asset in valid:
+        if asset.serial_number in existing:
+            errors.append((row_number, "serial_number: An asset with this serial number already exists."))
+        elif asset.serial_number in seen_serials:
+            errors.append((row_number, "serial_number: Duplicate serial number in the file."))
+        else:
+            seen_serials.add(asset.serial_number)
+            to_create.append((row_number, asset))
+
+    created = [asset for _, asset in to_create]
+
+    try:
+        _create_assets(created)
+    except IntegrityError:
+        # A serial number was added concurrently and the chunk rolled back:
+        # insert its rows one by one so only the conflicting ones are
+        # rejected (the rows rejected above keep their single error)
+        seen_serials.difference_update(asset.serial_number for asset in created)
+        created = []
+
+        for row_number, asset in to_create:
+            # Set by the rolled back bulk_create()
+            asset.pk = None
+
+            try:
+                _create_assets([asset])
+            except IntegrityError:
+                errors.append((row_number, "serial_number: An asset with this serial number already exists."))
+            else:
+                seen_serials.add(asset.serial_number)
+                created.append(asset)
+
+    errors.sort()
+    return created, errors
+
+
+def import_assets(rows, chunk_size=CHUNK_SIZE):
+    """
+    Imports assets from (row number, data) pairs (see iter_rows()) in
+    chunks of chunk_size rows.
+
+    Rows are validated with the AssetForm rules, serial numbers are checked
+    against the DB with one query per chunk, and the valid rows of a chunk
+    are inserted with one bulk_create() in their own transaction, so a bad
+    row only rejects itself.
+
+    Yields one report per chunk: {"rows": rows read so far, "created":
+    assets created by the chunk, "errors": [(row number, message)]}.
+    """
+    os_options = {option.name.lower(): option for option in OSOption.objects.all()}
+    seen_serials = set()
+    rows_read = 0
+    chunk = []
+
+    def flush():
+        created, errors = _import_chunk(chunk, os_options, seen_serials)
+        if created:
+            invalidation.bump(Asset)
+
+        return {"rows": rows_read, "created": len(created), "errors": errors}
+
+    for row in rows:
+        chunk.append(row)
+        rows_read += 1
+
+        if len(chunk) >= chunk_size:
+            yield flush()
+            chunk = []
+
+    if chunk:
+        yield flush()
@@ -0,0 +1,55 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Per-model data versions kept in the Django cache. Cached results derived
+# from a model's rows put its version in their cache key; saving or
+# deleting a row bumps the version (see signals.py), so stale entries are
+# never read again. Bulk writes that bypass signals call bump() themselves.
+# A culled version key only costs misses: it comes back as a new version.
+
+def _key(model):
+    return f"inventory:version:{model._meta.label_lower}"
+
+
+def bump(*models):
+    """
+    Marks the data of the given models as changed. The new version is the
+    current time, which also serves as their last-modified timestamp.
+
+    Inside a transaction the version changes once it commits (and not at
+    all on rollback): bumped earlier, a concurrent read could cache the
+    pre-commit data under the new version, where it would stay stale.
+    """
+    def set_versions():
+        now = time.time()
+        cache.set_many({_key(model): now for model in models}, None)
+
+    transaction.on_commit(set_versions)
+
+
+def get_versions(*models):
+    """
+    Returns the current version (a timestamp) of each given model.
+    Models without a version yet get one now.
+    """
+    keys = [_key(model) for model in models]
+    versions = cache.get_many(keys)
+
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, None)
+        versions.update(cache.get_many(missing))
+
+    return [versions.get(key, 0) for key in keys]
+
+
+def get_version(*models):
+    """
+    Returns one string combining the versions of the given models, for use
+    in cache keys.
+    """
+    return "-".join(f"{version:.6f}" for version in get_versions(*models))
@@ -0,0 +1,468 @@
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+
+from . import entra_sync, exports, importers
+from .filters import filter_assets, filter_assignments
+from .models import Asset, Assignment, Job
+from .sorting import apply_sort, order_queryset
+
+logger = logging.getLogger(__name__)
+
+# Background jobs stored in the Job table, with no broker: views and
+# commands enqueue() a job row, the run_jobs worker claims due rows with a
+# compare-and-set UPDATE (so several workers can share the table on any
+# backend), runs them and records their progress and outcome on the row,
+# which the management page polls.
+#
+# CPU-bound kinds (validating an import, serializing an export) run in the
+# worker's process pool, the others (the Entra sync waits on Graph) in its
+# threads. A job that raises is queued again after an exponential backoff
+# until max_attempts; a JobInputError means bad input and fails it at once.
+# Retrying an import is safe: rows imported by the failed attempt are
+# rejected as duplicate serial numbers.
+#
+# Uploaded import files and finished exports live in JOB_FILES_DIR, shared
+# by the web and worker processes.
+
+# Seconds between two progress writes of a job
+PROGRESS_INTERVAL = 1.0
+
+# Delay before the first automatic retry, doubled for each further attempt
+RETRY_DELAY = 30
+
+# A running job whose worker sent no heartbeat for this long is given up
+# as crashed (and retried)
+STALE_AFTER = timedelta(minutes=5)
+
+# Seconds between two heartbeats of a job run inline by the worker (see
+# heartbeats()), far below STALE_AFTER
+HEARTBEAT_INTERVAL = 30
+
+# Rejected rows kept in the result of an import job (the rest are counted)
+MAX_IMPORT_ERRORS = 200
+
+# Resources of export jobs (also their sort names, see sorting.py):
+# (columns, row function, list filters, model)
+EXPORT_RESOURCES = {
+    'assets': (exports.ASSET_COLUMNS, exports.asset_export_rows, filter_assets, Asset),
+    'assignments': (exports.ASSIGNMENT_COLUMNS, exports.assignment_export_rows, filter_assignments, Assignment),
+}
+
+
+class JobInputError(Exception):
+    """
+    Raised by a job function when the job can't succeed with its params or
+    files, so it fails without retries. Other errors (including ValueErrors,
+    e.g. from a garbled Graph response) are retried.
+    """
+
+
+# Handed to the job functions: update() records the progress on the job
+# row, at most every PROGRESS_INTERVAL seconds unless forced
+class Progress:
+
+    def __init__(self, job):
+        self.job = job
+        self._written_at = 0.0
+
+    def update(self, done=None, total=None, message=None, force=False):
+        if done is not None:
+            self.job.done = done
+        if total is not None:
+            self.job.total = total
+        if message is not None:
+            self.job.message = message[:255]
+
+        now = time.monotonic()
+        if force or now - self._written_at >= PROGRESS_INTERVAL:
+            self._written_at = now
+            Job.objects.filter(pk=self.job.pk).update(
+                done=self.job.done, total=self.job.total, message=self.job.message, heartbeat_at=timezone.now(),
+            )
+
+
+def job_files_dir():
+    """
+    Returns the directory of the job files (JOB_FILES_DIR), created if
+    missing.
+    """
+    path = Path(settings.JOB_FILES_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def save_upload(upload):
+    """
+    Stores an uploaded file for a job. Returns its name in JOB_FILES_DIR.
+    """
+    name = f"upload-{uuid.uuid4().hex}{Path(upload.name).suffix.lower()}"
+
+    with open(job_files_dir() / name, 'wb') as file:
+        for chunk in upload.chunks():
+            file.write(chunk)
+
+    return name
+
+
+def _count_lines(path):
+    # Counted in binary blocks: fast enough for a progress total, and an
+    # overestimate only for quoted multi-line CSV values
+    lines = 0
+    with open(path, 'rb') as file:
+        while block := file.read(1 << 20):
+            lines += block.count(b'\n')
+    return lines
+
+
+def run_entra_sync(job, progress):
+    """
+    Entra user sync (params: full).
+    """
+    progress.update(0, message="Syncing Entra users", force=True)
+
+    counts = entra_sync.run_sync(
+        full=job.params.get('full', False),
+        progress=lambda applied: progress.update(applied, message=f"{applied} users applied"),
+    )
+    counts.pop('delta_link', None)
+
+    progress.update(message=(
+        f"{counts['mode'].capitalize()} sync: {counts['created']} created, {counts['updated']} updated, "
+        f"{counts['deleted']} deleted"
+    ))
+    return counts
+
+
+def run_import(job, progress):
+    """
+    Asset import (params: file, the upload in JOB_FILES_DIR, and filename,
+    its original name).
+    """
+    path = job_files_dir() / job.params['file']
+    filename = job.params.get('filename', job.params['file'])
+
+    if not path.exists():
+        raise JobInputError(f"The uploaded file of {filename} is gone.")
+
+    total = max(_count_lines(path) - 1, 0) if path.suffix == '.csv' else None
+    progress.update(0, total, f"Importing {filename}", force=True)
+
+    created = rejected = 0
+    errors = []
+
+    with open(path, 'rb') as file:
+        try:
+            for report in importers.import_assets(importers.iter_rows(file, filename)):
+                created += report['created']
+                rejected += len(report['errors'])
+                errors.extend(report['errors'][:MAX_IMPORT_ERRORS - len(errors)])
+
+                progress.update(report['rows'], message=f"{created} assets created, {rejected} rows rejected")
+        except ValueError as error:
+            # An unsupported or undecodable file (see importers.iter_rows())
+            raise JobInputError(f"{filename} can't be read: {error}") from error
+
+    progress.update(total=progress.job.done)
+    return {'filename': filename, 'created': created, 'rejected': rejected, 'errors': errors}
+
+
+def run_export(job, progress):
+    """
+    Asset or assignment export to a file (params: resource, format and
+    query, the list page filters and sort as a query string).
+    """
+    resource = job.params.get('resource')
+    if resource not in EXPORT_RESOURCES:
+        raise JobInputError(f"Unknown export: {resource}.")
+
+    export_format = job.params.get('format')
+    if export_format not in exports.EXPORT_FORMATS:
+        export_format = 'csv'
+
+    columns, export_rows, filter_rows, model = EXPORT_RESOURCES[resource]
+    params = QueryDict(job.params.get('query', ''))
+    queryset, _, sort_field = apply_sort(resource, filter_rows(model.objects.all(), params), params)
+
+    total = queryset.count()
+    progress.update(0, total, f"Exporting {total} {resource}", force=True)
+
+    def counted(rows):
+        for done, row in enumerate(rows, start=1):
+            yield row
+            if done % exports.CHUNK_SIZE == 0:
+                progress.update(done)
+
+    name = f"job-{job.pk}-{resource}.{export_format}"
+    partial = job_files_dir() / f"{name}.part"
+
+    rows = counted(export_rows(order_queryset(queryset, sort_field)))
+
+    try:
+        with open(partial, 'w', encoding='utf-8', newline='') as file:
+            for chunk in exports.export_chunks(columns, rows, export_format):
+                file.write(chunk)
+
+        # Renamed once complete, so a download never gets a partial file
+        os.replace(partial, job_files_dir() / name)
+    finally:
+        partial.unlink(missing_ok=True)
+
+    Job.objects.filter(pk=job.pk).update(output_file=name)
+
+    progress.update(total, message=f"Exported {total} {resource}")
+    return {'rows': total, 'filename': exports.export_filename(resource, export_format)}
+
+
+# Job kinds: label, job function(job, progress) returning the result,
+# whether it is CPU bound (run in the worker's process pool), attempts
+# before it fails for good, and the permission needed to queue it
+JOB_KINDS = {
+    'entra_sync': {
+        'label': "Entra user sync", 'function': run_entra_sync, 'cpu_bound': False,
+        'max_attempts': 3, 'permission': 'inventory.change_entrauser',
+    },
+    'import_assets': {
+        'label': "Asset import", 'function': run_import, 'cpu_bound': True,
+        'max_attempts': 2, 'permission': 'inventory.add_asset',
+    },
+    'export': {
+        'label': "Export", 'function': run_export, 'cpu_bound': True,
+        'max_attempts': 2, 'permission': 'inventory.view_asset',
+    },
+}
+
+
+def enqueue(kind, params=None, user=None, unique=False):
+    """
+    Queues a job of kind. With unique=True, returns the queued or running
+    job of kind instead if there is one.
+    Returns (job, created).
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}.")
+
+    if unique:
+        pending = Job.objects.filter(
+            kind=kind, status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING],
+        ).order_by('pk').first()
+        if pending is not None:
+            return pending, False
+
+    job = Job.objects.create(
+        kind=kind, params=params or {}, max_attempts=JOB_KINDS[kind]['max_attempts'],
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    return job, True
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+def claim(kinds, worker):
+    """
+    Marks the next due queued job of one of kinds as running for worker.
+    Returns the job, or None if there is none.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.STATUS_QUEUED, run_after__lte=now, kind__in=kinds,
+    ).order_by('run_after', 'pk').values_list('pk', flat=True)
+
+    for pk in candidates[:10]:
+        # Only one worker's UPDATE still finds the job queued
+        claimed = Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, finished_at=None,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+
+    return None
+
+
+def fail_attempt(job, error, retry=True):
+    """
+    Records a failed attempt of a running job: queued again after the
+    backoff delay while attempts remain, else failed.
+    """
+    now = timezone.now()
+    running = Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING)
+
+    if retry and job.attempts < job.max_attempts:
+        delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+        running.update(
+            status=Job.STATUS_QUEUED, error=error, worker='', run_after=now + timedelta(seconds=delay),
+            message=f"Attempt {job.attempts} of {job.max_attempts} failed, retrying in {delay}s",
+        )
+    else:
+        running.update(status=Job.STATUS_FAILED, error=error, finished_at=now, heartbeat_at=now)
+
+
+def run_job(job_id):
+    """
+    Runs a claimed job and records its outcome: succeeded with its result,
+    or a failed attempt (see fail_attempt()). Returns the job.
+    """
+    job = Job.objects.get(pk=job_id)
+    progress = Progress(job)
+
+    try:
+        result = JOB_KINDS[job.kind]['function'](job, progress)
+    except Exception as exc:
+        logger.exception("Job %s failed", job)
+        fail_attempt(job, traceback.format_exc(), retry=not isinstance(exc, JobInputError))
+    else:
+        now = timezone.now()
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.STATUS_SUCCEEDED, result=result, done=job.done, total=job.total,
+            message=job.message, error='', finished_at=now, heartbeat_at=now,
+        )
+        # The uploaded file of an import is only kept for retries
+        if job.kind == 'import_assets':
+            (job_files_dir() / job.params['file']).unlink(missing_ok=True)
+
+    job.refresh_from_db()
+    return job
+
+
+def run_in_worker(job_id):
+    """
+    run_job() for the worker's pools, closing the DB connections of the
+    pool thread or process afterwards. Returns the job status.
+    """
+    try:
+        return run_job(job_id).status
+    finally:
+        connections.close_all()
+
+
+def heartbeat(job_ids):
+    """
+    Marks the running jobs job_ids as alive.
+    """
+    Job.objects.filter(pk__in=job_ids, status=Job.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+
+
+@contextmanager
+def heartbeats(job_ids, interval=HEARTBEAT_INTERVAL):
+    """
+    Marks the running jobs job_ids as alive every interval seconds from a
+    thread of its own, while the block runs. For the jobs the worker runs
+    inline: its loop doesn't send heartbeats meanwhile, and a job waiting
+    on Graph retries can outlast STALE_AFTER.
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    heartbeat(job_ids)
+                except Exception:
+                    logger.exception("Heartbeat of jobs %s failed", job_ids)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, name="job-heartbeat", daemon=True)
+    thread.start()
+
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def recover_stale():
+    """
+    Records a failed attempt for the running jobs without a heartbeat for
+    STALE_AFTER (their worker died). Returns how many there were.
+    """
+    stale = list(Job.objects.filter(status=Job.STATUS_RUNNING, heartbeat_at__lt=timezone.now() - STALE_AFTER))
+
+    for job in stale:
+        fail_attempt(job, f"Worker {job.worker} stopped responding.")
+
+    return len(stale)
+
+
+def release(job_ids):
+    """
+    Queues the running jobs job_ids again without counting their attempt
+    (their worker is shutting down).
+    """
+    Job.objects.filter(pk__in=job_ids, status=Job.STATUS_RUNNING).update(
+        status=Job.STATUS_QUEUED, attempts=F('attempts') - 1, worker='', run_after=timezone.now(),
+    )
+
+
+def retry(job):
+    """
+    Queues a failed job again, with all its attempts. Returns whether it
+    was failed.
+    """
+    return bool(Job.objects.filter(pk=job.pk, status=Job.STATUS_FAILED).update(
+        status=Job.STATUS_QUEUED, attempts=0, run_after=timezone.now(), finished_at=None, worker='', message='',
+    ))
+
+
+def purge(older_than):
+    """
+    Deletes the jobs that finished before older_than (a datetime) and
+    their files. Returns how many were deleted.
+    """
+    finished = Job.objects.filter(
+        status__in=[Job.STATUS_SUCCEEDED, Job.STATUS_FAILED], finished_at__lt=older_than,
+    )
+
+    for job in finished.only('kind', 'params', 'output_file'):
+        for name in [job.output_file, job.params.get('file') if job.kind == 'import_assets' else None]:
+            if name:
+                (job_files_dir() / name).unlink(missing_ok=True)
+
+    return finished.delete()[0]
+
+
+def job_status(job):
+    """
+    Returns the state of job as a JSON-serializable dict, for polling.
+    """
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'label': JOB_KINDS.get(job.kind, {}).get('label', job.kind),
+        'status': job.status,
+        'done': job.done,
+        'total': job.total,
+        'percent': min(100, round(job.done * 100 / job.total)) if job.total else None,
+        'message': job.message,
+        'result': job.result,
+        # Last line of the traceback
+        'error': job.error.strip().splitlines()[-1] if job.error.strip() else '',
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'url': reverse('job_status', args=[job.pk]),
+        'download_url': (
+            reverse('job_download', args=[job.pk])
+            if job.output_file and job.status == Job.STATUS_SUCCEEDED else None
+        ),
+    }
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory import history
+from inventory.models import Asset, EntraUser
+
+class Command(BaseCommand):
+    help = "List who had which asset on a date (or during a period), from the assignment history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "date",
+            help="Date (YYYY-MM-DD) to list the active assignments of, or the start of the period with --until.",
+        )
+        parser.add_argument(
+            "--until",
+            help="End (YYYY-MM-DD, included) of the period.",
+        )
+        parser.add_argument(
+            "--serial",
+            help="Only the assignments of the asset with this serial number.",
+        )
+        parser.add_argument(
+            "--upn",
+            help="Only the assignments of the Entra user with this UPN.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=50,
+            help="Number of assignments to list, newest first (0 for all).",
+        )
+
+    def handle(self, *args, **options):
+        start = history.parse_day(options["date"])
+        end = history.parse_day(options["until"]) if options["until"] else start
+
+        if start is None or end is None:
+            raise CommandError("Dates must be YYYY-MM-DD.")
+
+        asset = entra_user = None
+
+        if options["serial"]:
+            asset = Asset.objects.filter(serial_number=options["serial"]).first()
+            if asset is None:
+                raise CommandError(f"No asset with serial number {options['serial']}.")
+
+        if options["upn"]:
+            entra_user = EntraUser.objects.filter(upn__iexact=options["upn"]).first()
+            if entra_user is None:
+                raise CommandError(f"No Entra user with UPN {options['upn']}.")
+
+        begin = time.perf_counter()
+
+        assignments = history.assignments_between(start, end, asset=asset, entra_user=entra_user)
+        assignments = assignments.order_by("-assigned_date", "-pk")
+        total = history.count_between(start, end, asset=asset, entra_user=entra_user)
+
+        if options["limit"]:
+            assignments = assignments[:options["limit"]]
+
+        for assignment in assignments:
+            user = assignment.entra_user.upn if assignment.entra_user else "Team / Room"
+            self.stdout.write(
+                f"{assignment.asset.serial_number}\t{assignment.asset.name}\t{user}\t"
+                f"{assignment.assigned_date}\t{assignment.returned_date or '-'}\t{assignment.location}"
+            )
+
+        period = f"on {start}" if start == end else f"between {start} and {end}"
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} assignments active {period} ({(time.perf_counter() - begin) * 1000:.1f} ms)"
+        ))
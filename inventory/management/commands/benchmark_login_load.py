@@ -0,0 +1,236 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from inventory.fake_microsoft import FakeMicrosoftApp, reroute
+from inventory.graph_client import login_client
+
+# Load test of the sign-in callback (views.ms_callback) served by uvicorn,
+# one worker process, as assets_manager.asgi would be deployed. The
+# Microsoft endpoints are answered by a FakeMicrosoftApp (its own uvicorn
+# process) after a simulated latency, and the site runs on a throwaway test
+# database. Both run in spawned processes, which import this module before
+# Django is set up: no models or views at the top.
+
+# Seconds to wait for a server process to accept connections
+STARTUP_TIMEOUT = 30
+
+# Seconds between two samples of the server's threads and memory
+SAMPLE_INTERVAL = 0.05
+
+
+def serve_fake(port, latency):
+    import uvicorn
+
+    uvicorn.run(FakeMicrosoftApp(latency), host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+
+
+def serve_site(port, database, fake_url):
+    """
+    Runs the site in this (new) process with uvicorn, on the test database,
+    sending its Microsoft requests to fake_url.
+    """
+    import uvicorn
+    from django.core.asgi import get_asgi_application
+    from django.test import override_settings
+
+    settings.DATABASES["default"]["NAME"] = database
+    application = get_asgi_application()
+
+    override_settings(
+        DEBUG=False,
+        ALLOWED_HOSTS=["127.0.0.1"],
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ).enable()
+    reroute(fake_url, login_client.session)
+
+    uvicorn.run(application, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_listening(process, port):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise CommandError(f"The server process exited with code {process.exitcode}.")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+
+    raise CommandError(f"Nothing listens on port {port} after {STARTUP_TIMEOUT} s.")
+
+
+def _cpu_seconds(pid):
+    # User + system CPU time of a process (Linux /proc)
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _threads_and_rss(pid):
+    # Number of threads and resident memory (MB) of a process (Linux /proc)
+    values = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            name, _, value = line.partition(":")
+            values[name] = value.split()
+    return int(values["Threads"][0]), int(values["VmRSS"][0]) / 1024
+
+
+class Command(BaseCommand):
+    help = "Load test the Microsoft sign-in callback under uvicorn against a fake Microsoft with a simulated latency (Linux)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--logins",
+            type=int,
+            default=500,
+            help="Number of sign-ins per concurrency level.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            nargs="+",
+            default=[10, 100, 500],
+            help="Numbers of sign-ins in flight at once.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=200,
+            help="Milliseconds each Microsoft request (token exchange, Graph /me) takes.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        For each --concurrency, sends --logins sign-in callbacks (each
+        without cookies, like a new user) with that many in flight,
+        and reports the logins per second and latencies, and the server
+        process' CPU per login and peak threads and memory. The load
+        generator and the fake run on the same host: only the server's own
+        CPU time is counted.
+        """
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError("The login load test requires the uvicorn package.")
+
+        if options["logins"] < 1 or min(options["concurrency"]) < 1:
+            raise CommandError("--logins and --concurrency must be positive.")
+        if connection.vendor != "sqlite":
+            raise CommandError("The login load test runs on a SQLite test database.")
+
+        spawn = multiprocessing.get_context("spawn")
+        fake_port = _free_port()
+        fake = spawn.Process(target=serve_fake, args=(fake_port, options["latency"] / 1000), daemon=True)
+        fake.start()
+
+        # A test database in a file, shared with the server processes
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), "benchmark_login_load.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        database = connection.settings_dict["NAME"]
+        connection.close()
+
+        port = _free_port()
+        server = spawn.Process(target=serve_site, args=(port, database, f"http://127.0.0.1:{fake_port}"), daemon=True)
+        server.start()
+
+        try:
+            _wait_until_listening(fake, fake_port)
+            _wait_until_listening(server, port)
+            asyncio.run(self.load(port, server.pid, options))
+        finally:
+            server.terminate()
+            fake.terminate()
+            server.join(10)
+            fake.join(10)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    async def load(self, port, pid, options):
+        path = f"{reverse('ms_callback')}?code=benchmark"
+
+        # Warm-up: authority discovery and creation of the user
+        succeeded, _ = await self.sign_in(port, path)
+        if not succeeded:
+            raise CommandError("The sign-in callback failed to sign in.")
+
+        for concurrency in options["concurrency"]:
+            await self.run_level(port, path, pid, concurrency, options["logins"])
+
+    async def sign_in(self, port, path):
+        """
+        Sends one sign-in callback on a new connection, without cookies.
+        Returns (succeeded, milliseconds).
+
+        Plain asyncio streams rather than an HTTP client: the load generator
+        shares the CPU with the server and must cost little per request.
+        """
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n\r\n".encode())
+            status_line = await reader.readline()
+            await reader.read()
+            writer.close()
+        except OSError:
+            return False, 0
+
+        return status_line.split()[1:2] == [b"302"], (time.perf_counter() - start) * 1000
+
+    async def run_level(self, port, path, pid, concurrency, logins):
+        queue = asyncio.Queue()
+        for _ in range(logins):
+            queue.put_nowait(None)
+
+        results = []
+        peak = [0, 0.0]
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                results.append(await self.sign_in(port, path))
+
+        async def sample():
+            while True:
+                threads, rss = _threads_and_rss(pid)
+                peak[0], peak[1] = max(peak[0], threads), max(peak[1], rss)
+                await asyncio.sleep(SAMPLE_INTERVAL)
+
+        sampler = asyncio.create_task(sample())
+        cpu_start, start = _cpu_seconds(pid), time.perf_counter()
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+        elapsed, cpu = time.perf_counter() - start, _cpu_seconds(pid) - cpu_start
+        sampler.cancel()
+
+        timings = sorted(ms for succeeded, ms in results if succeeded)
+        failed = len(results) - len(timings)
+
+        if not timings:
+            raise CommandError(f"Every sign-in failed at concurrency {concurrency}.")
+
+        self.stdout.write(
+            f"concurrency {concurrency:>4}: {len(timings) / elapsed:6.1f} logins/s, "
+            f"median {statistics.median(timings):.0f} ms, "
+            f"p95 {timings[min(int(len(timings) * 0.95), len(timings) - 1)]:.0f} ms, "
+            f"server CPU {cpu / logins * 1000:.1f} ms/login, "
+            f"peak {peak[0]} threads, {peak[1]:.0f} MB"
+            + (f", {failed} failed" if failed else "")
+        )
@@ -0,0 +1,75 @@
+import statistics
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from inventory import msal_client
+from inventory.fake_microsoft import FakeMicrosoft
+from inventory.graph_client import login_client
+from inventory.msal_client import build_msal_app, get_msal_app
+
+class Command(BaseCommand):
+    help = "Measure sign-in redirect latency with a new vs. the cached MSAL client"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Number of sign-in redirects to time per mode.",
+        )
+        parser.add_argument(
+            "--fake-latency",
+            type=float,
+            help="Answer the Microsoft requests with a local FakeMicrosoft taking this many milliseconds "
+                 "(no network or app registration needed).",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Times what ms_login does per request (get an MSAL client and build
+        the authorization URL), first creating a new client every time as
+        the views used to, then with the shared client from get_msal_app().
+        """
+        if options["fake_latency"] is None:
+            self.run(options["iterations"])
+            return
+
+        fake = FakeMicrosoft(options["fake_latency"] / 1000)
+        fake.install(login_client.session)
+
+        try:
+            # Per-run caches and a new shared client, so discovery goes to the fake
+            with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}), \
+                    mock.patch.object(msal_client, "_app", None):
+                self.run(options["iterations"])
+        finally:
+            fake.uninstall()
+            fake.stop()
+
+    def run(self, iterations):
+        def build_url(msal_app):
+            return msal_app.get_authorization_request_url(
+                scopes=["User.Read"],
+                redirect_uri=settings.MICROSOFT_REDIRECT_URI,
+            )
+
+        modes = {
+            "new client per request": lambda: build_url(build_msal_app()),
+            "cached client": lambda: build_url(get_msal_app()),
+        }
+
+        for label, sign_in in modes.items():
+            timings = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                sign_in()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(
+                f"{label}: median {statistics.median(timings):.1f} ms, "
+                f"mean {statistics.mean(timings):.1f} ms, max {max(timings):.1f} ms "
+                f"({iterations} runs)"
+            )
@@ -0,0 +1,245 @@
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from inventory import synthetic
+from inventory.models import Asset, Assignment, EntraUser
+from inventory.urls import urlpatterns
+
+# Views that redirect to Microsoft sign-in or end the session, and the
+# pages of a background job (the benchmark doesn't run any)
+SKIPPED = ["ms_login", "ms_callback", "ms_logout", "job_status", "job_download"]
+
+# Query strings for views that need one to do real work
+QUERY_STRINGS = {
+    "search": "q=laptop",
+    "autocomplete_assets": "q=lap",
+    "autocomplete_users": "q=an",
+    "assignment_history": "as_of=2025-06-01",
+}
+
+def git_revision():
+    """
+    Returns (commit hash, uncommitted changes?) of the working tree, or
+    (None, None) outside a git checkout.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+    return commit, bool(status.strip())
+
+def view_urls():
+    """
+    Returns (url name, URL) for every GET-able view of inventory/urls.py,
+    with path arguments filled from the generated data.
+    """
+    asset_id = Asset.objects.order_by("pk").values_list("pk", flat=True)[Asset.objects.count() // 2]
+    objects = {
+        "asset_id": asset_id,
+        # JSON API endpoints, benchmarked on assets
+        "resource": "assets",
+        "pk": asset_id,
+        "user_id": Assignment.objects.filter(entra_user__isnull=False).values_list("entra_user_id", flat=True).first(),
+        "assignment_id": Assignment.objects.filter(returned_date__isnull=True).values_list("pk", flat=True).first(),
+    }
+
+    urls = []
+    for pattern in urlpatterns:
+        if pattern.name in SKIPPED:
+            continue
+
+        kwargs = {name: objects[name] for name in pattern.pattern.converters}
+        url = reverse(pattern.name, kwargs=kwargs)
+        if pattern.name in QUERY_STRINGS:
+            url = f"{url}?{QUERY_STRINGS[pattern.name]}"
+
+        urls.append((pattern.name, url))
+
+    return urls
+
+def request(client, url):
+    """
+    GETs url and reads the whole body (streamed or not).
+    Returns (status code, queries, milliseconds, body bytes).
+    """
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.get(url)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    return response.status_code, len(queries), elapsed_ms, len(body)
+
+class Command(BaseCommand):
+    help = "Benchmark every inventory view on synthetic datasets and write the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000, 10000, 100000],
+            help="Numbers of assets to benchmark at (users: 1/4, assignments: 1.5x).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Timed requests per view, after one warm-up request.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed of the generated datasets.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results to this JSON file.",
+        )
+        parser.add_argument(
+            "--compare",
+            help="JSON results of an earlier run; fail if a view now runs more queries.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Creates a throwaway test database (the real one is never touched)
+        and, for every size, fills it with synthetic.generate() and requests
+        each view through the test client as a superuser:
+        - one warm-up request (cold caches), timed as first_ms
+        - --repeat timed requests, summarized as median_ms and min_ms
+        - one request under tracemalloc for the peak Python memory
+        Query counts are from the last request.
+        """
+        commit, dirty = git_revision()
+        results = {
+            "git_commit": commit,
+            "git_dirty": dirty,
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "seed": options["seed"],
+            "repeat": options["repeat"],
+            "runs": [],
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            # Per-run caches, so nothing is shared with the real site's cache
+            with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+                client = Client()
+                client.force_login(User.objects.create_superuser("benchmark", "benchmark@example.com", None))
+
+                for size in options["sizes"]:
+                    results["runs"].append(self.run_size(client, size, options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options["compare"]:
+            self.compare(results, options["compare"])
+
+    def run_size(self, client, size, options):
+        synthetic.clear()
+        start = time.perf_counter()
+        dataset = synthetic.generate(size, max(size // 4, 1), size * 3 // 2, seed=options["seed"])
+        self.stdout.write(
+            f"\n{dataset['assets']} assets, {dataset['users']} users, {dataset['assignments']} assignments "
+            f"(generated in {time.perf_counter() - start:.1f} s)"
+        )
+
+        views = []
+        for url_name, url in view_urls():
+            _, _, first_ms, _ = request(client, url)
+
+            timings = []
+            for _ in range(options["repeat"]):
+                status, queries, elapsed_ms, size_bytes = request(client, url)
+                timings.append(elapsed_ms)
+
+            tracemalloc.start()
+            request(client, url)
+            peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+            views.append({
+                "url_name": url_name,
+                "url": url,
+                "status": status,
+                "queries": queries,
+                "first_ms": round(first_ms, 2),
+                "median_ms": round(statistics.median(timings), 2) if timings else None,
+                "min_ms": round(min(timings), 2) if timings else None,
+                "peak_kib": round(peak_kib, 1),
+                "response_bytes": size_bytes,
+            })
+            self.stdout.write(
+                f"  {url_name:<24} {status}  {queries:>4} queries  "
+                f"median {views[-1]['median_ms'] or first_ms:>9.1f} ms  peak {peak_kib:>9.0f} KiB"
+            )
+
+        return {**dataset, "views": views}
+
+    def compare(self, results, path):
+        """
+        Prints the query and median time changes against an earlier results
+        file and fails if any view runs more queries than before.
+        """
+        with open(path) as f:
+            baseline = json.load(f)
+
+        previous = {
+            (run["assets"], view["url_name"]): view
+            for run in baseline["runs"]
+            for view in run["views"]
+        }
+
+        regressions = []
+        self.stdout.write(f"\nCompared to {baseline.get('git_commit') or path}:")
+
+        for run in results["runs"]:
+            for view in run["views"]:
+                before = previous.get((run["assets"], view["url_name"]))
+                if before is None:
+                    continue
+
+                change = ""
+                if before["median_ms"] and view["median_ms"]:
+                    change = f"{(view['median_ms'] / before['median_ms'] - 1) * 100:+.0f}% time"
+
+                self.stdout.write(
+                    f"  {run['assets']:>7} {view['url_name']:<24} "
+                    f"queries {before['queries']} -> {view['queries']}  {change}"
+                )
+
+                if view["queries"] > before["queries"]:
+                    regressions.append(f"{view['url_name']} at {run['assets']} assets")
+
+        if regressions:
+            raise CommandError(f"More queries than before: {', '.join(regressions)}")
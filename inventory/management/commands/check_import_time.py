@@ -0,0 +1,137 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that must stay out of plain startup (only needed once Graph/SSO is used)
+DEFAULT_FORBIDDEN = ["azure.identity", "msal", "requests"]
+
+# Budget of the inventory app's own imports (its modules and what they
+# import), in milliseconds: about 4x what they take on a 1-vCPU dev box
+INVENTORY_BUDGET_MS = 100
+
+def measure_imports():
+    """
+    Runs `manage.py check` in a fresh interpreter with -X importtime.
+    Returns (name, depth, cumulative ms) for every imported module, in the
+    order -X importtime prints them (a module after the ones it imports).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "manage.py", "check"],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "assets_manager.settings")},
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        raise CommandError(f"manage.py check failed:\n{result.stderr[-2000:]}")
+
+    # Lines look like "import time:  self [us] | cumulative |   package",
+    # with two more spaces before the name per level of nesting
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(cumulative) / 1000))
+
+    return imports
+
+def package_import_ms(imports, package):
+    """
+    Returns the cumulative import time of package: its outermost modules,
+    including whatever they import.
+
+    -X importtime only sees import statements: modules Django loads with
+    importlib.import_module (models, admin, URLconf) are missing, but
+    what they import is counted.
+    """
+    total_ms = 0.0
+    # Depths of the modules enclosing the current one (parents come
+    # first when reading backwards)
+    enclosing = []
+
+    for name, depth, cumulative_ms in reversed(imports):
+        while enclosing and enclosing[-1][0] >= depth:
+            enclosing.pop()
+
+        in_package = name == package or name.startswith(f"{package}.")
+        if in_package and not any(inside for _, inside in enclosing):
+            total_ms += cumulative_ms
+
+        enclosing.append((depth, in_package))
+
+    return total_ms
+
+class Command(BaseCommand):
+    help = "Measure `python -X importtime manage.py check` and fail on startup-time regressions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            default=None,
+            help="Fail if the total import time exceeds this many milliseconds.",
+        )
+        parser.add_argument(
+            "--forbid",
+            nargs="*",
+            default=DEFAULT_FORBIDDEN,
+            help="Modules that must not be imported at startup.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="Number of slowest top-level imports to print.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the measurements to this JSON file to compare between commits.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Runs `manage.py check` in a fresh interpreter with -X importtime,
+        sums the cumulative time of the top-level imports and checks it
+        against the budget and the list of forbidden modules.
+        tests.ImportTimeTests runs the same checks with INVENTORY_BUDGET_MS.
+        """
+        imports = measure_imports()
+        names = {name for name, _, _ in imports}
+        top_level = {name: cumulative_ms for name, depth, cumulative_ms in imports if depth == 0}
+
+        total_ms = sum(top_level.values())
+        slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:options["top"]]
+        forbidden = [name for name in options["forbid"] if name in names]
+
+        self.stdout.write(
+            f"Total import time: {total_ms:.1f} ms ({len(imports)} modules), "
+            f"inventory {package_import_ms(imports, 'inventory'):.1f} ms"
+        )
+        for name, cumulative_ms in slowest:
+            self.stdout.write(f"  {cumulative_ms:8.1f} ms  {name}")
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({
+                    "total_ms": total_ms,
+                    "modules": len(imports),
+                    "inventory_ms": package_import_ms(imports, "inventory"),
+                    "slowest": slowest,
+                    "forbidden_imported": forbidden,
+                }, f, indent=2)
+
+        if forbidden:
+            raise CommandError(f"Imported at startup but should be lazy: {', '.join(forbidden)}")
+
+        if options["budget_ms"] is not None and total_ms > options["budget_ms"]:
+            raise CommandError(f"Import time {total_ms:.1f} ms exceeds the {options['budget_ms']:.1f} ms budget")
+
+        self.stdout.write(self.style.SUCCESS("Startup import time OK."))
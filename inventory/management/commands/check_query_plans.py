@@ -0,0 +1,337 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db import models
+from django.db.models.functions import Lower
+from inventory import history
+from inventory.autocomplete import prefix_filter
+from inventory.models import Asset, Assignment, ChangeLogEntry, EntraUser
+from inventory.pagination import PAGE_SIZE, _after, _null_tail, can_be_null
+from inventory.sorting import ANNOTATIONS, SORTS, order_queryset
+
+# Model of each list in sorting.SORTS
+LIST_MODELS = {
+    'assets': Asset,
+    'assignments': Assignment,
+    'users': EntraUser,
+}
+
+def hot_queries():
+    """
+    The hot list/filter queries of the views, each with the index (or
+    unique constraint) its plan is expected to use and whether it must
+    seek in it (True) or may walk it in order, as the first page of a
+    sorted list does (False).
+    """
+    today = datetime.date.today()
+
+    return [
+        (
+            "active assignment of an asset",
+            Assignment.objects.filter(asset_id=1, returned_date__isnull=True),
+            "unique_active_assignment_per_asset",
+            True,
+        ),
+        (
+            "active assignments of an asset list (prefetch)",
+            Assignment.objects.filter(asset_id__in=[1, 2, 3], returned_date__isnull=True),
+            "unique_active_assignment_per_asset",
+            True,
+        ),
+        (
+            "asset_list sorted by name",
+            Asset.objects.order_by("name")[:50],
+            "asset_name_idx",
+            False,
+        ),
+        (
+            "asset_list status filter sorted by name",
+            Asset.objects.filter(status=Asset.STATUS_OPERATIONAL).order_by("name")[:50],
+            "asset_status_name_idx",
+            True,
+        ),
+        (
+            "asset_list category filter",
+            Asset.objects.filter(category__in=["Laptop"]),
+            "asset_category_idx",
+            True,
+        ),
+        (
+            "asset_list brand filter",
+            Asset.objects.filter(brand__in=["Dell"]),
+            "asset_brand_idx",
+            True,
+        ),
+        (
+            "asset_list location filter",
+            Asset.objects.filter(location__in=["HQ"]),
+            "asset_location_idx",
+            True,
+        ),
+        (
+            "asset_list purchase date range",
+            Asset.objects.filter(purchase_date__gte=today - datetime.timedelta(days=30), purchase_date__lte=today),
+            "asset_purchase_date_idx",
+            True,
+        ),
+        (
+            "assignment_list sorted by assigned date",
+            Assignment.objects.order_by("-assigned_date")[:50],
+            "assignment_assigned_date_idx",
+            False,
+        ),
+        (
+            "assignment_list returned date range",
+            Assignment.objects.filter(returned_date__gte=today - datetime.timedelta(days=30)),
+            "assignment_returned_date_idx",
+            True,
+        ),
+        (
+            "assignment_list location filter",
+            Assignment.objects.filter(location__in=["HQ"]),
+            "assignment_location_idx",
+            True,
+        ),
+        (
+            "user_list department filter",
+            EntraUser.objects.filter(department__in=["IT"]),
+            "entrauser_department_idx",
+            True,
+        ),
+        (
+            "user_list sorted by display name",
+            EntraUser.objects.order_by("display_name")[:50],
+            "entrauser_display_name_idx",
+            False,
+        ),
+        (
+            "asset_list sorted by model",
+            order_queryset(Asset.objects.all(), "model")[:50],
+            "asset_model_idx",
+            False,
+        ),
+        (
+            "asset_list sorted by status",
+            order_queryset(Asset.objects.all(), "-status")[:50],
+            "asset_status_idx",
+            False,
+        ),
+        (
+            "user_list sorted by status",
+            order_queryset(EntraUser.objects.all(), "is_active")[:50],
+            "entrauser_is_active_idx",
+            False,
+        ),
+        (
+            "autocomplete assets by name",
+            prefix_filter(Asset.objects.all(), "name", "thin").order_by(Lower("name"))[:20],
+            "asset_name_lower_idx",
+            True,
+        ),
+        (
+            "autocomplete assets by serial number",
+            prefix_filter(Asset.objects.all(), "serial_number", "sn-00").order_by(Lower("serial_number"))[:20],
+            "asset_serial_lower_idx",
+            True,
+        ),
+        (
+            "autocomplete users by display name",
+            prefix_filter(EntraUser.objects.all(), "display_name", "jan").order_by(Lower("display_name"))[:20],
+            "entrauser_name_lower_idx",
+            True,
+        ),
+        (
+            "autocomplete users by UPN",
+            prefix_filter(EntraUser.objects.all(), "upn", "jan").order_by(Lower("upn"))[:20],
+            "entrauser_upn_lower_idx",
+            True,
+        ),
+        (
+            "change feed after a position",
+            ChangeLogEntry.objects.filter(seq__gt=1000).order_by("seq")[:1000],
+            column_index(ChangeLogEntry, "seq"),
+            True,
+        ),
+        (
+            "change feed of a kind after a position",
+            ChangeLogEntry.objects.filter(seq__gt=1000, kind__in=["asset"]).order_by("seq")[:1000],
+            "changelog_kind_seq_idx",
+            True,
+        ),
+        (
+            "assignment history as of a date",
+            history.overlapping(Assignment.objects.all(), today, today),
+            history.RANGE_INDEXES.get(connection.vendor),
+            True,
+        ),
+    ] + sort_queries()
+
+def column_index(model, field):
+    """
+    Returns the name of the single-column index (or unique constraint) on
+    the column of a field of model, or None if there is none.
+    """
+    column = model._meta.get_field(field).column
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            # The introspection doesn't name the automatic indexes of
+            # unique columns (sqlite_autoindex_...), which plans do
+            cursor.execute(
+                "SELECT name FROM pragma_index_list(%s) AS il "
+                "WHERE (SELECT group_concat(name) FROM pragma_index_info(il.name)) = %s",
+                [table, column],
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+        constraints = connection.introspection.get_constraints(cursor, table)
+
+    for name, constraint in constraints.items():
+        if constraint["columns"] == [column] and (constraint["index"] or constraint["unique"]) and not constraint["primary_key"]:
+            return name
+
+    return None
+
+def sort_queries():
+    """
+    The next-page queries of paginate_keyset() for every sort key of the
+    lists that is a plain column (see sorting.SORTS), in both directions:
+    each must seek to the cursor in the column's index, not walk it from
+    the start. For nullable columns, also the queries reading the NULL
+    rows at the end.
+    """
+    today = datetime.date.today()
+    queries = []
+
+    for name, sorts in SORTS.items():
+        model = LIST_MODELS[name]
+
+        for field in sorts.values():
+            # Relation and annotation sorts can't seek (see sorting.SORTS)
+            if "__" in field or field in ANNOTATIONS:
+                continue
+
+            index_name = column_index(model, field)
+            model_field = model._meta.get_field(field)
+
+            if isinstance(model_field, models.DateField):
+                value = today
+            elif isinstance(model_field, models.BooleanField):
+                value = True
+            else:
+                value = "m"
+
+            for sort_field in [field, f"-{field}"]:
+                queryset = order_queryset(model.objects.all(), sort_field)
+                pages = [("next page", _after(sort_field, value, 1))]
+
+                if can_be_null(model, field):
+                    pages += [
+                        ("NULL rows", _after(sort_field, None, 1)),
+                        ("first NULL rows", _null_tail(sort_field)),
+                    ]
+
+                for page, condition in pages:
+                    queries.append((
+                        f"{name} list {page} sorted by {sort_field}",
+                        queryset.filter(condition)[:PAGE_SIZE + 1],
+                        index_name,
+                        True,
+                    ))
+
+    return queries
+
+def plan_problems(plan, index_name, seek):
+    """
+    Returns what is wrong with the EXPLAIN output of a hot query (an empty
+    list if nothing): the expected index isn't used, the rows are sorted
+    in a temporary B-tree or, on SQLite, a table is scanned instead of
+    searched (SCAN ... USING INDEX is only an ordered walk of the index,
+    whose cost grows with the position in it).
+    """
+    problems = []
+
+    if index_name is None:
+        problems.append("has no index")
+    elif index_name not in plan:
+        problems.append(f"doesn't use {index_name}")
+
+    if connection.vendor == "sqlite":
+        if "USE TEMP B-TREE" in plan:
+            problems.append("sorts in a temporary B-tree")
+
+        for line in plan.splitlines():
+            _, scan, target = line.partition("SCAN ")
+            # The R*Tree's constrained lookup shows as a virtual table SCAN
+            if not scan or "VIRTUAL TABLE INDEX" in target:
+                continue
+            if seek or "USING" not in target:
+                problems.append(f"scans {target.strip()}")
+
+    return problems
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot inventory queries and fail if one doesn't use its index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the full plan of every query.",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Runs EXPLAIN for every query in hot_queries() and checks it with
+        plan_problems(): the expected index name appears in the plan
+        (SQLite "USING INDEX x", PostgreSQL "Index Scan using x") and, on
+        SQLite, the plan seeks (SEARCH) rather than scans (SCAN). On
+        SQLite, the triggers keeping the assignment R*Tree in sync must
+        exist too (see history.repair_range_index()).
+        tests.QueryPlanTests runs the same checks.
+        """
+        if connection.vendor not in ("sqlite", "postgresql"):
+            raise CommandError(f"Query plans are only checked on SQLite and PostgreSQL, not {connection.vendor}.")
+
+        failures = []
+
+        # The R*Tree of history.overlapping() is only correct while its triggers exist
+        missing = history.missing_range_triggers(connection)
+        if missing:
+            failures.append("assignment range index triggers")
+        status = self.style.ERROR("BAD") if missing else self.style.SUCCESS("ok")
+        self.stdout.write(
+            f"[{status}] assignment range index triggers{': missing ' if missing else ''}{', '.join(missing)}"
+        )
+
+        with connection.cursor() as cursor:
+            # Tiny or empty tables make PostgreSQL prefer sequential scans;
+            # disable them so the plan shows which index would be used
+            if connection.vendor == "postgresql":
+                cursor.execute("SET enable_seqscan = off")
+
+            try:
+                for label, queryset, index_name, seek in hot_queries():
+                    plan = queryset.explain()
+                    problems = plan_problems(plan, index_name, seek)
+
+                    if problems:
+                        failures.append(label)
+
+                    status = self.style.ERROR("BAD") if problems else self.style.SUCCESS("ok")
+                    self.stdout.write(f"[{status}] {label} -> {index_name}{': ' if problems else ''}{', '.join(problems)}")
+
+                    if options["verbose_plans"] or problems:
+                        for line in plan.splitlines():
+                            self.stdout.write(f"        {line}")
+            finally:
+                if connection.vendor == "postgresql":
+                    cursor.execute("RESET enable_seqscan")
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries don't use their index as expected: {', '.join(failures)}")
+
+        self.stdout.write(self.style.SUCCESS("All hot queries use their indexes."))
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory import synthetic
+
+class Command(BaseCommand):
+    help = "Generate a reproducible synthetic inventory (Entra users, assets, assignments)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--assets",
+            type=int,
+            default=1000,
+            help="Number of assets to create.",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=None,
+            help="Number of Entra users to create (default: a quarter of --assets).",
+        )
+        parser.add_argument(
+            "--assignments",
+            type=int,
+            default=None,
+            help="Number of assignments, active and returned (default: 1.5 per asset).",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed; the same seed and sizes give the same data.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete every existing asset, assignment and Entra user first.",
+        )
+
+    def handle(self, *args, **options):
+        assets = options["assets"]
+        users = options["users"] if options["users"] is not None else max(assets // 4, 1)
+        assignments = options["assignments"] if options["assignments"] is not None else assets * 3 // 2
+
+        if min(assets, users, assignments) < 0:
+            raise CommandError("Sizes can't be negative.")
+
+        start = time.perf_counter()
+
+        if options["clear"]:
+            synthetic.clear()
+            self.stdout.write("Deleted the existing inventory")
+
+        created = synthetic.generate(assets, users, assignments, seed=options["seed"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['users']} users, {created['assets']} assets and "
+            f"{created['assignments']} assignments in {time.perf_counter() - start:.1f} s"
+        ))
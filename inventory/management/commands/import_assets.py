@@ -0,0 +1,44 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.importers import CHUNK_SIZE, import_assets, iter_rows
+
+class Command(BaseCommand):
+    help = "Import assets from a CSV or XLSX file (first row: column headers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file to import.")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="Number of rows validated and inserted at a time.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+
+        started = time.perf_counter()
+        rows = created = errors = 0
+
+        with open(path, "rb") as file:
+            try:
+                for report in import_assets(iter_rows(file, path), chunk_size=options["chunk_size"]):
+                    rows = report["rows"]
+                    created += report["created"]
+                    errors += len(report["errors"])
+
+                    for row_number, message in report["errors"]:
+                        self.stderr.write(f"Row {row_number}: {message}")
+
+                    self.stdout.write(f"{rows} rows read, {created} assets created, {errors} rejected")
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Imported {created} of {rows} rows in {time.perf_counter() - started:.1f}s ({errors} rejected)."
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from inventory import search
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of assets, users and assignments"
+
+    def handle(self, *args, **options):
+        counts = search.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            "Search index rebuilt: " + ", ".join(f"{count} {kind}" for kind, count in counts.items()) + "."
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from inventory import counters
+
+class Command(BaseCommand):
+    help = "Recomputes the dashboard counters from the asset and assignment tables"
+
+    def handle(self, *args, **options):
+        before, after = counters.recompute()
+
+        drift = {
+            name: after[name] - before[name]
+            for name in sorted(set(before) | set(after))
+            if after[name] != before[name]
+        }
+
+        for name, delta in drift.items():
+            self.stdout.write(f"{name}: {before[name]} -> {after[name]} ({delta:+d})")
+
+        if drift:
+            self.stdout.write(self.style.WARNING(f"Repaired {len(drift)} drifted counter(s)"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Counters were up to date"))
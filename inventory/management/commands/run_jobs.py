@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory import jobs
+from inventory.models import Job
+
+# Seconds between two purges of the finished jobs
+PURGE_INTERVAL = 3600
+
+class Command(BaseCommand):
+    help = "Run the queued background jobs (Entra sync, asset imports, exports)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Size of the process pool for CPU-bound jobs (imports, exports); 0 runs them in this process.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=2,
+            help="Number of threads for the other jobs (Entra sync); 0 runs them in this process.",
+        )
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=2.0,
+            help="Seconds between two looks at the queue when idle.",
+        )
+        parser.add_argument(
+            "--kind",
+            action="append",
+            choices=list(jobs.JOB_KINDS),
+            help="Only run jobs of this kind (repeatable).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is due, instead of waiting for more.",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Days finished jobs and their files are kept (0 keeps them forever).",
+        )
+
+    def _new_process_pool(self, size):
+        # Spawned rather than forked: children don't share the DB
+        # connections of this process, and set Django up themselves
+        return ProcessPoolExecutor(size, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup)
+
+    def _report(self, job_id):
+        job = Job.objects.get(pk=job_id)
+        name = f"#{job.pk} {job.kind}"
+
+        if job.status == Job.STATUS_SUCCEEDED:
+            self.stdout.write(self.style.SUCCESS(f"Job {name} done: {job.message}"))
+        elif job.status == Job.STATUS_FAILED:
+            self.stdout.write(self.style.ERROR(f"Job {name} failed: {jobs.job_status(job)['error']}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Job {name}: {job.message}"))
+
+    def _stop(self, signum, frame):
+        # systemd and Docker stop the worker with SIGTERM: release the
+        # running jobs like on Ctrl+C instead of leaving them claimed
+        # until their heartbeat goes stale
+        raise KeyboardInterrupt
+
+    def handle(self, *args, **options):
+        if options["processes"] < 0 or options["threads"] < 0:
+            raise CommandError("--processes and --threads can't be negative.")
+
+        previous_handler = signal.signal(signal.SIGTERM, self._stop)
+        try:
+            self._work(options)
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    def _work(self, options):
+        worker = jobs.worker_name()
+        kinds = options["kind"] or list(jobs.JOB_KINDS)
+
+        processes, threads = options["processes"], options["threads"]
+        process_pool = self._new_process_pool(processes) if processes else None
+        thread_pool = ThreadPoolExecutor(threads, thread_name_prefix="job") if threads else None
+
+        # CPU bound or not -> [pool (None: run in this process), size, kinds]
+        pools = {
+            True: [process_pool, processes, [kind for kind in kinds if jobs.JOB_KINDS[kind]["cpu_bound"]]],
+            False: [thread_pool, threads, [kind for kind in kinds if not jobs.JOB_KINDS[kind]["cpu_bound"]]],
+        }
+
+        # Future -> (job id, CPU bound)
+        running = {}
+        purged_at = 0.0
+
+        self.stdout.write(f"Worker {worker} running {', '.join(kinds)} jobs.")
+
+        try:
+            while True:
+                if options["keep_days"] and time.monotonic() - purged_at > PURGE_INTERVAL:
+                    jobs.purge(timezone.now() - timedelta(days=options["keep_days"]))
+                    purged_at = time.monotonic()
+
+                if jobs.recover_stale():
+                    self.stdout.write(self.style.WARNING("Requeued jobs of a worker that stopped responding."))
+
+                started = 0
+                for cpu_bound, (pool, size, pool_kinds) in pools.items():
+                    while pool_kinds:
+                        busy = sum(1 for _, job_cpu_bound in running.values() if job_cpu_bound == cpu_bound)
+                        if pool is not None and busy >= size:
+                            break
+
+                        job = jobs.claim(pool_kinds, worker)
+                        if job is None:
+                            break
+
+                        started += 1
+                        self.stdout.write(f"Started job #{job.pk} {job.kind} (attempt {job.attempts} of {job.max_attempts}).")
+
+                        if pool is None:
+                            try:
+                                with jobs.heartbeats([job.pk]):
+                                    jobs.run_job(job.pk)
+                            except KeyboardInterrupt:
+                                jobs.release([job.pk])
+                                raise
+                            self._report(job.pk)
+                        else:
+                            running[pool.submit(jobs.run_in_worker, job.pk)] = (job.pk, cpu_bound)
+
+                if not running:
+                    if options["once"] and not started:
+                        break
+                    if not started:
+                        time.sleep(options["poll"])
+                    continue
+
+                done, _ = wait(running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+                broken = False
+
+                for future in done:
+                    job_id, cpu_bound = running.pop(future)
+                    try:
+                        future.result()
+                    except BrokenProcessPool:
+                        # A pool process died (e.g. killed for memory): the
+                        # jobs of the pool are failed attempts
+                        jobs.fail_attempt(Job.objects.get(pk=job_id), "The worker process running the job died.")
+                        broken = True
+                    except Exception as error:
+                        # run_job() itself failed (e.g. lost the DB)
+                        jobs.fail_attempt(Job.objects.get(pk=job_id), str(error) or type(error).__name__)
+                    self._report(job_id)
+
+                if broken:
+                    pools[True][0].shutdown(wait=False)
+                    pools[True][0] = self._new_process_pool(pools[True][1])
+
+                jobs.heartbeat([job_id for job_id, _ in running.values()])
+        except KeyboardInterrupt:
+            jobs.release([job_id for job_id, _ in running.values()])
+            self.stdout.write(self.style.WARNING(f"Stopped, {len(running)} running job(s) queued again."))
+        finally:
+            for pool, _, _ in pools.values():
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
@@ -1,47 +1,50 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from inventory.models import EntraUser
-from inventory.graph_api import get_all_users
+from inventory.entra_sync import run_sync
+from inventory.graph_api import PAGE_SIZE
+from inventory.graph_client import graph_client
 
 class Command(BaseCommand):
     help = "Sync Entra users from Microsoft Graph API into the local database"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Fetch every user and soft delete the ones missing from Graph, "
+                 "instead of only fetching changes since the last sync.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of users written to the DB per batch.",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=PAGE_SIZE,
+            help="Number of users requested per Microsoft Graph page.",
+        )
+
     def handle(self, *args, **options):
         """
-        Queries Microsoft Graph for all users and updates the local EntraUser table.
+        Queries Microsoft Graph for changed users (or all users on a full sync)
+        and updates the local EntraUser table page by page.
         """
-        # Fetch all users
-        users = get_all_users()
-
-        # Extract user data for each user to insert into the DB
-        for user_data in users:
-            entra_user_id = user_data.get("id")
-            upn = user_data.get("userPrincipalName")
-            display_name = user_data.get("displayName") or "None"
-            department = user_data.get("department") or "None"
-            is_active = user_data.get("accountEnabled")
-
-            # Update or create the user in the DB
-            EntraUser.objects.update_or_create(
-                entra_user_id=entra_user_id,
-                defaults={
-                    "upn": upn,
-                    "display_name": display_name,
-                    "department": department,
-                    "is_active": is_active,
-                    "deleted_at": None,
-                    }
-            )
+        counts = run_sync(full=options["full"], batch_size=options["batch_size"], page_size=options["page_size"])
 
-        # Get the set of EntraUser IDs returned from Microsoft Graph
-        current_ids = {user_data["id"] for user_data in users}
+        if counts["expired"]:
+            self.stdout.write(self.style.WARNING("Stored delta link expired, ran a full sync."))
 
-        
-        # Mark users missing from Graph as deleted (soft delete)
-        for user in EntraUser.objects.exclude(entra_user_id__in=current_ids):
-            if user.deleted_at is None:  # only stamp once
-                user.deleted_at = timezone.now()
-            user.is_active = False
-            user.save()
+        self.stdout.write(self.style.SUCCESS(
+            f"Entra users synced successfully ({counts['mode']}): "
+            f"{counts['created']} created, {counts['updated']} updated, "
+            f"{counts['unchanged']} unchanged, {counts['deleted']} deleted."
+        ))
 
-        self.stdout.write(self.style.SUCCESS("Entra users synced successfully."))
+        # Cost of Graph throttling during this sync
+        metrics = graph_client.get_metrics()
+        self.stdout.write(
+            f"Graph requests: {metrics['requests']}, retries: {metrics['retries']}, "
+            f"throttled: {metrics['throttled']} ({metrics['throttle_wait_seconds']:.1f}s waited)."
+        )
@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# Per-view cost instrumentation.
+#
+# RequestTimingMiddleware measures, for every request, the number of SQL
+# queries and their time (through a connection execute wrapper), the time
+# spent rendering templates (through TimedDjangoTemplates, the template
+# backend in settings.TEMPLATES) and the total latency, for sync and async
+# views alike (the execute wrapper sits on every DB connection, as async
+# views run their queries on the connections of other threads). It:
+# - adds them to the response as a Server-Timing header (browser dev tools
+#   show it next to the request)
+# - records them per URL name in an in-process rolling window of the last
+#   WINDOW_SIZE requests, dumped as JSON by the metrics view
+# - logs a warning when a view runs more queries than its budget in
+#   settings.QUERY_BUDGETS ({url name: max queries}, 'default' for the rest)
+# Streamed responses are measured until the view returns, not until the
+# last chunk is sent.
+
+# Requests kept per URL name
+WINDOW_SIZE = 500
+
+# Upper bounds (ms) of the latency histogram buckets of metrics()
+LATENCY_BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+METRICS = ['total_ms', 'db_ms', 'template_ms', 'queries']
+
+# Measurements of the request being handled (None outside a request)
+_current = ContextVar('inventory_request_timing', default=None)
+
+_samples = {}
+_samples_lock = threading.Lock()
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, adding the render time of each top-level
+    template to the current request's measurements.
+    """
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return self._wrapped.render(context, request)
+
+        start = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            timing['template_ms'] += (time.perf_counter() - start) * 1000
+
+
+def _record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if timing is not None:
+            timing['queries'] += 1
+            timing['db_ms'] += (time.perf_counter() - start) * 1000
+
+
+def _install(connection, **kwargs):
+    """
+    Adds the query recorder to a DB connection, first, so wrappers pushed
+    and popped by connection.execute_wrapper() stay on top of it.
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+connection_created.connect(_install)
+
+
+def record(url_name, timing):
+    """
+    Adds the measurements of one request to the rolling window of url_name.
+    """
+    with _samples_lock:
+        window = _samples.get(url_name)
+        if window is None:
+            window = _samples[url_name] = deque(maxlen=WINDOW_SIZE)
+        window.append(tuple(timing[metric] for metric in METRICS))
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def metrics():
+    """
+    Returns a summary of the recorded windows:
+    {url name: {'count': n, metric: {'p50', 'p95', 'p99', 'max'}, ...,
+    'latency_histogram': {'<=10ms': n, ..., '>5000ms': n}}}.
+    """
+    with _samples_lock:
+        windows = {url_name: list(window) for url_name, window in _samples.items()}
+
+    summary = {}
+    for url_name, samples in sorted(windows.items()):
+        entry = {'count': len(samples)}
+
+        for index, metric in enumerate(METRICS):
+            values = sorted(sample[index] for sample in samples)
+            entry[metric] = {
+                'p50': round(_percentile(values, 0.50), 2),
+                'p95': round(_percentile(values, 0.95), 2),
+                'p99': round(_percentile(values, 0.99), 2),
+                'max': round(values[-1], 2),
+            }
+
+        histogram = {f'<={bound}ms': 0 for bound in LATENCY_BUCKETS}
+        histogram[f'>{LATENCY_BUCKETS[-1]}ms'] = 0
+        for total_ms, *_ in samples:
+            bucket = next((f'<={bound}ms' for bound in LATENCY_BUCKETS if total_ms <= bound), None)
+            histogram[bucket or f'>{LATENCY_BUCKETS[-1]}ms'] += 1
+        entry['latency_histogram'] = histogram
+
+        summary[url_name] = entry
+
+    return summary
+
+
+def reset():
+    """
+    Clears the recorded windows.
+    """
+    with _samples_lock:
+        _samples.clear()
+
+
+def _server_timing(timing):
+    return ", ".join([
+        f'db;dur={timing["db_ms"]:.1f};desc="{timing["queries"]} queries"',
+        f'tpl;dur={timing["template_ms"]:.1f}',
+        f'total;dur={timing["total_ms"]:.1f}',
+    ])
+
+
+# Measures the queries, template rendering and latency of every request
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        # Connections opened before the middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        timing, token, start = self._begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self._finish(request, response, timing, start)
+
+    async def __acall__(self, request):
+        timing, token, start = self._begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self._finish(request, response, timing, start)
+
+    def _begin(self):
+        timing = {'queries': 0, 'db_ms': 0.0, 'template_ms': 0.0, 'total_ms': 0.0}
+        return timing, _current.set(timing), time.perf_counter()
+
+    def _finish(self, request, response, timing, start):
+        timing['total_ms'] = (time.perf_counter() - start) * 1000
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        url_name = url_name or 'unresolved'
+
+        response['Server-Timing'] = _server_timing(timing)
+        record(url_name, timing)
+
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(url_name, budgets.get('default'))
+        if budget is not None and timing['queries'] > budget:
+            logger.warning(
+                "%s ran %d queries (budget %d) in %.1f ms: %s %s",
+                url_name, timing['queries'], budget, timing['total_ms'], request.method, request.get_full_path(),
+            )
+
+        return response
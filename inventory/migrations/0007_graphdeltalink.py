@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_osoption_alter_assignment_entra_user_asset_os'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphDeltaLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=50, unique=True)),
+                ('delta_link', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+def close_duplicate_active_assignments(apps, schema_editor):
+    """
+    Before adding the one-active-assignment constraint, close every active
+    assignment of an asset except its newest one, on the date the newer
+    assignment started.
+    """
+    Assignment = apps.get_model('inventory', 'Assignment')
+    newer = {}
+
+    active = Assignment.objects.filter(returned_date__isnull=True).order_by('asset_id', '-assigned_date', '-id')
+    for assignment in active:
+        if assignment.asset_id in newer:
+            assignment.returned_date = newer[assignment.asset_id].assigned_date
+            assignment.save(update_fields=['returned_date'])
+        newer[assignment.asset_id] = assignment
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_graphdeltalink'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['name'], name='asset_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['status', 'name'], name='asset_status_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['category'], name='asset_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['brand'], name='asset_brand_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['location'], name='asset_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['purchase_date'], name='asset_purchase_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['assigned_date'], name='assignment_assigned_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['returned_date'], name='assignment_returned_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['location'], name='assignment_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrauser',
+            index=models.Index(fields=['display_name'], name='entrauser_display_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrauser',
+            index=models.Index(fields=['department'], name='entrauser_department_idx'),
+        ),
+        migrations.RunPython(close_duplicate_active_assignments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='assignment',
+            constraint=models.UniqueConstraint(condition=models.Q(('returned_date__isnull', True)), fields=('asset',), name='unique_active_assignment_per_asset', violation_error_message='This asset is already assigned. Close its active assignment first.'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:58
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    """
+    Computes the initial dashboard counters from the existing assets.
+    """
+    from inventory.counters import compute
+
+    Asset = apps.get_model('inventory', 'Asset')
+    DashboardCounter = apps.get_model('inventory', 'DashboardCounter')
+
+    DashboardCounter.objects.bulk_create(
+        DashboardCounter(name=name, value=value) for name, value in compute(Asset).items() if value
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_indexes_and_active_assignment_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:08
+
+from django.db import migrations, models
+
+SQLITE_FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE inventory_search_fts USING fts5(
+        title, body,
+        content='inventory_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER inventory_searchdocument_ai AFTER INSERT ON inventory_searchdocument BEGIN
+        INSERT INTO inventory_search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_searchdocument_ad AFTER DELETE ON inventory_searchdocument BEGIN
+        INSERT INTO inventory_search_fts(inventory_search_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_searchdocument_au AFTER UPDATE ON inventory_searchdocument BEGIN
+        INSERT INTO inventory_search_fts(inventory_search_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO inventory_search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS inventory_searchdocument_ai",
+    "DROP TRIGGER IF EXISTS inventory_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS inventory_searchdocument_au",
+    "DROP TABLE IF EXISTS inventory_search_fts",
+]
+
+# Same expression as search.POSTGRES_VECTOR, so queries can use the index
+POSTGRES_FTS_SQL = [
+    """
+    CREATE INDEX inventory_searchdocument_fts ON inventory_searchdocument USING gin (
+        (setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B'))
+    )
+    """,
+]
+
+POSTGRES_DROP_SQL = ["DROP INDEX IF EXISTS inventory_searchdocument_fts"]
+
+# Documents of the existing rows (same text as search.DOCUMENTS)
+POPULATE_SQL = [
+    """
+    INSERT INTO inventory_searchdocument (kind, object_id, title, body)
+    SELECT 'asset', id, name || ' ' || serial_number, brand || ' ' || model || ' ' || notes
+    FROM inventory_asset
+    """,
+    """
+    INSERT INTO inventory_searchdocument (kind, object_id, title, body)
+    SELECT 'entrauser', id, display_name || ' ' || upn, ''
+    FROM inventory_entrauser
+    """,
+    """
+    INSERT INTO inventory_searchdocument (kind, object_id, title, body)
+    SELECT 'assignment', id, '', location || ' ' || notes
+    FROM inventory_assignment
+    """,
+]
+
+
+def run_sql(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Creates the full-text index of the backend (if it has one), then
+    indexes the existing rows.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run_sql(schema_editor, SQLITE_FTS_SQL)
+    elif vendor == 'postgresql':
+        run_sql(schema_editor, POSTGRES_FTS_SQL)
+
+    run_sql(schema_editor, POPULATE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run_sql(schema_editor, SQLITE_DROP_SQL)
+    elif vendor == 'postgresql':
+        run_sql(schema_editor, POSTGRES_DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.TextField(blank=True)),
+                ('body', models.TextField(blank=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:12
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='asset_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(django.db.models.functions.text.Lower('serial_number'), name='asset_serial_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrauser',
+            index=models.Index(django.db.models.functions.text.Lower('display_name'), name='entrauser_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrauser',
+            index=models.Index(django.db.models.functions.text.Lower('upn'), name='entrauser_upn_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['model'], name='asset_model_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['status'], name='asset_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrauser',
+            index=models.Index(fields=['is_active'], name='entrauser_is_active_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:24
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    # The single row of changelog.SEQUENCE_ID
+    ChangeLogSequence = apps.get_model('inventory', 'ChangeLogSequence')
+    ChangeLogSequence.objects.create(pk=1, last_seq=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('seq', models.BigIntegerField(blank=True, null=True, unique=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'seq'], name='changelog_kind_seq_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeLogSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:40
+
+from django.db import migrations
+
+# Days as YYYYMMDD integers (dates are stored as 'YYYY-MM-DD' text), an
+# active assignment ending on history.OPEN_END; the R*Tree rejects a last
+# day before the first, so such rows cover their first day only
+SQLITE_FIRST_DAY = "CAST(replace({row}.assigned_date, '-', '') AS INTEGER)"
+SQLITE_LAST_DAY = (
+    "max(CAST(replace({row}.assigned_date, '-', '') AS INTEGER), "
+    "COALESCE(CAST(replace({row}.returned_date, '-', '') AS INTEGER), 99991231))"
+)
+
+
+def _days(row):
+    return SQLITE_FIRST_DAY.format(row=row), SQLITE_LAST_DAY.format(row=row)
+
+
+SQLITE_RTREE_SQL = [
+    "CREATE VIRTUAL TABLE inventory_assignment_rtree USING rtree_i32(id, first_day, last_day)",
+    """
+    CREATE TRIGGER inventory_assignment_rtree_ai AFTER INSERT ON inventory_assignment BEGIN
+        INSERT INTO inventory_assignment_rtree (id, first_day, last_day) VALUES (new.id, %s, %s);
+    END
+    """ % _days('new'),
+    """
+    CREATE TRIGGER inventory_assignment_rtree_au AFTER UPDATE OF id, assigned_date, returned_date
+    ON inventory_assignment BEGIN
+        DELETE FROM inventory_assignment_rtree WHERE id = old.id;
+        INSERT INTO inventory_assignment_rtree (id, first_day, last_day) VALUES (new.id, %s, %s);
+    END
+    """ % _days('new'),
+    """
+    CREATE TRIGGER inventory_assignment_rtree_ad AFTER DELETE ON inventory_assignment BEGIN
+        DELETE FROM inventory_assignment_rtree WHERE id = old.id;
+    END
+    """,
+    # Intervals of the existing rows
+    """
+    INSERT INTO inventory_assignment_rtree (id, first_day, last_day)
+    SELECT id, %s, %s FROM inventory_assignment a
+    """ % _days('a'),
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS inventory_assignment_rtree_ai",
+    "DROP TRIGGER IF EXISTS inventory_assignment_rtree_au",
+    "DROP TRIGGER IF EXISTS inventory_assignment_rtree_ad",
+    "DROP TABLE IF EXISTS inventory_assignment_rtree",
+]
+
+# Same expression as history.PERIOD_SQL, so queries can use the index
+POSTGRES_GIST_SQL = [
+    """
+    CREATE INDEX inventory_assignment_period_gist ON inventory_assignment USING gist (
+        daterange(assigned_date, CASE WHEN returned_date < assigned_date
+        THEN assigned_date ELSE returned_date END, '[]')
+    )
+    """,
+]
+
+POSTGRES_DROP_SQL = ["DROP INDEX IF EXISTS inventory_assignment_period_gist"]
+
+
+def run_sql(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_range_index(apps, schema_editor):
+    """
+    Creates the assignment period index of the backend, if it has one
+    (see history.py).
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run_sql(schema_editor, SQLITE_RTREE_SQL)
+    elif vendor == 'postgresql':
+        run_sql(schema_editor, POSTGRES_GIST_SQL)
+
+
+def drop_range_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        run_sql(schema_editor, SQLITE_DROP_SQL)
+    elif vendor == 'postgresql':
+        run_sql(schema_editor, POSTGRES_DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_changelog'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_range_index, drop_range_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name='os',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.osoption', verbose_name='OS'),
+        ),
+    ]
@@ -1,4 +1,9 @@
-from django.db import models
+from collections import Counter
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 # Operating System (OS) options 
@@ -8,8 +13,17 @@ class OSOption(models.Model):
     def __str__(self):
         return self.name
     
+# Runs save() and its post_save handlers (change log, counters, search
+# index) in one transaction, joining the caller's if there is one, so a
+# row and its change log entry are committed together
+class AtomicSaveMixin:
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
 # Entra Users table to sync with Microsoft Graph API
-class EntraUser(models.Model):
+class EntraUser(AtomicSaveMixin, models.Model):
     entra_user_id = models.CharField(max_length=36, unique=True)
     display_name = models.CharField(max_length=100, blank=True)
     upn = models.EmailField(unique=True)
@@ -17,11 +31,201 @@ class EntraUser(models.Model):
     department = models.CharField(max_length=50, blank=True)
     deleted_at = models.DateField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # user_list default sort and department filter
+            models.Index(fields=['display_name'], name='entrauser_display_name_idx'),
+            models.Index(fields=['department'], name='entrauser_department_idx'),
+            # user_list sort by status (see sorting.py)
+            models.Index(fields=['is_active'], name='entrauser_is_active_idx'),
+            # Case-insensitive prefix lookups of the autocomplete endpoints
+            models.Index(Lower('display_name'), name='entrauser_name_lower_idx'),
+            models.Index(Lower('upn'), name='entrauser_upn_lower_idx'),
+        ]
+
     def __str__(self):
         return f"{self.display_name} ({self.upn})"
     
+# Microsoft Graph delta links, so the next sync only fetches changes
+class GraphDeltaLink(models.Model):
+    resource = models.CharField(max_length=50, unique=True)
+    delta_link = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.resource
+
+# Keeps the values of TRACKED_FIELDS as last loaded from / saved to the DB
+# in _loaded_values, so signal handlers can tell what a save() changed
+class TrackedFieldsMixin:
+    TRACKED_FIELDS = []
+    _loaded_values = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._tracked_values()
+        return instance
+
+    def _tracked_values(self):
+        # Deferred fields are left out rather than loaded
+        return {name: self.__dict__[name] for name in self.TRACKED_FIELDS if name in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = self._tracked_values()
+
+# Dashboard KPI counters, kept up to date by counters.py
+class DashboardCounter(models.Model):
+    name = models.CharField(max_length=150, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+# Searchable text of assets, users and assignments, one row per object,
+# with a backend-specific full-text index on top (see search.py)
+class SearchDocument(models.Model):
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    title = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+# Append-only feed of Asset, Assignment and EntraUser changes for
+# downstream consumers, ordered by seq (see changelog.py)
+class ChangeLogEntry(models.Model):
+
+    ACTION_CREATE = "create"
+    ACTION_UPDATE = "update"
+    ACTION_DELETE = "delete"
+
+    ACTION_CHOICES = [
+        (ACTION_CREATE, "Create"),
+        (ACTION_UPDATE, "Update"),
+        (ACTION_DELETE, "Delete"),
+    ]
+
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # Field values after the change (None for deletions)
+    data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Position in the feed, given once the entry's transaction has
+    # committed (see changelog.stamp())
+    seq = models.BigIntegerField(null=True, blank=True, unique=True)
+
+    class Meta:
+        indexes = [
+            # Change feed filtered by kind, read in seq order
+            models.Index(fields=['kind', 'seq'], name='changelog_kind_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.kind} {self.object_id}"
+
+# Last feed position given to a change log entry (a single row, locked by
+# changelog.stamp() so stampers take turns)
+class ChangeLogSequence(models.Model):
+    last_seq = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.last_seq)
+
+# Background job (Entra sync, asset import, export) run by the run_jobs
+# worker, with its progress and result (see jobs.py)
+class Job(models.Model):
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=30)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Progress: done out of total (None while unknown) and a status line
+    done = models.BigIntegerField(default=0)
+    total = models.BigIntegerField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True)
+
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    # File written by the job (exports), relative to JOB_FILES_DIR
+    output_file = models.CharField(max_length=255, blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Not claimed before this time (retry backoff)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    # Worker (host:pid) running the job, and its last sign of life
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming the next due job, and finding stale running ones
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} ({self.status})"
+
+    def is_finished(self):
+        """
+        Returns True once the job succeeded or failed for good
+        """
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+# Queryset helpers shared by the asset list/detail views
+class AssetQuerySet(models.QuerySet):
+
+    def with_current_assignment(self):
+        """
+        Prefetches the active Assignment (and its EntraUser) of every asset
+        in one extra query, so is_assigned(), get_current_user() and
+        get_current_location() don't hit the DB once per asset.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'assignments',
+                queryset=Assignment.objects.filter(returned_date__isnull=True).select_related('entra_user').order_by('id'),
+                to_attr='active_assignments',
+            )
+        )
+
+    def unassigned(self):
+        """
+        Assets without an active assignment, including never assigned ones.
+        """
+        return self.exclude(
+            pk__in=Assignment.objects.filter(returned_date__isnull=True).values('asset_id')
+        )
+
 # Assets table for all assets/devices    
-class Asset(models.Model):
+class Asset(AtomicSaveMixin, TrackedFieldsMixin, models.Model):
 
     STATUS_OPERATIONAL = "Operational"
     STATUS_MAINTENANCE = "Maintenance"
@@ -50,16 +254,51 @@ class Asset(models.Model):
     location = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
 
+    objects = AssetQuerySet.as_manager()
+
+    TRACKED_FIELDS = ['status', 'location']
+
+    class Meta:
+        indexes = [
+            # asset_list default sort, and status filter + name sort
+            models.Index(fields=['name'], name='asset_name_idx'),
+            models.Index(fields=['status', 'name'], name='asset_status_name_idx'),
+            # asset_list filters
+            models.Index(fields=['category'], name='asset_category_idx'),
+            models.Index(fields=['brand'], name='asset_brand_idx'),
+            models.Index(fields=['location'], name='asset_location_idx'),
+            models.Index(fields=['purchase_date'], name='asset_purchase_date_idx'),
+            # asset_list sorts (see sorting.py)
+            models.Index(fields=['model'], name='asset_model_idx'),
+            models.Index(fields=['status'], name='asset_status_idx'),
+            # Case-insensitive prefix lookups of the autocomplete endpoints
+            models.Index(Lower('name'), name='asset_name_lower_idx'),
+            models.Index(Lower('serial_number'), name='asset_serial_lower_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.serial_number})"
     
+    def get_active_assignment(self):
+        """
+        Returns the active Assignment (no returned_date), or None.
+        Uses the list prefetched by with_current_assignment() if present,
+        otherwise runs one query and caches the result on the instance.
+        """
+        if not hasattr(self, 'active_assignments'):
+            self.active_assignments = list(
+                self.assignments.filter(returned_date__isnull=True).select_related('entra_user').order_by('id')[:1]
+            )
+
+        return self.active_assignments[0] if self.active_assignments else None
+
     def is_assigned(self):
         """
         Returns True if the asset is currently assigned to a user 
         (it has at least one Assignment without a returned_date).
         Otherwise returns False.
         """
-        return self.assignments.filter(returned_date__isnull=True).exists()
+        return self.get_active_assignment() is not None
     
     def get_current_location(self):
         """
@@ -67,7 +306,7 @@ class Asset(models.Model):
         - If the asset is assigned, returns the location from the active Assignment.
         - If unassigned, returns the location stored in the Asset table.
         """
-        active_assignment = self.assignments.filter(returned_date__isnull=True).first()
+        active_assignment = self.get_active_assignment()
 
         if active_assignment:
             return active_assignment.location
@@ -78,13 +317,58 @@ class Asset(models.Model):
         """
         Returns the EntraUser object currently assigned, or None.
         """
-        active_assignment = self.assignments.filter(returned_date__isnull=True).first()
+        active_assignment = self.get_active_assignment()
         if active_assignment:
             return active_assignment.entra_user
         return None
         
+# Queryset helpers for assignments
+class AssignmentQuerySet(models.QuerySet):
+
+    def mark_returned(self, returned_date=None):
+        """
+        Closes the active assignments of this queryset on returned_date
+        (default: today) and moves their assets to 'Maintenance', the bulk
+        version of setting returned_date and calling save() on each one.
+
+        Costs one SELECT and two UPDATE statements in one transaction,
+        whatever the number of assignments. Model signals are bypassed, so
+        the dashboard counters, change log and cache versions are updated
+        here.
+        Returns the number of assignments closed.
+        """
+        from . import changelog, counters, invalidation
+
+        returned_date = returned_date or timezone.localdate()
+
+        with transaction.atomic():
+            rows = list(self.filter(returned_date__isnull=True).values_list('pk', 'asset_id', 'asset__status'))
+            if not rows:
+                return 0
+
+            assignment_ids = [pk for pk, _, _ in rows]
+            asset_ids = {asset_id for _, asset_id, _ in rows}
+
+            Assignment.objects.filter(pk__in=assignment_ids).update(returned_date=returned_date)
+            Asset.objects.filter(pk__in=asset_ids).update(status=Asset.STATUS_MAINTENANCE)
+
+            # Assets leave their status for Maintenance. Operational ones
+            # become unassigned and leave Operational at once, so
+            # UNASSIGNED_OPERATIONAL doesn't change.
+            moved = Counter(status for _, _, status in rows if status != Asset.STATUS_MAINTENANCE)
+            changes = {counters.STATUS_PREFIX + status: -count for status, count in moved.items()}
+            changes[counters.STATUS_PREFIX + Asset.STATUS_MAINTENANCE] = sum(moved.values())
+            counters.adjust(changes)
+
+            changelog.record_ids(Assignment, assignment_ids)
+            changelog.record_ids(Asset, asset_ids)
+
+        invalidation.bump(Asset, Assignment)
+
+        return len(rows)
+
 # Assignments table to track current and historical asset assignment    
-class Assignment(models.Model):
+class Assignment(AtomicSaveMixin, TrackedFieldsMixin, models.Model):
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name="assignments")
     entra_user = models.ForeignKey(EntraUser, null=True, blank=True, on_delete=models.SET_NULL, related_name="user_assignments")
     assigned_date = models.DateField(default=timezone.now)
@@ -93,6 +377,29 @@ class Assignment(models.Model):
     assignment_reason = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
 
+    objects = AssignmentQuerySet.as_manager()
+
+    TRACKED_FIELDS = ['asset_id', 'returned_date']
+
+    class Meta:
+        constraints = [
+            # An asset has at most one active assignment. The partial unique
+            # index behind it also serves every "active assignment" lookup
+            # (asset_id = ? AND returned_date IS NULL).
+            models.UniqueConstraint(
+                fields=['asset'],
+                condition=models.Q(returned_date__isnull=True),
+                name='unique_active_assignment_per_asset',
+                violation_error_message="This asset is already assigned. Close its active assignment first.",
+            ),
+        ]
+        indexes = [
+            # assignment_list filters and default sort
+            models.Index(fields=['assigned_date'], name='assignment_assigned_date_idx'),
+            models.Index(fields=['returned_date'], name='assignment_returned_date_idx'),
+            models.Index(fields=['location'], name='assignment_location_idx'),
+        ]
+
     def __str__(self):
         return f"{self.asset.name} -> {self.entra_user.display_name if self.entra_user else 'Unassigned'}"
 
@@ -113,21 +420,29 @@ class Assignment(models.Model):
           the related Asset's status is automatically updated to 'Maintenance' and saved.
         - Once an assignment is closed (returned_date filled), the asset enters
             'Maintenance' status until IT prepares it for reuse.
+        - Whether the assignment was active comes from the returned_date it was
+          loaded with (see TrackedFieldsMixin), so no re-read is needed.
+          Use Assignment.objects.filter(...).mark_returned() to close many at once.
         Args:
             *args: Positional arguments passed to the base save() method.
             **kwargs: Keyword arguments passed to the base save() method.  
         """
-        if self.pk:  # Check if this assignment already exists in the DB
+        if not self.pk:
+
+            was_active = False  # New objects can’t trigger the status change
+        elif 'returned_date' in self._loaded_values:
 
-            old_assignment = Assignment.objects.get(pk=self.pk)
-            was_active = not old_assignment.returned_date
+            was_active = not self._loaded_values['returned_date']
         else:
 
-            was_active = False  # New objects can’t trigger the status change
+            # Loaded without returned_date (deferred): fall back to the DB
+            was_active = Assignment.objects.filter(pk=self.pk, returned_date__isnull=True).exists()
 
-        super().save(*args, **kwargs)
+        # The assignment and the asset status change commit together
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
 
-        if self.returned_date and was_active:
+            if self.returned_date and was_active and self.asset.status != Asset.STATUS_MAINTENANCE:
 
-            self.asset.status = Asset.STATUS_MAINTENANCE
-            self.asset.save()
+                self.asset.status = Asset.STATUS_MAINTENANCE
+                self.asset.save(update_fields=['status'])
@@ -0,0 +1,61 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .graph_client import LOGIN_TIMEOUT, login_client
+
+# Django cache key of MSAL's HTTP cache (authority discovery metadata)
+HTTP_CACHE_KEY = "inventory:msal:http_cache"
+
+_app = None
+_lock = threading.Lock()
+
+
+def build_msal_app(http_cache=None):
+    """
+    Creates a new MSAL Confidential Client for the app registration.
+    Creating one runs authority (instance and OIDC) discovery unless
+    http_cache already holds the results.
+
+    The client keeps no tokens: the sign-in callback uses the user's
+    access token once, to read /me, so the tokens of every signed-in user
+    would otherwise pile up in the process-wide client.
+    """
+    import msal
+
+    class DiscardingTokenCache(msal.TokenCache):
+        def add(self, event, now=None):
+            pass
+
+    return msal.ConfidentialClientApplication(
+        client_id=settings.MICROSOFT_CLIENT_ID,
+        authority=settings.MICROSOFT_AUTHORITY,
+        client_credential=settings.MICROSOFT_CLIENT_SECRET,
+        token_cache=DiscardingTokenCache(),
+        http_cache=http_cache,
+        http_client=login_client.session,
+        timeout=LOGIN_TIMEOUT,
+    )
+
+
+def get_msal_app():
+    """
+    Returns the process-wide MSAL Confidential Client, created on first use.
+
+    MSAL's HTTP cache (authority discovery metadata) is loaded from the
+    Django cache, so with a shared cache backend a new worker skips
+    discovery. Tokens are never written to the Django cache.
+    """
+    global _app
+
+    if _app is None:
+        with _lock:
+            if _app is None:
+                http_cache = cache.get(HTTP_CACHE_KEY) or {}
+                _app = build_msal_app(http_cache)
+
+                # Share the discovery results with other workers
+                cache.set(HTTP_CACHE_KEY, dict(http_cache), None)
+
+    return _app
@@ -0,0 +1,202 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+
+# Rows per page for the list views
+PAGE_SIZE = 50
+
+
+def encode_cursor(value, pk):
+    """
+    Encodes the sort value and id of the last row on a page into an opaque,
+    URL-safe cursor string.
+    """
+    payload = json.dumps([value, pk], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor() back into (value, pk).
+    Returns None for a missing or malformed cursor (first page).
+    """
+    if not cursor:
+        return None
+
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+
+    # encode_cursor() only writes scalar values, and integer ids (bool is
+    # an int too)
+    if isinstance(value, (dict, list)) or not isinstance(pk, int) or isinstance(pk, bool):
+        return None
+
+    return value, pk
+
+
+def sort_output_field(queryset, field):
+    """
+    Returns the model field (or the output field of an annotation) that a
+    sort field path like 'asset__name' of queryset ends at.
+    """
+    parts = field.split('__')
+    if parts[0] in queryset.query.annotations:
+        return queryset.query.annotations[parts[0]].output_field
+
+    model = queryset.model
+    for part in parts:
+        model_field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+        model = model_field.related_model
+
+    return model_field
+
+
+def _cursor_position(queryset, sort_field, cursor):
+    # The (value, pk) of a cursor, with the value converted to the type of
+    # the sort field, or None (first page) if it isn't one: cursors come
+    # from the query string, so a tampered one must not reach the filter
+    position = decode_cursor(cursor)
+    if position is None or position[0] is None:
+        return position
+
+    value, pk = position
+    try:
+        return sort_output_field(queryset, sort_field.lstrip('-')).to_python(value), pk
+    except (ValidationError, TypeError, ValueError):
+        return None
+
+
+def get_sort_value(obj, field):
+    """
+    Follows a (possibly related) field path like 'asset__name' on obj.
+    Returns None if any step of the path is empty.
+    """
+    for part in field.split('__'):
+        if obj is None:
+            return None
+        obj = getattr(obj, part)
+
+    return obj
+
+
+def keyset_ordering(sort_field):
+    """
+    Returns the order_by() arguments for a sort field: the field itself
+    (NULLs always last so the cursor condition is backend independent)
+    plus the primary key as a tiebreaker in the same direction.
+    """
+    field = sort_field.lstrip('-')
+
+    if sort_field.startswith('-'):
+        return [F(field).desc(nulls_last=True), '-pk']
+
+    return [F(field).asc(nulls_last=True), 'pk']
+
+
+def _after(sort_field, value, pk):
+    """
+    Builds the filter selecting the rows with a non-NULL sort value that
+    come after (value, pk) in the keyset_ordering() of sort_field, or the
+    NULL rows after pk if value is None.
+
+    The leading range (field >= value) lets the database seek in the index
+    of the field; the NULL rows that follow the non-NULL ones are read by
+    _null_tail() once these run out, as an OR here would turn the seek into
+    a scan of the whole index.
+    """
+    field = sort_field.lstrip('-')
+    op = 'lt' if sort_field.startswith('-') else 'gt'
+
+    # Past the last non-NULL value only NULL rows remain, ordered by pk
+    if value is None:
+        return Q(**{f'{field}__isnull': True, f'pk__{op}': pk})
+
+    return Q(**{f'{field}__{op}e': value}) & (
+        Q(**{f'{field}__{op}': value}) | Q(**{f'pk__{op}': pk})
+    )
+
+
+def can_be_null(model, field):
+    """
+    Returns whether a sort field of model (a field path like 'asset__name',
+    'pk' or an annotation) can be NULL, through a nullable relation or
+    column. Only then do its pages end with the NULL rows.
+    """
+    for part in field.split('__'):
+        try:
+            model_field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+        except FieldDoesNotExist:
+            # An annotation (see sorting.ANNOTATIONS)
+            return True
+
+        if model_field.null:
+            return True
+
+        model = model_field.related_model
+
+    return False
+
+
+def _null_tail(sort_field):
+    # The rows sorted after every non-NULL value (see keyset_ordering())
+    return Q(**{f'{sort_field.lstrip("-")}__isnull': True})
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset, with links to the first and
+    next pages that keep the rest of the query string (filters, sort).
+    """
+
+    def __init__(self, object_list, request, next_cursor):
+        self.object_list = object_list
+        self.is_first = not request.GET.get('cursor')
+        self.next_url = self._url(request, cursor=next_cursor) if next_cursor else None
+        self.first_url = None if self.is_first else self._url(request)
+        self.all_url = self._url(request, stream='1')
+
+    @staticmethod
+    def _url(request, **params):
+        query = request.GET.copy()
+        query.pop('cursor', None)
+        query.pop('stream', None)
+        for key, value in params.items():
+            query[key] = value
+        return f"?{query.urlencode()}"
+
+
+def paginate_keyset(queryset, sort_field, request, page_size=PAGE_SIZE):
+    """
+    Returns the KeysetPage of queryset selected by the 'cursor' GET parameter.
+
+    Rows are ordered by sort_field plus the primary key, and a page starts
+    strictly after the (value, pk) of the previous page's last row, so the
+    database seeks straight to it in the index of sort_field instead of
+    counting past an OFFSET, and pages stay stable while rows are added or
+    removed. A page that reaches the end of the non-NULL values of a
+    nullable sort field is filled up from the NULL rows with a second seek.
+    """
+    queryset = queryset.order_by(*keyset_ordering(sort_field))
+    position = _cursor_position(queryset, sort_field, request.GET.get('cursor'))
+
+    # Fetch one extra row to know whether there is a next page
+    if position:
+        rows = list(queryset.filter(_after(sort_field, *position))[:page_size + 1])
+
+        if position[0] is not None and len(rows) <= page_size and can_be_null(queryset.model, sort_field.lstrip('-')):
+            rows += queryset.filter(_null_tail(sort_field))[:page_size + 1 - len(rows)]
+    else:
+        rows = list(queryset[:page_size + 1])
+
+    next_cursor = None
+
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(get_sort_value(last, sort_field.lstrip('-')), last.pk)
+
+    return KeysetPage(rows, request, next_cursor)
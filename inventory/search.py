@@ -0,0 +1,192 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Asset, Assignment, EntraUser, SearchDocument
+
+# Global search over assets, users and assignments.
+#
+# Each indexed object has one SearchDocument row (title: text that ranks
+# higher, body: the rest), kept up to date by the model signals (see
+# signals.py) and index_objects() calls after bulk writes. The full-text
+# index itself is backend specific and created by migration 0010:
+# - SQLite: the FTS5 table SQLITE_FTS_TABLE over SearchDocument, synced by
+#   triggers, with prefix indexes for typeahead-style queries
+# - PostgreSQL: a GIN index on POSTGRES_VECTOR
+# Other backends fall back to LIKE queries on SearchDocument.
+# Every query term is matched as a prefix ("SN-00" finds "SN-001234").
+
+SQLITE_FTS_TABLE = 'inventory_search_fts'
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')"
+)
+
+# Results returned by search() per kind of object
+RESULT_LIMIT = 20
+
+# Query terms used (longer queries are cut)
+MAX_TERMS = 8
+
+
+def _join(*values):
+    return ' '.join(str(value) for value in values if value)
+
+
+# Model -> function returning the (title, body) of an instance
+DOCUMENTS = {
+    Asset: lambda asset: (
+        _join(asset.name, asset.serial_number),
+        _join(asset.brand, asset.model, asset.notes),
+    ),
+    EntraUser: lambda user: (
+        _join(user.display_name, user.upn),
+        '',
+    ),
+    Assignment: lambda assignment: (
+        '',
+        _join(assignment.location, assignment.notes),
+    ),
+}
+
+
+# Fields read by DOCUMENTS; saves that update none of them skip indexing
+INDEXED_FIELDS = {
+    Asset: {'name', 'serial_number', 'brand', 'model', 'notes'},
+    EntraUser: {'display_name', 'upn'},
+    Assignment: {'location', 'notes'},
+}
+
+
+def _kind(model):
+    return model._meta.model_name
+
+
+def index_objects(objects):
+    """
+    Creates or updates the SearchDocument of each object (all of one
+    model) with one upsert statement per batch.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+
+    document = DOCUMENTS[type(objects[0])]
+    kind = _kind(type(objects[0]))
+
+    documents = []
+    for obj in objects:
+        title, body = document(obj)
+        documents.append(SearchDocument(kind=kind, object_id=obj.pk, title=title, body=body))
+
+    SearchDocument.objects.bulk_create(
+        documents,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['title', 'body'],
+    )
+
+
+def remove_object(obj):
+    """
+    Deletes the SearchDocument of a deleted object.
+    """
+    SearchDocument.objects.filter(kind=_kind(type(obj)), object_id=obj.pk).delete()
+
+
+def rebuild(chunk_size=2000):
+    """
+    Re-creates every SearchDocument from the indexed tables, chunk by chunk.
+    Returns the number of documents per kind.
+    """
+    SearchDocument.objects.all().delete()
+    counts = {}
+
+    for model in DOCUMENTS:
+        counts[_kind(model)] = 0
+        chunk = []
+
+        for obj in model.objects.order_by('pk').iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                index_objects(chunk)
+                counts[_kind(model)] += len(chunk)
+                chunk = []
+
+        index_objects(chunk)
+        counts[_kind(model)] += len(chunk)
+
+    if connection.vendor == 'sqlite':
+        # Compact the FTS index after the mass rewrite
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('optimize')")
+
+    return counts
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def matching_ids(model, query, limit=None):
+    """
+    Returns the ids of the model objects matching every term of query
+    (as prefixes), best matches first.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    kind = _kind(model)
+    limit_sql = 'LIMIT %s' if limit else ''
+    limit_params = [limit] if limit else []
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql = (
+            f"SELECT d.object_id FROM {SQLITE_FTS_TABLE} f "
+            f"JOIN inventory_searchdocument d ON d.id = f.rowid "
+            f"WHERE {SQLITE_FTS_TABLE} MATCH %s AND d.kind = %s "
+            f"ORDER BY bm25({SQLITE_FTS_TABLE}, 10.0, 1.0) {limit_sql}"
+        )
+        params = [match, kind, *limit_params]
+    elif connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        sql = (
+            f"SELECT object_id FROM inventory_searchdocument "
+            f"WHERE ({POSTGRES_VECTOR}) @@ to_tsquery('simple', %s) AND kind = %s "
+            f"ORDER BY ts_rank({POSTGRES_VECTOR}, to_tsquery('simple', %s)) DESC {limit_sql}"
+        )
+        params = [tsquery, kind, tsquery, *limit_params]
+    else:
+        documents = SearchDocument.objects.filter(kind=kind)
+        for term in terms:
+            documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term))
+        ids = documents.values_list('object_id', flat=True)
+        return list(ids[:limit] if limit else ids)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(query, limit=RESULT_LIMIT):
+    """
+    Returns {'assets': [...], 'users': [...], 'assignments': [...]}: up to
+    limit objects of each kind matching query, best matches first.
+    """
+    querysets = {
+        'assets': Asset.objects.all(),
+        'users': EntraUser.objects.all(),
+        'assignments': Assignment.objects.select_related('asset', 'entra_user'),
+    }
+
+    results = {}
+    for name, queryset in querysets.items():
+        ids = matching_ids(queryset.model, query, limit)
+        objects = queryset.in_bulk(ids) if ids else {}
+        results[name] = [objects[pk] for pk in ids if pk in objects]
+
+    return results
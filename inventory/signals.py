@@ -0,0 +1,101 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import changelog, counters, history, invalidation, search
+from .models import Asset, Assignment, ChangeLogEntry, EntraUser, OSOption
+
+
+# Any write to these models changes the data cached from them
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_save, sender=EntraUser)
+@receiver(post_delete, sender=EntraUser)
+@receiver(post_save, sender=OSOption)
+@receiver(post_delete, sender=OSOption)
+def bump_data_version(sender, **kwargs):
+    invalidation.bump(sender)
+
+
+# Dashboard counters
+@receiver(post_save, sender=Asset)
+def asset_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.asset_saved(instance, created)
+
+
+@receiver(post_delete, sender=Asset)
+def asset_deleted(sender, instance, **kwargs):
+    counters.asset_deleted(instance)
+
+
+@receiver(post_save, sender=Assignment)
+def assignment_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.assignment_saved(instance, created)
+
+
+@receiver(post_delete, sender=Assignment)
+def assignment_deleted(sender, instance, **kwargs):
+    counters.assignment_deleted(instance)
+
+
+# Search index
+@receiver(post_save, sender=Asset)
+@receiver(post_save, sender=Assignment)
+@receiver(post_save, sender=EntraUser)
+def index_search_document(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not search.INDEXED_FIELDS[sender] & set(update_fields)):
+        return
+    search.index_objects([instance])
+
+
+@receiver(post_delete, sender=Asset)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=EntraUser)
+def remove_search_document(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+# Change log
+@receiver(post_save, sender=Asset)
+@receiver(post_save, sender=Assignment)
+@receiver(post_save, sender=EntraUser)
+def log_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        changelog.record([instance], ChangeLogEntry.ACTION_CREATE if created else ChangeLogEntry.ACTION_UPDATE)
+
+
+@receiver(post_delete, sender=Asset)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=EntraUser)
+def log_delete(sender, instance, **kwargs):
+    changelog.record([instance], ChangeLogEntry.ACTION_DELETE)
+
+
+@receiver(pre_delete, sender=EntraUser)
+@receiver(pre_delete, sender=OSOption)
+def remember_set_null_rows(sender, instance, **kwargs):
+    instance._set_null_ids = changelog.set_null_ids(instance)
+
+
+@receiver(post_delete, sender=EntraUser)
+@receiver(post_delete, sender=OSOption)
+def log_set_null_rows(sender, instance, **kwargs):
+    model, _ = changelog.SET_NULL_RELATIONS[sender]
+    changelog.record_ids(model, getattr(instance, '_set_null_ids', []))
+
+
+# A migration that rebuilds the assignment table on SQLite drops the
+# triggers of its R*Tree (see history.py)
+@receiver(post_migrate)
+def repair_range_index(sender, using, verbosity=1, stdout=None, **kwargs):
+    if sender.label != 'inventory':
+        return
+
+    repaired = history.repair_range_index(connections[using])
+
+    if repaired and verbosity and stdout is not None:
+        stdout.write(f"  Re-created the R*Tree triggers {', '.join(repaired)} and refilled {history.RTREE_TABLE}.\n")
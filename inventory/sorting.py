@@ -0,0 +1,103 @@
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Assignment
+from .pagination import keyset_ordering
+
+# Sort keys accepted from the 'sort' GET parameter of each list, mapped to
+# the field (or annotation, see ANNOTATIONS) they order by. A leading '-'
+# sorts descending. Unknown keys fall back to the list's default instead of
+# reaching order_by(), so no request can sort on an unindexed column (e.g.
+# notes) or an arbitrary relation, or raise a FieldError.
+#
+# Plain fields are backed by a single-column index, which also holds the row
+# id, so "ORDER BY field, id" (see keyset_ordering()) is an index scan and
+# every next page seeks to its cursor (check_query_plans checks both).
+# Sorts through a relation or on an annotation can't be, but are limited to
+# the columns the list pages display.
+SORTS = {
+    'assets': {
+        'name': 'name',
+        'category': 'category',
+        'brand': 'brand',
+        'model': 'model',
+        'serial_number': 'serial_number',
+        'purchase_date': 'purchase_date',
+        'status': 'status',
+        'location': 'location',
+        'current_user': 'sort_current_user',
+        'current_location': 'sort_current_location',
+    },
+    'assignments': {
+        'asset__name': 'asset__name',
+        'entra_user__upn': 'entra_user__upn',
+        'assigned_date': 'assigned_date',
+        'returned_date': 'returned_date',
+        'location': 'location',
+    },
+    'users': {
+        'display_name': 'display_name',
+        'upn': 'upn',
+        'department': 'department',
+        'is_active': 'is_active',
+    },
+}
+
+DEFAULT_SORTS = {
+    'assets': 'name',
+    'assignments': '-assigned_date',
+    'users': 'display_name',
+}
+
+
+def _active_assignment(field):
+    return Subquery(
+        Assignment.objects.filter(asset=OuterRef('pk'), returned_date__isnull=True).values(field)[:1]
+    )
+
+
+# Annotations computed only when sorting on them. Like the list columns:
+# the current user's UPN (NULL when unassigned), and the active assignment's
+# location, or the asset's own when unassigned.
+ANNOTATIONS = {
+    'sort_current_user': lambda: _active_assignment('entra_user__upn'),
+    'sort_current_location': lambda: Coalesce(_active_assignment('location'), F('location')),
+}
+
+
+def get_sort(name, params):
+    """
+    Returns the sort key requested in params (a QueryDict) for the list
+    name, or its default sort if missing or not allowed.
+    """
+    sort_key = params.get('sort') or DEFAULT_SORTS[name]
+
+    if sort_key.lstrip('-') not in SORTS[name]:
+        return DEFAULT_SORTS[name]
+
+    return sort_key
+
+
+def apply_sort(name, queryset, params):
+    """
+    Prepares queryset for the sort requested in params.
+    Returns (queryset, sort key, sort field): the queryset with any
+    annotation the sort needs, the sort key for the templates, and the field
+    to pass to paginate_keyset() or order_queryset().
+    """
+    sort_key = get_sort(name, params)
+    descending = sort_key.startswith('-')
+    field = SORTS[name][sort_key.lstrip('-')]
+
+    if field in ANNOTATIONS:
+        queryset = queryset.annotate(**{field: ANNOTATIONS[field]()})
+
+    return queryset, sort_key, f"-{field}" if descending else field
+
+
+def order_queryset(queryset, sort_field):
+    """
+    Orders an unpaginated queryset (streamed pages, exports, detail pages)
+    the same way paginate_keyset() does: sort field, then id.
+    """
+    return queryset.order_by(*keyset_ordering(sort_field))
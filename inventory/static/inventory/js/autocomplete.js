@@ -0,0 +1,108 @@
+// Typeahead for <select data-autocomplete-url> (widgets.AutocompleteSelect).
+// The select only holds the chosen option; a text box above it queries the
+// JSON endpoint ({"results": [{"id": 1, "text": "..."}]}) as the user types
+// and puts the picked result in the select.
+(function () {
+    "use strict";
+
+    var DELAY = 250;  // ms of typing pause before a request
+    var MIN_LENGTH = 1;
+
+    function setup(select) {
+        var input = document.createElement("input");
+        input.type = "search";
+        input.className = "form-control mb-1";
+        input.placeholder = "Type to search...";
+        input.autocomplete = "off";
+
+        var list = document.createElement("div");
+        list.className = "list-group position-absolute w-100 shadow";
+        list.style.zIndex = 1000;
+
+        var wrapper = document.createElement("div");
+        wrapper.className = "position-relative";
+        select.parentNode.insertBefore(wrapper, select);
+        wrapper.appendChild(input);
+        wrapper.appendChild(list);
+
+        var timer = null;
+        var controller = null;
+
+        function clear() {
+            list.innerHTML = "";
+        }
+
+        function choose(result) {
+            select.innerHTML = "";
+            select.appendChild(new Option(result.text, result.id, true, true));
+            select.dispatchEvent(new Event("change", { bubbles: true }));
+            input.value = "";
+            clear();
+        }
+
+        function show(results) {
+            clear();
+            results.forEach(function (result) {
+                var item = document.createElement("button");
+                item.type = "button";
+                item.className = "list-group-item list-group-item-action";
+                item.textContent = result.text;
+                item.addEventListener("click", function () { choose(result); });
+                list.appendChild(item);
+            });
+            if (!results.length) {
+                var empty = document.createElement("div");
+                empty.className = "list-group-item text-muted";
+                empty.textContent = "No matches";
+                list.appendChild(empty);
+            }
+        }
+
+        function lookup() {
+            var term = input.value.trim();
+            if (term.length < MIN_LENGTH) {
+                clear();
+                return;
+            }
+
+            // Only the latest request matters
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+
+            var url = select.dataset.autocompleteUrl;
+            url += (url.indexOf("?") === -1 ? "?" : "&") + "q=" + encodeURIComponent(term);
+
+            fetch(url, { signal: controller.signal, headers: { "Accept": "application/json" } })
+                .then(function (response) { return response.json(); })
+                .then(function (data) { show(data.results); })
+                .catch(function (error) {
+                    if (error.name !== "AbortError") {
+                        clear();
+                    }
+                });
+        }
+
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(lookup, DELAY);
+        });
+
+        input.addEventListener("keydown", function (event) {
+            if (event.key === "Escape") {
+                clear();
+            }
+        });
+
+        document.addEventListener("click", function (event) {
+            if (!wrapper.contains(event.target)) {
+                clear();
+            }
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("select[data-autocomplete-url]").forEach(setup);
+    });
+})();
@@ -0,0 +1,83 @@
+// Live progress of the background jobs table of the management page.
+// Rows of unfinished jobs carry data-job-url (the JSON job_status view);
+// each is polled until its job succeeds or fails, filling the cells marked
+// data-job-field from the response.
+(function () {
+    "use strict";
+
+    var INTERVAL = 2000;  // ms between two polls of a job
+
+    function field(row, name) {
+        return row.querySelector('[data-job-field="' + name + '"]');
+    }
+
+    function retryForm(job) {
+        var form = document.createElement("form");
+        form.method = "post";
+
+        var token = document.querySelector('[name="csrfmiddlewaretoken"]').cloneNode();
+        var formType = document.createElement("input");
+        formType.type = "hidden";
+        formType.name = "form_type";
+        formType.value = "job_retry";
+
+        var button = document.createElement("button");
+        button.type = "submit";
+        button.name = "job_id";
+        button.value = job.id;
+        button.className = "btn btn-warning btn-sm";
+        button.textContent = "Retry";
+
+        form.appendChild(token);
+        form.appendChild(formType);
+        form.appendChild(button);
+        return form;
+    }
+
+    function show(row, job) {
+        field(row, "status").textContent = job.status + (job.attempts > 1 ? " (attempt " + job.attempts + ")" : "");
+        field(row, "message").textContent = job.error || job.message;
+
+        var bar = field(row, "percent");
+        bar.style.width = (job.percent || 0) + "%";
+        bar.textContent = job.percent === null ? "" : job.percent + "%";
+
+        var action = field(row, "action");
+        action.innerHTML = "";
+        if (job.download_url) {
+            var link = document.createElement("a");
+            link.href = job.download_url;
+            link.className = "btn btn-success btn-sm";
+            link.textContent = "Download";
+            action.appendChild(link);
+        } else if (job.status === "failed") {
+            action.appendChild(retryForm(job));
+        }
+    }
+
+    function poll(row) {
+        fetch(row.dataset.jobUrl, { headers: { "Accept": "application/json" } })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (job) {
+                show(row, job);
+                if (job.status === "queued" || job.status === "running") {
+                    setTimeout(function () { poll(row); }, INTERVAL);
+                }
+            })
+            .catch(function () {
+                // Server unreachable: try again later
+                setTimeout(function () { poll(row); }, INTERVAL * 5);
+            });
+    }
+
+    document.querySelectorAll("tr[data-job-url]").forEach(function (row) {
+        if (row.dataset.jobUrl) {
+            setTimeout(function () { poll(row); }, INTERVAL);
+        }
+    });
+})();
@@ -0,0 +1,37 @@
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+
+# Marker in a list template where streamed rows are inserted
+ROWS_PLACEHOLDER = '<!-- rows -->'
+
+# Rows fetched from the DB and rendered per chunk
+CHUNK_SIZE = 500
+
+
+def stream_rows(request, template_name, context, rows_template, rows_name, queryset, chunk_size=CHUNK_SIZE):
+    """
+    Streams a list page without loading the whole queryset in memory.
+
+    The page template is rendered once with context['stream'] set, split at
+    ROWS_PLACEHOLDER, and the rows are rendered chunk by chunk from
+    queryset.iterator() between the two halves.
+    """
+    page = render_to_string(template_name, {**context, 'stream': True}, request)
+    head, tail = page.split(ROWS_PLACEHOLDER, 1)
+
+    def generate():
+        yield head
+
+        chunk = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                yield render_to_string(rows_template, {rows_name: chunk}, request)
+                chunk = []
+
+        if chunk:
+            yield render_to_string(rows_template, {rows_name: chunk}, request)
+
+        yield tail
+
+    return StreamingHttpResponse(generate())
@@ -0,0 +1,214 @@
+import datetime
+import random
+import uuid
+
+from django.db import connection, transaction
+
+from . import counters, invalidation, search
+from .models import Asset, Assignment, EntraUser, OSOption, SearchDocument
+
+# Reproducible synthetic inventories for benchmarks and local testing.
+#
+# The same seed and sizes always produce the same rows. Values follow
+# rough real-world distributions: most assets are laptops and operational,
+# a few sites hold most of the inventory, most users are active, and each
+# assignment history runs forward in time from the purchase date with at
+# most one active (unreturned) assignment per asset.
+
+# Rows inserted per bulk_create() call
+BATCH_SIZE = 2000
+
+FIRST_NAMES = [
+    "Anna", "Ben", "Chloe", "David", "Emma", "Felix", "Grace", "Hugo", "Isla", "Jack",
+    "Karin", "Liam", "Maya", "Noah", "Olivia", "Pedro", "Quinn", "Rosa", "Sam", "Tara",
+    "Umar", "Vera", "Will", "Xenia", "Yusuf", "Zoe",
+]
+LAST_NAMES = [
+    "Andersen", "Baker", "Costa", "Dubois", "Evans", "Fischer", "Garcia", "Hansen", "Ito",
+    "Jensen", "Kowalski", "Larsen", "Martin", "Nielsen", "Okafor", "Petersen", "Rossi",
+    "Schmidt", "Taylor", "Usman", "Virtanen", "Wagner", "Young", "Zhang",
+]
+
+# (value, weight) pairs
+DEPARTMENTS = [
+    ("Engineering", 30), ("Sales", 20), ("Operations", 15), ("Support", 12),
+    ("Finance", 8), ("HR", 5), ("IT", 5), ("Legal", 3), ("", 2),
+]
+CATEGORIES = [
+    ("Laptop", 55), ("Monitor", 20), ("Phone", 10), ("Desktop", 8), ("Tablet", 5), ("Other", 2),
+]
+BRANDS = {
+    "Laptop": [("Lenovo", 40), ("Dell", 30), ("Apple", 20), ("HP", 10)],
+    "Monitor": [("Dell", 50), ("LG", 30), ("Samsung", 20)],
+    "Phone": [("Apple", 60), ("Samsung", 40)],
+    "Desktop": [("Dell", 60), ("HP", 40)],
+    "Tablet": [("Apple", 70), ("Samsung", 30)],
+    "Other": [("Logitech", 60), ("Jabra", 40)],
+}
+MODELS = {
+    "Lenovo": ["ThinkPad T14", "ThinkPad X1 Carbon", "ThinkPad E15"],
+    "Dell": ["Latitude 5440", "Latitude 7440", "OptiPlex 7010", "P2723D", "U2723QE"],
+    "Apple": ["MacBook Air", "MacBook Pro", "iPhone 15", "iPad Air"],
+    "HP": ["EliteBook 840", "ProBook 450", "EliteDesk 800"],
+    "LG": ["27UL500", "34WN80C"],
+    "Samsung": ["Galaxy S24", "Galaxy Tab S9", "S27R650"],
+    "Logitech": ["MX Keys", "Rally Bar"],
+    "Jabra": ["Evolve2 65", "Speak 750"],
+}
+OS_NAMES = {
+    "Laptop": [("Windows 11", 60), ("macOS", 20), ("Windows 10", 15), ("Ubuntu", 5)],
+    "Desktop": [("Windows 11", 80), ("Windows 10", 20)],
+    "Phone": [("iOS", 60), ("Android", 40)],
+    "Tablet": [("iOS", 70), ("Android", 30)],
+}
+STATUSES = [
+    (Asset.STATUS_OPERATIONAL, 75), (Asset.STATUS_MAINTENANCE, 8), (Asset.STATUS_DECOMMISSIONED, 6),
+    (Asset.STATUS_PENDING, 5), (Asset.STATUS_RESERVED, 4), (Asset.STATUS_LOST, 2),
+]
+LOCATIONS = [
+    ("HQ", 40), ("Copenhagen", 20), ("London", 15), ("Berlin", 10),
+    ("Warehouse", 8), ("Remote", 5), ("Oslo", 2),
+]
+REASONS = [("New hire", 40), ("Replacement", 30), ("Loan", 20), ("Project", 10)]
+
+# Where assigned assets are used
+ASSIGNED_LOCATIONS = [("HQ", 45), ("Copenhagen", 20), ("London", 15), ("Berlin", 10), ("Remote", 10)]
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def clear():
+    """
+    Deletes every asset, assignment, Entra user and search document with
+    plain DELETE statements (no per-row signals), then resets the counters.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in [SearchDocument, Assignment, Asset, EntraUser]:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+
+    counters.recompute()
+    invalidation.bump(Asset, Assignment, EntraUser)
+
+
+def generate_users(rng, count, prefix):
+    users = []
+    for index in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        is_active = rng.random() < 0.9
+
+        users.append(EntraUser(
+            entra_user_id=str(uuid.UUID(int=rng.getrandbits(128))),
+            display_name=f"{first} {last}",
+            upn=f"{first}.{last}.{prefix}{index}@example.com".lower(),
+            department=_weighted(rng, DEPARTMENTS),
+            is_active=is_active,
+            deleted_at=None if is_active else datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(600)),
+        ))
+
+    return users
+
+
+def generate_assets(rng, count, os_options, today, prefix):
+    assets = []
+    for index in range(count):
+        category = _weighted(rng, CATEGORIES)
+        brand = _weighted(rng, BRANDS[category])
+        os_name = _weighted(rng, OS_NAMES[category]) if category in OS_NAMES else None
+
+        assets.append(Asset(
+            name=f"{category}-{index:06d}",
+            category=category,
+            brand=brand,
+            model=rng.choice(MODELS[brand]),
+            os=os_options.get(os_name),
+            serial_number=f"{prefix}{index:07d}",
+            purchase_date=today - datetime.timedelta(days=rng.randrange(5 * 365)),
+            status=_weighted(rng, STATUSES),
+            location=_weighted(rng, LOCATIONS),
+            notes="" if rng.random() < 0.8 else rng.choice(["Spare charger", "Scratched lid", "Loaner pool"]),
+        ))
+
+    return assets
+
+
+def generate_assignments(rng, count, assets, users, today):
+    """
+    Spreads count assignments over the assets and lays out each asset's
+    history in time order. Only the last assignment of an operational
+    asset, given to an active user, may stay active.
+    """
+    per_asset = {}
+    for _ in range(count):
+        index = rng.randrange(len(assets))
+        per_asset[index] = per_asset.get(index, 0) + 1
+
+    active_users = [user for user in users if user.is_active] or users
+    assignments = []
+
+    for asset_index, total in per_asset.items():
+        asset = assets[asset_index]
+        start = asset.purchase_date
+        span = max((today - start).days, total)
+        step = span // total
+
+        for index in range(total):
+            assigned = start + datetime.timedelta(days=index * step + rng.randrange(max(step // 4, 1)))
+            last = index == total - 1
+            active = last and asset.status == Asset.STATUS_OPERATIONAL and rng.random() < 0.7
+            user = rng.choice(active_users if active else users)
+
+            # Returned by the end of its slot, before the next one starts
+            returned = None
+            if not active:
+                returned = max(min(start + datetime.timedelta(days=(index + 1) * step - 1), today), assigned)
+
+            assignments.append(Assignment(
+                asset=asset,
+                entra_user=user,
+                assigned_date=assigned,
+                returned_date=returned,
+                location=_weighted(rng, ASSIGNED_LOCATIONS),
+                assignment_reason=_weighted(rng, REASONS),
+            ))
+
+    return assignments
+
+
+def generate(assets, users, assignments, seed=0, today=None):
+    """
+    Adds a synthetic inventory of the given sizes to the DB, built from
+    seed (same seed, sizes and today -> same data), with bulk inserts.
+    Dates run up to today (a fixed date by default). The dashboard counters
+    and search index are rebuilt afterwards.
+    Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    today = today or datetime.date(2026, 1, 1)
+
+    os_options = {}
+    for names in OS_NAMES.values():
+        for name, _ in names:
+            os_options[name] = OSOption.objects.get_or_create(name=name)[0]
+
+    # Serial numbers and UPNs unique per seed, so several datasets can coexist
+    prefix = f"SYN{seed}-"
+
+    user_rows = generate_users(rng, users, prefix)
+    asset_rows = generate_assets(rng, assets, os_options, today, prefix)
+
+    with transaction.atomic():
+        EntraUser.objects.bulk_create(user_rows, batch_size=BATCH_SIZE)
+        Asset.objects.bulk_create(asset_rows, batch_size=BATCH_SIZE)
+
+        assignment_rows = generate_assignments(rng, assignments, asset_rows, user_rows, today) if asset_rows and user_rows else []
+        Assignment.objects.bulk_create(assignment_rows, batch_size=BATCH_SIZE)
+
+    # bulk_create() skips the model signals
+    counters.recompute()
+    search.rebuild()
+    invalidation.bump(Asset, Assignment, EntraUser)
+
+    return {"users": len(user_rows), "assets": len(asset_rows), "assignments": len(assignment_rows)}
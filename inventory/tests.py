@@ -1,3 +1,1199 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import io
+import json
+import os
+import signal
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import Group, Permission, User
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import api, changelog, counters, exports, history, importers, invalidation, jobs, middleware, msal_client, search
+from .autocomplete import lookup_assets, lookup_users
+from .fake_microsoft import FakeMicrosoft
+from .graph_client import LOGIN_MAX_RETRIES, LOGIN_MAX_WAIT, login_client
+from .management.commands.check_import_time import (
+    DEFAULT_FORBIDDEN, INVENTORY_BUDGET_MS, measure_imports, package_import_ms,
+)
+from .management.commands.benchmark_views import Command as BenchmarkViewsCommand, view_urls
+from .management.commands.check_query_plans import hot_queries, plan_problems
+from .models import Asset, Assignment, ChangeLogEntry, ChangeLogSequence, EntraUser, GraphDeltaLink, Job, SearchDocument
+from .pagination import _after, _null_tail, can_be_null, encode_cursor, keyset_ordering, paginate_keyset
+
+
+# Keyset pagination (pagination.py)
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime.date(2024, 1, 1)
+        Asset.objects.bulk_create([
+            Asset(
+                name=f"Asset {i % 7}",
+                serial_number=f"SN{i:04d}",
+                # Every third asset has no purchase date, some share one
+                purchase_date=None if i % 3 == 0 else start + datetime.timedelta(days=i % 11),
+            )
+            for i in range(120)
+        ])
+
+    def walk(self, sort_field, page_size=7):
+        """
+        Returns the ids of every page of assets sorted by sort_field, in
+        order, following the next cursors.
+        """
+        factory = RequestFactory()
+        ids, url = [], '/'
+
+        while url is not None:
+            page = paginate_keyset(Asset.objects.all(), sort_field, factory.get(url), page_size)
+            ids.extend(asset.pk for asset in page.object_list)
+            url = page.next_url
+
+        return ids
+
+    def test_pages_follow_the_sort_order(self):
+        for sort_field in ['name', '-name', 'purchase_date', '-purchase_date', 'serial_number']:
+            with self.subTest(sort_field=sort_field):
+                expected = list(
+                    Asset.objects.order_by(*keyset_ordering(sort_field)).values_list('pk', flat=True)
+                )
+                self.assertEqual(self.walk(sort_field), expected)
+
+    def test_null_values_come_last(self):
+        ids = self.walk('purchase_date', page_size=10)
+        nulls = set(Asset.objects.filter(purchase_date__isnull=True).values_list('pk', flat=True))
+
+        self.assertEqual(set(ids[-len(nulls):]), nulls)
+
+    def test_only_nullable_sorts_read_the_null_rows(self):
+        self.assertTrue(can_be_null(Asset, 'purchase_date'))
+        self.assertTrue(can_be_null(Assignment, 'entra_user__upn'))
+        self.assertTrue(can_be_null(Asset, 'sort_current_user'))
+        self.assertFalse(can_be_null(Asset, 'name'))
+        self.assertFalse(can_be_null(Assignment, 'asset__name'))
+        self.assertFalse(can_be_null(Asset, 'pk'))
+
+        # The last page of a NOT NULL sort is a single query
+        cursor = encode_cursor('Asset 6', Asset.objects.order_by('-pk').values_list('pk', flat=True)[5])
+        request = RequestFactory().get('/', {'cursor': cursor})
+
+        with self.assertNumQueries(1):
+            page = paginate_keyset(Asset.objects.all(), 'name', request, page_size=50)
+        self.assertIsNone(page.next_url)
+
+    def test_tampered_cursors_give_the_first_page(self):
+        for sort_field, value, pk in [
+            ('purchase_date', 'Asset 3', 5),
+            ('purchase_date', {'year': 2024}, 5),
+            ('name', ['Asset 3'], 5),
+            ('name', 'Asset 3', True),
+            ('name', 'Asset 3', '5'),
+            ('pk', {'id': 5}, 5),
+            ('pk', 'Asset 3', 5),
+        ]:
+            with self.subTest(sort_field=sort_field, value=value, pk=pk):
+                request = RequestFactory().get('/', {'cursor': encode_cursor(value, pk)})
+                page = paginate_keyset(Asset.objects.all(), sort_field, request, page_size=7)
+                first_page = Asset.objects.order_by(*keyset_ordering(sort_field))[:7]
+
+                self.assertEqual(page.object_list, list(first_page))
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "SQLite query plans")
+    def test_next_pages_seek_in_the_index(self):
+        by_name = Asset.objects.order_by(*keyset_ordering('name'))
+        by_date = Asset.objects.order_by(*keyset_ordering('purchase_date'))
+
+        for plan in [
+            by_name.filter(_after('name', 'Asset 3', 10))[:51].explain(),
+            by_name.filter(_after('-name', 'Asset 3', 10))[:51].explain(),
+            by_date.filter(_after('purchase_date', datetime.date(2024, 1, 5), 10))[:51].explain(),
+            by_date.filter(_after('purchase_date', None, 10))[:51].explain(),
+            by_date.filter(_null_tail('purchase_date'))[:51].explain(),
+        ]:
+            with self.subTest(plan=plan):
+                self.assertIn('SEARCH', plan)
+                self.assertNotIn('SCAN', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+# Local stand-in for the Microsoft Graph users endpoints: /v1.0/users/delta
+# pages through every user (odata.maxpagesize) and ends with a delta link;
+# following a delta link returns the changes queued in `changes` since the
+# last round, or 410 Gone once `expired` is set.
+class FakeGraph:
+
+    def __init__(self, users):
+        self.users = {user['id']: user for user in users}
+        self.changes = []
+        self.expired = False
+        self.requests = []
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake.requests.append(self.path)
+                status, data = fake.respond(urlparse(self.path), self.headers)
+                body = json.dumps(data).encode()
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def respond(self, url, headers):
+        query = parse_qs(url.query)
+        delta_link = f"{self.url}/v1.0/users/delta?deltatoken=latest"
+
+        if url.path != '/v1.0/users/delta':
+            return 404, {}
+
+        # Following a delta link: the changes since the previous round
+        if 'deltatoken' in query:
+            if self.expired:
+                return 410, {'error': {'code': 'syncStateNotFound'}}
+
+            changes, self.changes = self.changes, []
+            return 200, {'value': changes, '@odata.deltaLink': delta_link}
+
+        # Initial round: every user, page by page
+        page_size = int(headers.get('Prefer', 'odata.maxpagesize=999').split('=')[1])
+        skip = int(query.get('skip', ['0'])[0])
+        users = list(self.users.values())
+        data = {'value': users[skip:skip + page_size]}
+
+        if skip + page_size < len(users):
+            data['@odata.nextLink'] = f"{self.url}/v1.0/users/delta?skip={skip + page_size}"
+        else:
+            data['@odata.deltaLink'] = delta_link
+
+        return 200, data
+
+
+def graph_user(number, **properties):
+    return {
+        'id': f"id-{number}",
+        'userPrincipalName': f"user{number}@example.com",
+        'displayName': f"User {number}",
+        'department': 'IT',
+        'accountEnabled': True,
+        **properties,
+    }
+
+
+# Delta sync of the sync_entra_users command (entra_sync.py, graph_api.py)
+# against a FakeGraph
+class SyncEntraUsersTests(TestCase):
+
+    def setUp(self):
+        self.graph = FakeGraph([graph_user(number) for number in range(5)])
+        self.addCleanup(self.graph.stop)
+
+        for patcher in [
+            mock.patch('inventory.graph_api.GRAPH_URL', self.graph.url),
+            mock.patch('inventory.graph_api.get_access_token', return_value='token'),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sync(self, *args):
+        output = io.StringIO()
+        call_command('sync_entra_users', *args, '--page-size', '2', stdout=output)
+        return output.getvalue()
+
+    def test_first_sync_lists_every_user_and_stores_the_delta_link(self):
+        output = self.sync()
+
+        self.assertIn('(full): 5 created', output)
+        self.assertEqual(EntraUser.objects.count(), 5)
+        self.assertEqual(
+            GraphDeltaLink.objects.get(resource='users').delta_link,
+            f"{self.graph.url}/v1.0/users/delta?deltatoken=latest",
+        )
+        # Three pages of two users
+        self.assertEqual(len(self.graph.requests), 3)
+
+    def test_next_sync_only_applies_the_changes(self):
+        self.sync()
+        self.graph.requests.clear()
+        self.graph.changes = [
+            {'id': 'id-1', 'department': 'Sales'},
+            graph_user(9),
+            {'id': 'id-2', '@removed': {'reason': 'changed'}},
+        ]
+
+        output = self.sync()
+
+        self.assertIn('(incremental): 1 created, 1 updated', output)
+        self.assertEqual(self.graph.requests, ['/v1.0/users/delta?deltatoken=latest'])
+
+        user = EntraUser.objects.get(entra_user_id='id-1')
+        # Only the property in the change is updated
+        self.assertEqual((user.department, user.display_name), ('Sales', 'User 1'))
+        self.assertTrue(EntraUser.objects.filter(entra_user_id='id-9').exists())
+        self.assertIsNotNone(EntraUser.objects.get(entra_user_id='id-2').deleted_at)
+        # Users absent from the changes are left alone
+        self.assertTrue(EntraUser.objects.get(entra_user_id='id-3').is_active)
+
+    def test_full_sync_soft_deletes_missing_users(self):
+        self.sync()
+        del self.graph.users['id-4']
+
+        output = self.sync('--full')
+
+        self.assertIn('(full): 0 created, 0 updated, 4 unchanged, 1 deleted', output)
+        self.assertNotIn('deltatoken', ''.join(self.graph.requests))
+
+        missing = EntraUser.objects.get(entra_user_id='id-4')
+        self.assertFalse(missing.is_active)
+        self.assertIsNotNone(missing.deleted_at)
+
+    def test_expired_delta_link_falls_back_to_a_full_sync(self):
+        self.sync()
+        self.graph.expired = True
+        del self.graph.users['id-0']
+
+        output = self.sync()
+
+        self.assertIn('delta link expired', output)
+        self.assertIn('(full):', output)
+        self.assertFalse(EntraUser.objects.get(entra_user_id='id-0').is_active)
+        # The link of the new full round replaces the expired one
+        self.assertEqual(GraphDeltaLink.objects.count(), 1)
+
+
+# Microsoft sign-in views (ms_login, ms_callback, ms_logout) against a
+# FakeMicrosoft
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MicrosoftSignInTests(TestCase):
+
+    def setUp(self):
+        self.microsoft = FakeMicrosoft(latency=0)
+        self.microsoft.install(login_client.session)
+        self.addCleanup(self.microsoft.stop)
+        self.addCleanup(self.microsoft.uninstall)
+
+        patcher = mock.patch.object(msal_client, '_app', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sign_in_and_out(self):
+        response = self.client.get('/login/')
+        self.assertTrue(response['Location'].startswith('https://login.microsoftonline.com/'))
+
+        response = self.client.get('/callback/?code=abc')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+        user = User.objects.get(username='loadtest@example.com')
+        self.assertEqual(user.first_name, 'Load Test')
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.pk)
+        # No tokens are kept in the process-wide MSAL client
+        token_cache = msal_client.get_msal_app().token_cache
+        self.assertEqual(list(token_cache.search(token_cache.CredentialType.ACCESS_TOKEN)), [])
+        self.assertEqual(list(token_cache.search(token_cache.CredentialType.REFRESH_TOKEN)), [])
+        # One authority discovery for both requests
+        self.assertEqual(
+            sum(count for path, count in self.microsoft.requests.items() if 'openid-configuration' in path), 1
+        )
+
+        response = self.client.get('/logout/')
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_throttled_profile_fails_fast(self):
+        self.microsoft.throttled = True
+
+        with mock.patch('inventory.graph_client.time') as clock:
+            response = self.client.get('/callback/?code=abc')
+
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(User.objects.exists())
+        # The 120 s Retry-After is capped by the login client's budget
+        self.assertEqual(self.microsoft.requests['/v1.0/me'], LOGIN_MAX_RETRIES + 1)
+        self.assertEqual([call.args[0] for call in clock.sleep.call_args_list], [LOGIN_MAX_WAIT] * LOGIN_MAX_RETRIES)
+
+
+# Startup import time of manage.py (check_import_time)
+class ImportTimeTests(SimpleTestCase):
+
+    def test_startup_imports_stay_within_budget(self):
+        imports = measure_imports()
+        names = {name for name, _, _ in imports}
+
+        # Graph and SSO libraries are only imported on first use
+        self.assertEqual([name for name in DEFAULT_FORBIDDEN if name in names], [])
+        self.assertLess(package_import_ms(imports, 'inventory'), INVENTORY_BUDGET_MS)
+
+
+# Editing an assignment (AssignmentEditForm, edit_assignment)
+class EditAssignmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.asset = Asset.objects.create(name="Laptop", serial_number="SN1")
+        cls.returned = Assignment.objects.create(
+            asset=cls.asset, assigned_date=datetime.date(2024, 1, 1), returned_date=datetime.date(2024, 6, 1),
+        )
+        cls.active = Assignment.objects.create(asset=cls.asset, assigned_date=datetime.date(2024, 7, 1))
+
+        cls.user = User.objects.create_user('editor')
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_assignment'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_reopening_while_another_assignment_is_active_is_rejected(self):
+        response = self.client.post(
+            f'/assignments/{self.returned.pk}/edit/', {'returned_date': '', 'location': 'HQ', 'notes': ''},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('returned_date', response.context['form'].errors)
+        self.returned.refresh_from_db()
+        self.assertEqual(self.returned.returned_date, datetime.date(2024, 6, 1))
+
+    def test_reopening_once_the_other_assignment_is_returned(self):
+        Assignment.objects.filter(pk=self.active.pk).update(returned_date=datetime.date(2024, 8, 1))
+
+        response = self.client.post(
+            f'/assignments/{self.returned.pk}/edit/', {'returned_date': '', 'location': 'HQ', 'notes': ''},
+        )
+
+        self.assertRedirects(response, '/assignments', fetch_redirect_response=False)
+        self.returned.refresh_from_db()
+        self.assertIsNone(self.returned.returned_date)
+
+    def test_editing_the_active_assignment(self):
+        response = self.client.post(
+            f'/assignments/{self.active.pk}/edit/', {'returned_date': '', 'location': 'Branch', 'notes': 'Dock'},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.active.refresh_from_db()
+        self.assertEqual(self.active.location, 'Branch')
+
+
+# Plans of the hot queries (check_query_plans)
+@unittest.skipUnless(connection.vendor == 'sqlite', "SQLite query plans")
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_use_their_index(self):
+        for label, queryset, index_name, seek in hot_queries():
+            with self.subTest(query=label):
+                self.assertEqual(plan_problems(queryset.explain(), index_name, seek), [])
+
+    def test_scans_are_reported(self):
+        # An unindexed filter, and an index walk where a seek is expected
+        self.assertEqual(
+            plan_problems(Asset.objects.filter(notes='x').explain(), 'asset_name_idx', True),
+            ["doesn't use asset_name_idx", 'scans inventory_asset'],
+        )
+        self.assertEqual(
+            plan_problems(Asset.objects.order_by('name')[:50].explain(), 'asset_name_idx', True),
+            ['scans inventory_asset USING INDEX asset_name_idx'],
+        )
+
+
+# SQLite R*Tree of the assignment periods (history.py, migration 0014)
+@unittest.skipUnless(connection.vendor == 'sqlite', "SQLite R*Tree")
+class RangeIndexTriggerTests(TransactionTestCase):
+
+    def setUp(self):
+        asset = Asset.objects.create(name="Laptop", serial_number="SN1")
+        self.assignment = Assignment.objects.create(asset=asset, assigned_date=datetime.date(2024, 1, 1))
+
+    def alter_location(self, max_length):
+        old_field = Assignment._meta.get_field('location')
+        new_field = old_field.clone()
+        new_field.set_attributes_from_name('location')
+        new_field.max_length = max_length
+
+        with connection.schema_editor() as editor:
+            editor.alter_field(Assignment, old_field, new_field)
+
+    def covering(self, day):
+        return history.count_between(day, day)
+
+    def test_triggers_are_recreated_after_a_table_rebuild(self):
+        self.alter_location(120)
+        try:
+            # The rebuild dropped the triggers: the check fails and the
+            # R*Tree misses the writes
+            self.assertEqual(history.missing_range_triggers(connection), list(history.RTREE_TRIGGERS))
+            with self.assertRaises(CommandError):
+                call_command('check_query_plans', stdout=io.StringIO())
+
+            Assignment.objects.filter(pk=self.assignment.pk).update(returned_date=datetime.date(2024, 1, 10))
+            self.assertEqual(self.covering(datetime.date(2024, 6, 1)), 1)
+
+            emit_post_migrate_signal(0, False, 'default')
+
+            self.assertEqual(history.missing_range_triggers(connection), [])
+            self.assertEqual(self.covering(datetime.date(2024, 6, 1)), 0)
+            self.assertEqual(self.covering(datetime.date(2024, 1, 5)), 1)
+        finally:
+            self.alter_location(100)
+            history.repair_range_index(connection)
+
+
+# Data versions of the cached results (invalidation.py, signals.py)
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class InvalidationTests(TestCase):
+
+    def test_version_changes_when_the_write_commits(self):
+        before = invalidation.get_version(Asset)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Asset.objects.create(name="Laptop", serial_number="SN1")
+                # Readers still see the committed data and its version
+                self.assertEqual(invalidation.get_version(Asset), before)
+
+        self.assertNotEqual(invalidation.get_version(Asset), before)
+
+    def test_rolled_back_write_keeps_the_version(self):
+        before = invalidation.get_version(Asset)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Asset.objects.create(name="Laptop", serial_number="SN1")
+                raise RuntimeError
+
+        self.assertEqual(invalidation.get_version(Asset), before)
+
+
+# Queries of the list pages don't grow with their rows
+class ListQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+    def add_rows(self, start, count):
+        # Runs the on-commit version bumps, so the facet counts are
+        # recomputed like after any write
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(start, start + count):
+                entra_user = EntraUser.objects.create(entra_user_id=str(i), upn=f"user{i}@example.com", display_name=f"User {i}")
+                asset = Asset.objects.create(name=f"Laptop {i}", serial_number=f"SN{i}", location=f"Site {i}")
+                Assignment.objects.create(asset=asset, entra_user=entra_user, assigned_date=datetime.date(2024, 3, 1))
+                Asset.objects.create(name=f"Spare {i}", serial_number=f"SP{i}")
+
+    def test_query_count_is_constant(self):
+        for url in ['/assets/', '/assets/?sort=current_user', '/assignments']:
+            with self.subTest(url=url):
+                self.add_rows(Asset.objects.count(), 2)
+                with CaptureQueriesContext(connection) as few_rows:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+                self.add_rows(Asset.objects.count(), 20)
+                with self.assertNumQueries(len(few_rows)):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+
+# Streamed CSV/JSON exports (exports.py)
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        entra_user = EntraUser.objects.create(entra_user_id="1", upn="ada@example.com", display_name="Ada")
+        cls.laptop = Asset.objects.create(name="Laptop", serial_number="SN1", location="HQ", notes="=HYPERLINK(\"http://x\")")
+        cls.phone = Asset.objects.create(name="-Phone", serial_number="SN2", location="Lab")
+        cls.assignment = Assignment.objects.create(
+            asset=cls.laptop, entra_user=entra_user, assigned_date=datetime.date(2024, 3, 1), location="Remote",
+        )
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_asset_csv(self):
+        rows = list(csv.reader(io.StringIO(self.download('/assets/export/'))))
+
+        self.assertEqual(rows[0], [name for name, _ in exports.ASSET_COLUMNS])
+        phone, laptop = [dict(zip(rows[0], row)) for row in rows[1:]]
+        self.assertEqual(
+            (laptop['name'], laptop['assigned'], laptop['current_user_upn'], laptop['current_location']),
+            ("Laptop", 'True', "ada@example.com", "Remote"),
+        )
+        self.assertEqual((phone['assigned'], phone['current_user_upn'], phone['current_location']), ('False', '', "Lab"))
+
+    def test_formulas_are_escaped_in_csv_only(self):
+        rows = list(csv.reader(io.StringIO(self.download('/assets/export/'))))
+        self.assertEqual([row[1] for row in rows[1:]], ["'-Phone", "Laptop"])
+        self.assertEqual(rows[2][10], "'=HYPERLINK(\"http://x\")")
+
+        assets = json.loads(self.download('/assets/export/', format='json'))
+        self.assertEqual([asset['name'] for asset in assets], ["-Phone", "Laptop"])
+
+        # And read back as exported
+        file = io.BytesIO(self.download('/assets/export/').encode())
+        self.assertEqual([row['name'] for _, row in importers.iter_rows(file, 'assets.csv')], ["-Phone", "Laptop"])
+
+    def test_assignment_csv_and_json(self):
+        rows = list(csv.reader(io.StringIO(self.download('/assignments/export/'))))
+        self.assertEqual(rows[0], [name for name, _ in exports.ASSIGNMENT_COLUMNS])
+        self.assertEqual(rows[1][:7], [str(self.assignment.pk), str(self.laptop.pk), "Laptop", "SN1", "ada@example.com", "Ada", "2024-03-01"])
+
+        [assignment] = json.loads(self.download('/assignments/export/', format='json'))
+        self.assertEqual(
+            (assignment['asset_serial_number'], assignment['assigned_date'], assignment['returned_date']),
+            ("SN1", "2024-03-01", None),
+        )
+
+
+# Per-request cost instrumentation (middleware.py)
+class RequestTimingTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        Asset.objects.create(name="Laptop", serial_number="SN1")
+        middleware.reset()
+        self.addCleanup(middleware.reset)
+
+    def server_timing(self, response):
+        # {name: (duration, description)}
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            params = dict(param.split('=', 1) for param in params)
+            metrics[name] = (float(params['dur']), params.get('desc'))
+        return metrics
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/assets/')
+
+        metrics = self.server_timing(response)
+        self.assertEqual(set(metrics), {'db', 'tpl', 'total'})
+        self.assertEqual(metrics['db'][1], f'"{len(queries)} queries"')
+
+        total = metrics['total'][0]
+        self.assertGreater(metrics['tpl'][0], 0)
+        self.assertGreater(total, 0)
+        self.assertLessEqual(metrics['db'][0], total)
+        self.assertLessEqual(metrics['tpl'][0], total)
+
+        summary = middleware.metrics()['asset_list']
+        self.assertEqual(summary['count'], 1)
+        self.assertEqual(summary['queries']['max'], len(queries))
+
+    def test_query_budget_warning(self):
+        with override_settings(QUERY_BUDGETS={'asset_list': 1}), self.assertLogs('inventory.middleware', 'WARNING') as logs:
+            self.client.get('/assets/')
+
+        self.assertIn("asset_list ran", logs.output[0])
+
+
+# Typeahead lookups (autocomplete.py)
+class AutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.latitude = Asset.objects.create(name="Latitude 7440", serial_number="DL-100")
+        cls.assigned = Asset.objects.create(name="Latitude 5540", serial_number="DL-200")
+        cls.ecole = Asset.objects.create(name="École laptop", serial_number="EC-1")
+        cls.ada = EntraUser.objects.create(entra_user_id="1", upn="ada@example.com", display_name="Ada Lovelace")
+        cls.alan = EntraUser.objects.create(entra_user_id="2", upn="turing@example.com", display_name="Alan Turing")
+        EntraUser.objects.create(entra_user_id="3", upn="adam@example.com", display_name="Adam Former", is_active=False)
+        Assignment.objects.create(asset=cls.assigned, entra_user=cls.ada, assigned_date=datetime.date(2024, 3, 1))
+
+    def test_assets_by_name_or_serial_prefix(self):
+        self.assertEqual(lookup_assets("LATI"), [self.assigned, self.latitude])
+        self.assertEqual(lookup_assets("dl-1"), [self.latitude])
+        self.assertEqual(lookup_assets("titude"), [])
+        self.assertEqual(lookup_assets("lat", limit=1), [self.assigned])
+
+    def test_available_assets_only(self):
+        self.assertEqual(lookup_assets("lat", available=True), [self.latitude])
+
+    def test_non_ascii_prefix(self):
+        self.assertEqual(lookup_assets("Éc"), [self.ecole])
+        self.assertEqual(lookup_assets("ÉCOLE"), [self.ecole])
+
+    def test_active_users_by_name_or_upn_prefix(self):
+        self.assertEqual(lookup_users("ada"), [self.ada])
+        self.assertEqual(lookup_users("TURING@"), [self.alan])
+        self.assertEqual(lookup_users("a"), [self.ada, self.alan])
+        self.assertEqual(lookup_users("  "), [])
+
+
+# Global search and its index (search.py, admin search)
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entra_user = EntraUser.objects.create(entra_user_id="1", upn="ada@example.com", display_name="Ada Lovelace")
+        cls.assets = [
+            Asset.objects.create(name=f"Latitude {i}", brand="Dell", serial_number=f"SN-00{i}234")
+            for i in range(3)
+        ]
+        cls.assignment = Assignment.objects.create(
+            asset=cls.assets[0], entra_user=cls.entra_user, assigned_date=datetime.date(2024, 3, 1), location="Berlin",
+        )
+
+    def ids(self, model, query):
+        return set(search.matching_ids(model, query))
+
+    def test_terms_match_as_prefixes(self):
+        self.assertEqual(self.ids(Asset, "lati"), {asset.pk for asset in self.assets})
+        self.assertEqual(self.ids(Asset, "dell SN-001"), {self.assets[1].pk})
+        self.assertEqual(self.ids(EntraUser, "love"), {self.entra_user.pk})
+        self.assertEqual(self.ids(Assignment, "berl"), {self.assignment.pk})
+        self.assertEqual(self.ids(Asset, "lenovo"), set())
+
+        results = search.search("ada")
+        self.assertEqual((results['users'], results['assets']), ([self.entra_user], []))
+
+    def test_update_reindexes_the_object(self):
+        asset = Asset.objects.get(pk=self.assets[0].pk)
+        asset.name = "ThinkPad"
+        asset.save()
+
+        self.assertEqual(self.ids(Asset, "thinkp"), {asset.pk})
+        self.assertNotIn(asset.pk, self.ids(Asset, "latitude"))
+
+        # A save of fields the index doesn't read leaves it alone
+        with mock.patch.object(search, 'index_objects') as index_objects:
+            asset.status = Asset.STATUS_MAINTENANCE
+            asset.save(update_fields=['status'])
+        index_objects.assert_not_called()
+
+    def test_delete_removes_the_object(self):
+        self.assets[2].delete()
+
+        self.assertEqual(self.ids(Asset, "lati"), {self.assets[0].pk, self.assets[1].pk})
+        self.assertFalse(SearchDocument.objects.filter(kind='asset', object_id=self.assets[2].pk).exists())
+
+    def test_admin_search(self):
+        request = RequestFactory().get('/admin/')
+        asset_admin = admin.site._registry[Asset]
+        assignment_admin = admin.site._registry[Assignment]
+
+        queryset, may_have_duplicates = asset_admin.get_search_results(request, Asset.objects.all(), "lati")
+        self.assertEqual((queryset.count(), may_have_duplicates), (3, False))
+
+        # Assignments are found through their asset or user too
+        queryset, _ = assignment_admin.get_search_results(request, Assignment.objects.all(), "lovelace")
+        self.assertEqual(list(queryset), [self.assignment])
+
+        # At most search_limit best matches per model
+        with mock.patch.object(asset_admin, 'search_limit', 2):
+            queryset, _ = asset_admin.get_search_results(request, Asset.objects.all(), "lati")
+        self.assertEqual(queryset.count(), 2)
+
+
+# Dashboard counters kept up to date by the signals (counters.py)
+class DashboardCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.entra_user = EntraUser.objects.create(entra_user_id="1", upn="ada@example.com", display_name="Ada")
+        cls.assets = [
+            Asset.objects.create(name=f"Laptop {i}", serial_number=f"SN{i}", location="HQ" if i % 2 else "Lab")
+            for i in range(4)
+        ]
+
+    def assertCountersMatch(self):
+        # Unary + drops the zero counters
+        self.assertEqual(+counters.get_counters(), +counters.compute())
+
+    def assign(self, asset):
+        return Assignment.objects.create(asset=asset, entra_user=self.entra_user, assigned_date=datetime.date(2024, 3, 1))
+
+    def test_assignment_create_and_close(self):
+        assignment = self.assign(self.assets[0])
+        self.assertCountersMatch()
+        self.assertEqual(counters.get_counters()[counters.UNASSIGNED_OPERATIONAL], 3)
+
+        assignment = Assignment.objects.get(pk=assignment.pk)
+        assignment.returned_date = datetime.date(2024, 4, 1)
+        assignment.save()
+        self.assertCountersMatch()
+
+    def test_reassignment_to_another_asset(self):
+        assignment = Assignment.objects.get(pk=self.assign(self.assets[0]).pk)
+        assignment.asset = self.assets[1]
+        assignment.save()
+
+        self.assertCountersMatch()
+        self.assertEqual(counters.get_counters()[counters.UNASSIGNED_OPERATIONAL], 3)
+
+    def test_asset_status_and_location_change(self):
+        self.assign(self.assets[0])
+
+        for asset in [Asset.objects.get(pk=self.assets[0].pk), Asset.objects.get(pk=self.assets[1].pk)]:
+            asset.status = Asset.STATUS_LOST
+            asset.location = "Remote"
+            asset.save()
+            self.assertCountersMatch()
+
+            asset.status = Asset.STATUS_OPERATIONAL
+            asset.save()
+            self.assertCountersMatch()
+
+    def test_asset_delete_cascades_to_its_assignments(self):
+        self.assign(self.assets[0])
+        Asset.objects.get(pk=self.assets[0].pk).delete()
+
+        self.assertCountersMatch()
+        self.assertEqual(counters.get_counters()[counters.TOTAL], 3)
+
+        self.assign(self.assets[1]).delete()
+        self.assertCountersMatch()
+
+
+# Bulk return from the assignment list (ReturnAssignmentsForm, return_assignments)
+class ReturnAssignmentsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.assignments = [
+            Assignment.objects.create(
+                asset=Asset.objects.create(name=f"Laptop {i}", serial_number=f"SN{i}"),
+                assigned_date=datetime.date(2024, 3, i + 1),
+            )
+            for i in range(3)
+        ]
+
+        cls.user = User.objects.create_user('editor')
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_assignment'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, data):
+        response = self.client.post('/assignments/return/', data, follow=True)
+        self.assertEqual(response.redirect_chain, [('/assignments', 302)])
+        return [str(message) for message in response.context['messages']]
+
+    def active_count(self):
+        return Assignment.objects.filter(returned_date__isnull=True).count()
+
+    def test_returns_the_selected_assignments(self):
+        ids = [assignment.pk for assignment in self.assignments[:2]]
+
+        self.assertEqual(self.post({'assignment': ids, 'returned_date': '2024-04-01'}), ["Returned 2 assignment(s)."])
+        self.assertEqual(
+            set(Assignment.objects.filter(pk__in=ids).values_list('returned_date', flat=True)),
+            {datetime.date(2024, 4, 1)},
+        )
+        self.assertEqual(self.active_count(), 1)
+
+    def test_invalid_input_is_reported(self):
+        pk = self.assignments[0].pk
+
+        for data in [
+            {'assignment': [pk], 'returned_date': '2024-13-45'},
+            {'assignment': ['x'], 'returned_date': '2024-04-01'},
+            {'assignment': [0], 'returned_date': '2024-04-01'},
+            {'returned_date': '2024-04-01'},
+            # Before the assigned dates of the 2nd and 3rd assignments
+            {'assignment': [a.pk for a in self.assignments], 'returned_date': '2024-03-01'},
+        ]:
+            with self.subTest(data=data):
+                messages = self.post(data)
+                self.assertEqual(len(messages), 1)
+                self.assertEqual(self.active_count(), 3)
+
+        self.assertIn("2 selected assignment(s) started after 2024-03-01", messages[0])
+
+
+# Chunked asset import (importers.py)
+class ImportAssetsTests(TestCase):
+
+    def rows(self, *serials):
+        return [
+            (row_number, {'name': f"Laptop {serial}", 'serial_number': serial})
+            for row_number, serial in enumerate(serials, start=2)
+        ]
+
+    def import_assets(self, rows, chunk_size):
+        reports = list(importers.import_assets(rows, chunk_size=chunk_size))
+        return sum(report['created'] for report in reports), [error for report in reports for error in report['errors']]
+
+    def test_duplicates_and_existing_serials_are_rejected(self):
+        Asset.objects.create(name="Old", serial_number="OLD")
+
+        created, errors = self.import_assets(self.rows('A', 'OLD', 'B', 'A', ''), chunk_size=2)
+
+        self.assertEqual(created, 2)
+        self.assertEqual([row_number for row_number, _ in errors], [3, 5, 6])
+
+    def test_concurrent_insert_only_rejects_the_conflicting_row(self):
+        # RACE is added after the chunk's serial numbers were checked
+        Asset.objects.create(name="Old", serial_number="OLD")
+        Asset.objects.create(name="Race", serial_number="RACE")
+        existing_serials = importers._existing_serials
+
+        with mock.patch.object(
+            importers, '_existing_serials', side_effect=lambda serials: existing_serials(serials) - {'RACE'},
+        ):
+            created, errors = self.import_assets(self.rows('A', 'OLD', 'RACE', 'A', 'B'), chunk_size=3)
+
+        # The rest of the first chunk (A) is still imported, so its second
+        # row in the next chunk finds it; every rejected row is reported once
+        self.assertEqual(created, 2)
+        self.assertEqual(
+            errors,
+            [
+                (3, "serial_number: An asset with this serial number already exists."),
+                (4, "serial_number: An asset with this serial number already exists."),
+                (5, "serial_number: An asset with this serial number already exists."),
+            ],
+        )
+        self.assertEqual(
+            sorted(Asset.objects.values_list('serial_number', flat=True)), ['A', 'B', 'OLD', 'RACE'],
+        )
+
+
+# Background jobs (jobs.py, run_jobs)
+class JobTests(TestCase):
+
+    def setUp(self):
+        self.enterContext(override_settings(JOB_FILES_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def run_worker(self):
+        call_command('run_jobs', once=True, processes=0, threads=0, keep_days=0, stdout=io.StringIO())
+
+    def test_bad_input_fails_at_once(self):
+        job, _ = jobs.enqueue('import_assets', {'file': 'missing.csv', 'filename': 'assets.csv'})
+
+        with self.assertLogs('inventory.jobs', 'ERROR'):
+            self.run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_FAILED, 1))
+        self.assertIn('JobInputError', jobs.job_status(job)['error'])
+
+    def test_garbled_graph_response_is_retried(self):
+        job, _ = jobs.enqueue('entra_sync')
+
+        with mock.patch('inventory.entra_sync.run_sync', side_effect=json.JSONDecodeError('Expecting value', '<html>', 0)), \
+                self.assertLogs('inventory.jobs', 'ERROR'):
+            self.run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 1))
+
+    def test_inline_jobs_send_heartbeats(self):
+        beat = threading.Event()
+
+        with mock.patch.object(jobs, 'heartbeat', side_effect=lambda job_ids: beat.set()) as heartbeat:
+            with jobs.heartbeats([7], interval=0.01):
+                self.assertTrue(beat.wait(5))
+
+        heartbeat.assert_called_with([7])
+
+    def test_sigterm_queues_the_running_job_again(self):
+        job, _ = jobs.enqueue('entra_sync')
+        handler = signal.getsignal(signal.SIGTERM)
+
+        with mock.patch('inventory.entra_sync.run_sync', side_effect=lambda **kwargs: os.kill(os.getpid(), signal.SIGTERM)):
+            self.run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 0))
+        self.assertIs(signal.getsignal(signal.SIGTERM), handler)
+
+
+# Synthetic inventories (synthetic.py, generate_inventory)
+class GenerateInventoryTests(TestCase):
+
+    def generate(self, **options):
+        call_command('generate_inventory', stdout=io.StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(Asset.objects.order_by('serial_number').values_list('serial_number', 'category', 'purchase_date', 'status')),
+            list(EntraUser.objects.order_by('upn').values_list('upn', 'is_active')),
+            sorted(Assignment.objects.values_list('asset__serial_number', 'entra_user__upn', 'assigned_date', 'returned_date')),
+        )
+
+    def test_same_seed_gives_the_same_data(self):
+        self.generate(assets=40, seed=3)
+        first = self.snapshot()
+
+        self.generate(assets=40, seed=3, clear=True)
+
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual([len(rows) for rows in first], [40, 10, 60])
+
+        self.generate(assets=40, seed=4, clear=True)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_assignment_histories_are_consistent(self):
+        self.generate(assets=60, assignments=200)
+
+        for asset in Asset.objects.prefetch_related('assignments'):
+            history = sorted(asset.assignments.all(), key=lambda assignment: assignment.assigned_date)
+            active = [assignment for assignment in history if assignment.returned_date is None]
+
+            with self.subTest(asset=asset.serial_number):
+                # Only the last assignment of an operational asset stays active
+                self.assertLessEqual(len(active), 1)
+                if active:
+                    self.assertIs(active[0], history[-1])
+                    self.assertEqual(asset.status, Asset.STATUS_OPERATIONAL)
+
+                for previous, following in zip(history, history[1:]):
+                    self.assertLessEqual(previous.assigned_date, previous.returned_date)
+                    self.assertLessEqual(previous.returned_date, following.assigned_date)
+
+    def test_negative_sizes_are_rejected(self):
+        with self.assertRaises(CommandError):
+            self.generate(assets=-1)
+
+
+# View benchmark runner (benchmark_views)
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class BenchmarkViewsTests(TestCase):
+
+    def setUp(self):
+        self.command = BenchmarkViewsCommand(stdout=io.StringIO())
+
+    def test_benchmarked_views_have_their_arguments(self):
+        asset = Asset.objects.create(name="Laptop", serial_number="SN1")
+        user = EntraUser.objects.create(entra_user_id="1", display_name="Ann", upn="ann@example.com")
+        Assignment.objects.create(asset=asset, entra_user=user, assigned_date=datetime.date(2024, 1, 1))
+
+        url_names = [url_name for url_name, _ in view_urls()]
+
+        self.assertIn('asset_details', url_names)
+        self.assertNotIn('job_status', url_names)
+
+    def test_every_view_is_requested(self):
+        self.client.force_login(User.objects.create_superuser('benchmark', 'benchmark@example.com', None))
+
+        run = self.command.run_size(self.client, 30, {'seed': 0, 'repeat': 1})
+
+        self.assertEqual((run['assets'], run['users'], run['assignments']), (30, 7, 45))
+        self.assertEqual([view['url_name'] for view in run['views']], [url_name for url_name, _ in view_urls()])
+        for view in run['views']:
+            with self.subTest(view=view['url_name']):
+                # return_assignments redirects a GET back to the list
+                self.assertLess(view['status'], 400)
+
+    def test_more_queries_than_the_baseline_fail(self):
+        def results(queries):
+            return {'runs': [{'assets': 30, 'views': [
+                {'url_name': 'asset_list', 'queries': queries, 'median_ms': 10.0},
+            ]}]}
+
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = f"{directory}/baseline.json"
+            with open(baseline, 'w') as f:
+                json.dump(results(5), f)
+
+            self.command.compare(results(5), baseline)
+            with self.assertRaisesMessage(CommandError, "asset_list at 30 assets"):
+                self.command.compare(results(6), baseline)
+
+
+# HTTP Basic auth of the JSON API (api.py)
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ApiBasicAuthTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('script', password='s3cret-pass')
+        self.user.user_permissions.add(Permission.objects.get(codename='view_asset'))
+
+    def get(self, password='s3cret-pass'):
+        header = base64.b64encode(f"script:{password}".encode()).decode()
+        return self.client.get('/api/assets/', HTTP_AUTHORIZATION=f"Basic {header}")
+
+    def test_verified_credentials_are_remembered(self):
+        with mock.patch('inventory.api.authenticate', wraps=api.authenticate) as authenticate:
+            self.assertEqual(self.get().status_code, 200)
+            self.assertEqual(self.get().status_code, 200)
+            self.assertEqual(self.get('wrong').status_code, 401)
+
+        self.assertEqual(authenticate.call_count, 2)
+
+    def test_password_change_and_deactivation_apply_at_once(self):
+        self.assertEqual(self.get().status_code, 200)
+
+        self.user.set_password('new-pass')
+        self.user.save()
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get('new-pass').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get('new-pass').status_code, 401)
+
+
+# Group editing of the management page (_update_group_memberships)
+class ManagementGroupsTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin')
+        self.client.force_login(self.admin)
+
+    def test_deleted_users_are_skipped(self):
+        group = Group.objects.create(name="Editors")
+        user = User.objects.create_user('editor')
+
+        response = self.client.post('/management/', {
+            'form_type': 'user_groups',
+            'user_ids': [user.pk, 999999],
+            f'groups_{user.pk}': [group.pk],
+            'groups_999999': [group.pk],
+        }, follow=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(user.groups.all()), [group])
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ["Updated groups of 1 user(s): 1 added, 0 removed.", "Skipped 1 user(s) that no longer exist."],
+        )
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.assets = [
+            Asset.objects.create(name=f"Laptop {i}", serial_number=f"SN{i}", status='Operational')
+            for i in range(3)
+        ]
+        cls.user = User.objects.create_superuser('admin')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def write(self, method, url, payload):
+        return getattr(self.client, method)(url, json.dumps(payload), content_type='application/json')
+
+    def test_fields_selects_the_returned_fields(self):
+        response = self.client.get('/api/assets/', {'fields': 'name,serial_number'})
+        self.assertEqual(response.json()['results'][0], {'id': self.assets[0].pk, 'name': "Laptop 0", 'serial_number': "SN0"})
+
+        response = self.client.get('/api/assets/', {'fields': 'name,notes_secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('notes', response.json()['allowed'])
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get('/api/assets/', {'unassigned': 'true'})
+        etag = response['ETag']
+        self.assertEqual(len(response.json()['results']), 3)
+
+        response = self.client.get('/api/assets/', {'unassigned': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Assigning an asset changes the unassigned list
+        with self.captureOnCommitCallbacks(execute=True):
+            Assignment.objects.create(asset=self.assets[0], assigned_date=datetime.date(2024, 3, 1))
+
+        response = self.client.get('/api/assets/', {'unassigned': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        response = self.write('post', '/api/assets/', [
+            {'name': "Phone", 'serial_number': "SN10", 'status': 'Operational'},
+            {'name': "Phone", 'serial_number': "SN0", 'status': 'Operational'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['errors']), ['1'])
+        self.assertFalse(Asset.objects.filter(serial_number="SN10").exists())
+
+        response = self.write('post', '/api/assets/', [{'name': "Phone", 'serial_number': "SN10", 'status': 'Operational'}])
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_update_checks_the_ids_and_values(self):
+        first, second = self.assets[:2]
+
+        for payload, status in [
+            ([{'id': first.pk, 'name': "Renamed"}, {'name': "No id"}], 400),
+            ([{'id': True, 'name': "Renamed"}], 400),
+            ([{'id': first.pk, 'name': "Renamed"}, {'id': 999999, 'name': "Missing"}], 404),
+            ([{'id': first.pk, 'name': "Renamed"}, {'id': second.pk, 'status': 'Melted'}], 400),
+        ]:
+            with self.subTest(payload=payload):
+                self.assertEqual(self.write('patch', '/api/assets/', payload).status_code, status)
+
+        self.assertEqual(Asset.objects.get(pk=first.pk).name, "Laptop 0")
+
+        response = self.write('patch', '/api/assets/', [{'id': first.pk, 'name': "Renamed"}, {'id': second.pk, 'status': 'Maintenance'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(asset['name'], asset['status']) for asset in response.json()['results']],
+            [("Renamed", 'Operational'), ("Laptop 1", 'Maintenance')],
+        )
+
+
+# Change feed (changelog.py)
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        # Stamp as on backends with concurrent writers
+        self.enterContext(mock.patch.object(changelog, 'connection', mock.Mock(vendor='postgresql')))
+
+    def feed(self, since=0):
+        return [(entry.seq, entry.object_id) for entry in changelog.changes_since(since)]
+
+    def test_entries_are_stamped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            asset = Asset.objects.create(name="Laptop", serial_number="SN1")
+            self.assertIsNone(ChangeLogEntry.objects.get(object_id=asset.pk).seq)
+
+        entry = ChangeLogEntry.objects.get(object_id=asset.pk)
+        self.assertEqual(self.feed(entry.seq - 1), [(entry.seq, asset.pk)])
+
+    def test_entry_committed_late_is_not_skipped(self):
+        first = Asset.objects.create(name="Laptop", serial_number="SN1")
+        second = Asset.objects.create(name="Phone", serial_number="SN2")
+        entries = self.feed()
+        self.assertEqual([object_id for _, object_id in entries], [first.pk, second.pk])
+
+        # A transaction that inserted its entry before the ones read above
+        # commits only now: its lower id comes after them in the feed
+        late_id = ChangeLogEntry.objects.order_by('pk').first().pk - 1
+        ChangeLogEntry.objects.create(pk=late_id, kind='asset', object_id=99, action=ChangeLogEntry.ACTION_UPDATE)
+
+        self.assertEqual(self.feed(entries[-1][0]), [(entries[-1][0] + 1, 99)])
+
+    def test_stamping_survives_a_lost_sequence_row(self):
+        Asset.objects.create(name="Laptop", serial_number="SN1")
+        (last_seq, _), = self.feed()
+        ChangeLogSequence.objects.all().delete()
+
+        Asset.objects.create(name="Phone", serial_number="SN2")
+
+        self.assertEqual([seq for seq, _ in self.feed(last_seq)], [last_seq + 1])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "SQLite stamping")
+    def test_sqlite_writers_stamp_their_ids(self):
+        with mock.patch.object(changelog, 'connection', connection):
+            asset = Asset.objects.create(name="Laptop", serial_number="SN1")
+
+        entry = ChangeLogEntry.objects.get(object_id=asset.pk)
+        self.assertEqual(entry.seq, entry.pk)
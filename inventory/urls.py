@@ -1,20 +1,35 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('assets/', views.asset_list, name='asset_list'),
     path('assignments', views.assignment_list, name='assignment_list'),
+    path('assignments/history/', views.assignment_history, name='assignment_history'),
+    path('assets/export/', views.export_assets, name='export_assets'),
+    path('assignments/export/', views.export_assignments, name='export_assignments'),
     path('assets/<int:asset_id>/', views.asset_details, name='asset_details'),
     path('users/<int:user_id>/assignments/', views.user_assignments, name='user_assignments'),
     path('users/', views.user_list, name='user_list'),
+    path('users/sync/', views.sync_now, name='sync_now'),
     path('assets/add/', views.create_asset, name='create_asset'),
+    path('assets/import/', views.import_assets, name='import_assets'),
     path('assets/<int:asset_id>/edit/', views.edit_asset, name='edit_asset'),
     path('assignments/add/', views.create_assignment, name='create_assignment'),
     path('assignments/<int:assignment_id>/edit/', views.edit_assignment, name='edit_assignment'),
+    path('assignments/return/', views.return_assignments, name='return_assignments'),
     path('login/', views.ms_login, name='ms_login'),
     path('callback/', views.ms_callback, name='ms_callback'),
     path('logout/', views.ms_logout, name='ms_logout'),
     path('', views.home, name='home'),
+    path('search/', views.search_view, name='search'),
+    path('autocomplete/assets/', views.autocomplete_assets, name='autocomplete_assets'),
+    path('autocomplete/users/', views.autocomplete_users, name='autocomplete_users'),
     path('assets/<int:asset_id>/delete/', views.asset_delete, name='asset_confirm_delete'),
     path('management/', views.management, name='management'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+    path('metrics/', views.request_metrics, name='request_metrics'),
+    path('api/changes/', api.change_feed, name='api_changes'),
+    path('api/<slug:resource>/', api.resource_list, name='api_list'),
+    path('api/<slug:resource>/<int:pk>/', api.resource_detail, name='api_detail'),
 ]
@@ -1,31 +1,58 @@
 from django.shortcuts import render, get_object_or_404, redirect, HttpResponse
-from .models import Asset, Assignment, EntraUser, OSOption
-from .forms import AssetForm, AssignmentForm, AssignmentEditForm
-import msal
+from django.db import transaction
+from django.urls import reverse
+from .models import Asset, Assignment, EntraUser, Job, OSOption
+from .forms import AssetForm, AssignmentForm, AssignmentEditForm, ReturnAssignmentsForm
 from django.conf import settings
 from django.contrib.auth import login, logout as django_logout
 from django.contrib.auth.models import User, Group, Permission
-import requests
 from django.contrib.auth.decorators import permission_required, login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.html import format_html
+from django.utils import timezone
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from asgiref.sync import sync_to_async
+from .pagination import paginate_keyset
+from .streaming import ROWS_PLACEHOLDER, stream_rows
+from .graph_client import GRAPH_URL, login_client
+from .msal_client import get_msal_app
+from .filters import (
+    ASSET_FILTER_PARAMS, ASSIGNMENT_FILTER_PARAMS, USER_FILTER_PARAMS,
+    filter_assets, filter_assignments, filter_users,
+)
+from .facets import get_facets
+from .sorting import apply_sort, order_queryset
+from . import autocomplete, counters, exports, history, importers, jobs, middleware, search
 
 # All assets page
 def asset_list(request):
     """
     Display a list of all assets with basic info.
     """
-    # Prepare options for filter checkboxes
+    # Prepare options (with match counts) for filter checkboxes
+    facets = get_facets(
+        'assets', Asset.objects.all(), request.GET, filter_assets, ASSET_FILTER_PARAMS,
+        {'status': 'status', 'category': 'category', 'brand': 'brand', 'location': 'location'},
+        depends_on=[Assignment],
+    )
+    status_counts = dict(facets['status'])
     status_options = [
-        Asset.STATUS_OPERATIONAL, 
-        Asset.STATUS_MAINTENANCE,
-        Asset.STATUS_DECOMMISSIONED, 
-        Asset.STATUS_LOST,
-        Asset.STATUS_PENDING, 
-        Asset.STATUS_RESERVED
+        (status, status_counts.get(status, 0))
+        for status in [
+            Asset.STATUS_OPERATIONAL,
+            Asset.STATUS_MAINTENANCE,
+            Asset.STATUS_DECOMMISSIONED,
+            Asset.STATUS_LOST,
+            Asset.STATUS_PENDING,
+            Asset.STATUS_RESERVED
+        ]
     ]
-    category_options = Asset.objects.values_list('category', flat=True).distinct()
-    brand_options = Asset.objects.values_list('brand', flat=True).distinct()
-    location_options = Asset.objects.values_list('location', flat=True).distinct()
+    category_options = facets['category']
+    brand_options = facets['brand']
+    location_options = facets['location']
 
     # Get filter values from GET parameters (from submitted form)
     selected_statuses = request.GET.getlist('status')
@@ -34,45 +61,15 @@ def asset_list(request):
     selected_locations = request.GET.getlist('location')
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
-    unassigned_only = request.GET.get('unassigned')
-
-    # Construct the query (adding filters (if any selected) consecutively)
-    assets = Asset.objects.all().order_by('name')
-
-    # Apply "available" filter (status=Operational and unassigned)
-    if unassigned_only == "true":
-        assets = assets.exclude(assignments__returned_date__isnull=True)
-
-    # Apply status filter
-    if selected_statuses:
-        assets = assets.filter(status__in=selected_statuses)
-    
-    # Apply category filter
-    if selected_categories:
-        assets = assets.filter(category__in=selected_categories)
 
-    # Apply brand filter
-    if selected_brands:
-        assets = assets.filter(brand__in=selected_brands)
+    # Construct the query with the selected filters
+    # Current assignments are prefetched for the whole page (no per-row queries)
+    assets = filter_assets(Asset.objects.with_current_assignment(), request.GET)
 
-    # Apply location filter
-    if selected_locations:
-        assets = assets.filter(location__in=selected_locations)
-
-    # Filter by purchase date range if provided
-    if start_date:
-        assets = assets.filter(purchase_date__gte=start_date)
-    if end_date:
-        assets = assets.filter(purchase_date__lte=end_date)
-
-    # Get sort field from GET parameters, default to 'name'
-    sort_field = request.GET.get('sort', 'name')
-
-    # Apply sorting to the assets queryset
-    assets = assets.order_by(sort_field)
+    # Get the sort from GET parameters (allowed keys only), default to 'name'
+    assets, sort_key, sort_field = apply_sort('assets', assets, request.GET)
 
     context = {
-        'assets': assets,
         'status_options': status_options,
         'category_options': category_options,
         'brand_options': brand_options,
@@ -83,9 +80,22 @@ def asset_list(request):
         'selected_locations': selected_locations,
         'start_date': start_date,
         'end_date': end_date,
-        'sort_field': sort_field,
+        'sort_field': sort_key,
+        'export_query': exports.export_query(request.GET),
     }
 
+    # "Show all" streams every row in chunks instead of building one big page
+    if request.GET.get('stream') == '1':
+        return stream_rows(
+            request, 'inventory/asset_list.html', context,
+            'inventory/partials/asset_rows.html', 'assets', order_queryset(assets, sort_field)
+        )
+
+    # Apply sorting and cursor pagination to the assets queryset
+    page = paginate_keyset(assets, sort_field, request)
+    context['assets'] = page.object_list
+    context['page'] = page
+
     return render(request, 'inventory/asset_list.html', context)
 
 # All assignments page
@@ -93,8 +103,12 @@ def assignment_list(request):
     """
     Display a list of all assignments, active and historical.
     """
-    # Prepare options for assignment filters
-    locations = Assignment.objects.values_list("location", flat=True).distinct()
+    # Prepare options (with match counts) for assignment filters
+    facets = get_facets(
+        'assignments', Assignment.objects.all(), request.GET, filter_assignments,
+        ASSIGNMENT_FILTER_PARAMS, {'location': 'location'},
+    )
+    locations = facets['location']
 
     # Get filter values from GET parameters (from submitted form)
     status_filter = request.GET.get("status")
@@ -104,37 +118,13 @@ def assignment_list(request):
     returned_start = request.GET.get("returned_start")
     returned_end = request.GET.get("returned_end")
 
-    # Construct the query (adding filters (if any selected) consecutively)
-    assignments = Assignment.objects.select_related('asset', 'entra_user').order_by('-assigned_date')
-
-    # Apply filters if provided
-    if status_filter:
-        if status_filter == "active":
-            assignments = assignments.filter(returned_date__isnull=True)
-        elif status_filter == "returned":
-            assignments = assignments.filter(returned_date__isnull=False)
-
-    if location_filter:
-        assignments = assignments.filter(location__in=location_filter)
+    # Construct the query with the selected filters
+    assignments = filter_assignments(Assignment.objects.select_related('asset', 'entra_user'), request.GET)
 
-    if assigned_start:
-        assignments = assignments.filter(assigned_date__gte=assigned_start)
-    if assigned_end:
-        assignments = assignments.filter(assigned_date__lte=assigned_end)
+    # Get the sort from GET parameters (allowed keys only), default to '-assigned_date' (newest first)
+    assignments, sort_key, sort_field = apply_sort('assignments', assignments, request.GET)
 
-    if returned_start:
-        assignments = assignments.filter(returned_date__gte=returned_start)
-    if returned_end:
-        assignments = assignments.filter(returned_date__lte=returned_end)
-    
-    # Get sort field from GET parameters, default to '-assigned_date' (newest first)
-    sort_field = request.GET.get('sort', '-assigned_date')
-
-    # Apply sorting
-    assignments = assignments.order_by(sort_field)
-    
     context = {
-    'assignments': assignments,
     'locations': locations,
     'status_filter': status_filter,
     'location_filter': location_filter,
@@ -142,31 +132,124 @@ def assignment_list(request):
     'assigned_end': assigned_end,
     'returned_start': returned_start,
     'returned_end': returned_end,
-    'sort_field': sort_field,
+    'sort_field': sort_key,
+    'export_query': exports.export_query(request.GET),
     }
 
+    # "Show all" streams every row in chunks instead of building one big page
+    if request.GET.get('stream') == '1':
+        return stream_rows(
+            request, 'inventory/assignment_list.html', context,
+            'inventory/partials/assignment_rows.html', 'assignments', order_queryset(assignments, sort_field)
+        )
+
+    # Apply sorting and cursor pagination
+    page = paginate_keyset(assignments, sort_field, request)
+    context['assignments'] = page.object_list
+    context['page'] = page
+
     return render(request, 'inventory/assignment_list.html', context)
 
+# Point-in-time assignment history page ("who had what when")
+def assignment_history(request):
+    """
+    Display the assignments active on a date (?as_of=, today by default) or
+    during a period (?start= / ?end=), optionally of one asset (?serial=)
+    and/or one Entra user (?upn=).
+    """
+    as_of = history.parse_day(request.GET.get('as_of'))
+    start = history.parse_day(request.GET.get('start'))
+    end = history.parse_day(request.GET.get('end'))
+    serial = request.GET.get('serial', '').strip()
+    upn = request.GET.get('upn', '').strip()
+
+    # A period needs one bound at least; the other defaults to the same day
+    if start or end:
+        start, end = start or end, end or start
+    else:
+        start = end = as_of = as_of or timezone.localdate()
+
+    errors = []
+    asset = entra_user = None
+
+    if serial:
+        asset = Asset.objects.filter(serial_number=serial).first()
+        if asset is None:
+            errors.append(f"No asset with serial number {serial}.")
+    if upn:
+        entra_user = EntraUser.objects.filter(upn__iexact=upn).first()
+        if entra_user is None:
+            errors.append(f"No user with UPN {upn}.")
+
+    context = {
+        'as_of': as_of if start == end else None,
+        'start': start,
+        'end': end,
+        'serial': serial,
+        'upn': upn,
+        'errors': errors,
+    }
+
+    if not errors:
+        assignments = history.assignments_between(start, end, asset=asset, entra_user=entra_user)
+        page = paginate_keyset(assignments, '-assigned_date', request)
+        context['assignments'] = page.object_list
+        context['page'] = page
+        context['total'] = history.count_between(start, end, asset=asset, entra_user=entra_user)
+
+    return render(request, 'inventory/assignment_history.html', context)
+
+# Assets export (CSV/JSON)
+@login_required
+def export_assets(request):
+    """
+    Streams every asset matching the asset_list filters, with its current
+    user and location, as a CSV (default) or JSON (?format=json) download.
+    """
+    assets, _, sort_field = apply_sort('assets', filter_assets(Asset.objects.all(), request.GET), request.GET)
+
+    return exports.export_response(
+        'assets', exports.ASSET_COLUMNS, exports.asset_export_rows(order_queryset(assets, sort_field)),
+        request.GET.get('format', 'csv'),
+    )
+
+# Assignments export (CSV/JSON)
+@login_required
+def export_assignments(request):
+    """
+    Streams the assignment history matching the assignment_list filters as
+    a CSV (default) or JSON (?format=json) download.
+    """
+    assignments, _, sort_field = apply_sort(
+        'assignments', filter_assignments(Assignment.objects.all(), request.GET), request.GET
+    )
+
+    return exports.export_response(
+        'assignments', exports.ASSIGNMENT_COLUMNS,
+        exports.assignment_export_rows(order_queryset(assignments, sort_field)),
+        request.GET.get('format', 'csv'),
+    )
+
 # Single asset details & assignments page
 def asset_details(request, asset_id):
     """
     Display details for a single asset, including current and past assignments.
     """
-    asset = get_object_or_404(Asset, id=asset_id)
-    active_assignment = asset.assignments.filter(returned_date__isnull=True).first()
-    assignments = asset.assignments.select_related('entra_user').order_by('-assigned_date')
+    asset = get_object_or_404(Asset.objects.with_current_assignment(), id=asset_id)
+    active_assignment = asset.get_active_assignment()
+    assignments = asset.assignments.select_related('entra_user')
 
-    # Get sort field from GET parameters, default to '-assigned_date' (newest first)
-    sort_field = request.GET.get('sort', '-assigned_date')
+    # Get the sort from GET parameters (allowed keys only), default to '-assigned_date' (newest first)
+    assignments, sort_key, sort_field = apply_sort('assignments', assignments, request.GET)
 
     # Apply sorting
-    assignments = assignments.order_by(sort_field)
+    assignments = order_queryset(assignments, sort_field)
 
     context = {
         'asset': asset,
         'assignments': assignments,
         'active_assignment': active_assignment,
-        'sort_field': sort_field,
+        'sort_field': sort_key,
     }
     
     return render(request, 'inventory/asset_details.html', context)
@@ -177,18 +260,18 @@ def user_assignments(request, user_id):
     Display all assignments for a single user.
     """
     user = get_object_or_404(EntraUser, id=user_id)
-    assignments = user.user_assignments.select_related('asset').order_by('-assigned_date')
+    assignments = user.user_assignments.select_related('asset')
 
-    # Get sort field from GET parameters, default to '-assigned_date' (newest first)
-    sort_field = request.GET.get('sort', '-assigned_date')
+    # Get the sort from GET parameters (allowed keys only), default to '-assigned_date' (newest first)
+    assignments, sort_key, sort_field = apply_sort('assignments', assignments, request.GET)
 
     # Apply sorting
-    assignments = assignments.order_by(sort_field)
+    assignments = order_queryset(assignments, sort_field)
 
     context = {
         'user': user,
         'assignments': assignments,
-        'sort_field': sort_field,
+        'sort_field': sort_key,
     }
 
     return render(request, 'inventory/user_assignments.html', context)
@@ -198,40 +281,42 @@ def user_list(request):
     """
     Display a read-only list of all Entra users.
     """
-    # Prepare options for filters
-    departments = EntraUser.objects.values_list('department', flat=True).distinct()
+    # Prepare options (with match counts) for filters
+    facets = get_facets(
+        'users', EntraUser.objects.all(), request.GET, filter_users,
+        USER_FILTER_PARAMS, {'department': 'department'},
+    )
+    departments = facets['department']
 
     # Get filter values from GET parameters
     department_filter = request.GET.getlist('department')
     is_active_filter = request.GET.get('is_active', 'all')
 
-    # Construct the query (adding filters (if any selected) consecutively)
-    users = EntraUser.objects.all()
-
-    # Apply department filter
-    if department_filter:
-        users = users.filter(department__in=department_filter)
-
-    # Apply is_active filter
-    if is_active_filter == 'true':
-        users = users.filter(is_active=True)
-    elif is_active_filter == 'false':
-        users = users.filter(is_active=False)
-    
-    # Get sort field from GET parameters, default to 'display_name'
-    sort_field = request.GET.get('sort', 'display_name')
+    # Construct the query with the selected filters
+    users = filter_users(EntraUser.objects.all(), request.GET)
 
-    # Apply sorting
-    users = users.order_by(sort_field)
+    # Get the sort from GET parameters (allowed keys only), default to 'display_name'
+    users, sort_key, sort_field = apply_sort('users', users, request.GET)
 
     context = {
-        'users': users,
         'departments': departments,
         'department_filter': department_filter,
         'is_active_filter': is_active_filter,
-        'sort_field': sort_field,
+        'sort_field': sort_key,
     }
 
+    # "Show all" streams every row in chunks instead of building one big page
+    if request.GET.get('stream') == '1':
+        return stream_rows(
+            request, 'inventory/user_list.html', context,
+            'inventory/partials/user_rows.html', 'users', order_queryset(users, sort_field)
+        )
+
+    # Apply sorting and cursor pagination
+    page = paginate_keyset(users, sort_field, request)
+    context['users'] = page.object_list
+    context['page'] = page
+
     return render(request, 'inventory/user_list.html', context)
 
 # Add an asset form page
@@ -255,6 +340,44 @@ def create_asset(request):
     
     return render(request, 'inventory/asset_form.html', {'form': form})
 
+# Bulk asset import page
+@permission_required('inventory.add_asset', raise_exception=True)
+def import_assets(request):
+    """
+    Imports assets from an uploaded CSV or XLSX file.
+
+    GET: Displays the upload form.
+    POST: Streams the import progress and the rejected rows while the file
+    is imported chunk by chunk (see importers.py).
+    """
+    if request.method == "POST" and request.FILES.get('file'):
+        upload = request.FILES['file']
+        context = {'filename': upload.name}
+
+        page = render_to_string('inventory/asset_import.html', {**context, 'stream': True}, request)
+        head, tail = page.split(ROWS_PLACEHOLDER, 1)
+
+        def generate():
+            yield head
+
+            created = rejected = 0
+            try:
+                for report in importers.import_assets(importers.iter_rows(upload, upload.name)):
+                    created += report['created']
+                    rejected += len(report['errors'])
+                    yield render_to_string('inventory/partials/import_progress.html', {
+                        'report': report, 'created': created, 'rejected': rejected,
+                    })
+            except ValueError as error:
+                yield format_html('<li class="text-danger">{}</li>', error)
+
+            yield format_html('<li class="fw-bold">Done: {} assets created, {} rows rejected.</li>', created, rejected)
+            yield tail
+
+        return StreamingHttpResponse(generate())
+
+    return render(request, 'inventory/asset_import.html', {'formats': importers.IMPORT_FORMATS})
+
 # Edit an asset form page
 @permission_required('inventory.change_asset', raise_exception=True)
 def edit_asset(request, asset_id):
@@ -299,7 +422,7 @@ def edit_assignment(request, assignment_id):
     """
     Edit an existing assignment (limited fields for historical integrity).
     """
-    assignment = get_object_or_404(Assignment, id=assignment_id)
+    assignment = get_object_or_404(Assignment.objects.select_related('asset'), id=assignment_id)
 
     if request.method == "POST":
         form = AssignmentEditForm(request.POST, instance=assignment)
@@ -312,14 +435,38 @@ def edit_assignment(request, assignment_id):
 
     return render(request, 'inventory/create_assignment.html', {'form': form, 'edit': True})
 
+# Bulk return of assignments
+@permission_required('inventory.change_assignment', raise_exception=True)
+def return_assignments(request):
+    """
+    Close the selected active assignments (their assets go to Maintenance).
+    """
+    if request.method == "POST":
+        form = ReturnAssignmentsForm(request.POST)
+
+        if form.is_valid():
+            returned = form.cleaned_data['assignment'].mark_returned(form.cleaned_data['returned_date'])
+
+            if returned:
+                messages.success(request, f"Returned {returned} assignment(s).")
+            else:
+                messages.warning(request, "No active assignments selected.")
+        else:
+            for errors in form.errors.values():
+                for error in errors:
+                    messages.error(request, error)
+
+    # Back to the same filtered list, if it is a local URL
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+
+    return redirect('assignment_list')
+
 # SSO login logic
 def ms_login(request):
-    # Create an MSAL Confidential Client
-    msal_app = msal.ConfidentialClientApplication(
-        client_id=settings.MICROSOFT_CLIENT_ID,
-        authority=f"https://login.microsoftonline.com/{settings.MICROSOFT_TENANT_ID}",
-        client_credential=settings.MICROSOFT_CLIENT_SECRET,
-    )
+    # Reuse the process-wide MSAL Confidential Client
+    msal_app = get_msal_app()
 
     # Build the auth URL
     auth_url = msal_app.get_authorization_request_url(
@@ -336,12 +483,8 @@ def ms_callback(request):
     if not code:
         return render(request, "login_error.html", {"message": "No code returned from Microsoft."})
 
-    # Create MSAL client
-    msal_app = msal.ConfidentialClientApplication(
-        client_id=settings.MICROSOFT_CLIENT_ID,
-        authority=f"https://login.microsoftonline.com/{settings.MICROSOFT_TENANT_ID}",
-        client_credential=settings.MICROSOFT_CLIENT_SECRET,
-    )
+    # Reuse the process-wide MSAL client
+    msal_app = get_msal_app()
 
     # Exchange the code for tokens
     token_result = msal_app.acquire_token_by_authorization_code(
@@ -354,11 +497,15 @@ def ms_callback(request):
         return HttpResponse("Could not acquire token from Microsoft. Please try again.", status=400)
 
     # Use access token to get user profile from Microsoft Graph
-    graph_response = requests.get(
-        "https://graph.microsoft.com/v1.0/me",
+    graph_response = login_client.get(
+        f"{GRAPH_URL}/v1.0/me",
         headers={"Authorization": f"Bearer {token_result['access_token']}"}
     )
 
+    # Throttled or failing after the short retry budget of the login client
+    if not graph_response.ok:
+        return HttpResponse("Could not read your Microsoft profile. Please try again.", status=502)
+
     user_data = graph_response.json()
 
     # Get email and name
@@ -388,25 +535,105 @@ def ms_logout(request):
 
 # Home/Dashboard page
 def home(request):
+    # KPIs and breakdowns come from the maintained counters (see counters.py)
+    # instead of aggregating the asset and assignment tables on every hit
+    dashboard = counters.get_dashboard()
 
-    total_assets = Asset.objects.count()
-    unassigned_operational = Asset.objects.filter(
-        status='Operational'
-    ).exclude(
-        assignments__returned_date__isnull=True
-    ).count()
-    need_work = Asset.objects.filter(
-        status__in=[Asset.STATUS_MAINTENANCE, Asset.STATUS_PENDING]
-    ).count()
-    
     context = {
-        'total_assets': total_assets,
-        'unassigned_operational': unassigned_operational,
-        'need_work': need_work
+        'total_assets': dashboard['total_assets'],
+        'unassigned_operational': dashboard['unassigned_operational'],
+        'need_work': dashboard['need_work'],
+        'status_counts': dashboard['statuses'],
+        'location_counts': dashboard['locations'],
     }
 
     return render(request, 'inventory/home.html', context)
 
+# Autocomplete endpoints (JSON) of the assignment form widgets
+@login_required
+def autocomplete_assets(request):
+    """
+    Assets whose name or serial number starts with ?q=; ?available=1 leaves
+    out assets that are currently assigned.
+    """
+    assets = autocomplete.lookup_assets(request.GET.get('q', ''), available=request.GET.get('available') == '1')
+    return JsonResponse({'results': [{'id': asset.pk, 'text': str(asset)} for asset in assets]})
+
+@login_required
+def autocomplete_users(request):
+    """
+    Active Entra users whose display name or UPN starts with ?q=.
+    """
+    users = autocomplete.lookup_users(request.GET.get('q', ''))
+    return JsonResponse({'results': [{'id': user.pk, 'text': str(user)} for user in users]})
+
+# On-demand Entra user sync (JSON)
+@permission_required('inventory.change_entrauser', raise_exception=True)
+async def sync_now(request):
+    """
+    POST queues an Entra user sync job (full=1 for a full one) for the
+    run_jobs worker and returns at once (202, or 409 while one is queued or
+    running); GET reports on the pending or last sync job.
+    """
+    if request.method == "POST":
+        job, created = await sync_to_async(jobs.enqueue)(
+            'entra_sync', {'full': request.POST.get('full') == '1'}, await request.auser(), unique=True,
+        )
+        return JsonResponse(jobs.job_status(job), status=202 if created else 409)
+
+    job = await Job.objects.filter(kind='entra_sync').order_by('-pk').afirst()
+    return JsonResponse(jobs.job_status(job) if job else {'status': None})
+
+def _get_job(request, job_id):
+    """
+    Returns the job job_id if the user may see it (managers see every job,
+    others their own), else raises Http404.
+    """
+    visible = Job.objects.all()
+    if not request.user.has_perm('auth.change_user'):
+        visible = visible.filter(created_by=request.user)
+
+    return get_object_or_404(visible, id=job_id)
+
+# Background job status (JSON, polled by the management page)
+@login_required
+def job_status(request, job_id):
+    """
+    Returns the status, progress and result of a background job.
+    """
+    return JsonResponse(jobs.job_status(_get_job(request, job_id)))
+
+# File written by a background job (exports)
+@login_required
+def job_download(request, job_id):
+    job = _get_job(request, job_id)
+    path = jobs.job_files_dir() / job.output_file
+
+    if job.status != Job.STATUS_SUCCEEDED or not job.output_file or not path.exists():
+        raise Http404("This job has no file to download.")
+
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result.get('filename', job.output_file))
+
+# Per-view timing metrics (JSON)
+@staff_member_required
+def request_metrics(request):
+    """
+    Returns the query count, DB time, template time and latency percentiles
+    of the recent requests of each view, recorded by RequestTimingMiddleware.
+    """
+    return JsonResponse({'window_size': middleware.WINDOW_SIZE, 'views': middleware.metrics()})
+
+# Global search page
+@login_required
+def search_view(request):
+    """
+    Search assets, users and assignments (every word is a prefix).
+    """
+    query = request.GET.get('q', '').strip()
+    results = search.search(query) if query else {}
+
+    return render(request, 'inventory/search.html', {'query': query, 'results': results})
+
 # Delete asset confirmation page
 @permission_required('inventory.delete_asset', raise_exception=True)
 def asset_delete(request, asset_id):
@@ -422,25 +649,35 @@ def asset_delete(request, asset_id):
 @login_required
 @permission_required('auth.change_user', raise_exception=True)
 def management(request):
-    users = User.objects.all().order_by('username')
-    groups = Group.objects.all()
+    users = User.objects.all()
+    groups = list(Group.objects.all().order_by('name'))
     os_options = OSOption.objects.all().order_by('name')
 
     if request.method == 'POST':
         form_type = request.POST.get('form_type')
 
-        # If user groups edit is submitted
+        # If user groups edit is submitted (every user of the page at once)
         if form_type == 'user_groups':
-            
-            user_id = request.POST.get('user_id')
-            selected_groups = request.POST.getlist('groups')
-            try:
-                user = User.objects.get(id=user_id)
-                user.groups.set(Group.objects.filter(name__in=selected_groups))
-                messages.success(request, f"Updated groups for {user.username}.")
 
-            except User.DoesNotExist:
-                messages.error(request, "User not found.")
+            posted_ids = [int(user_id) for user_id in request.POST.getlist('user_ids') if user_id.isdigit()]
+            # Users deleted since the page was rendered are left out
+            user_ids = list(User.objects.filter(pk__in=posted_ids).values_list('pk', flat=True))
+            group_ids = {group.id for group in groups}
+            selected = {
+                (user_id, int(group_id))
+                for user_id in user_ids
+                for group_id in request.POST.getlist(f'groups_{user_id}')
+                if group_id.isdigit() and int(group_id) in group_ids
+            }
+
+            added, removed = _update_group_memberships(user_ids, selected)
+            messages.success(request, f"Updated groups of {len(user_ids)} user(s): {added} added, {removed} removed.")
+            if len(user_ids) < len(set(posted_ids)):
+                messages.warning(request, f"Skipped {len(set(posted_ids)) - len(user_ids)} user(s) that no longer exist.")
+
+            # Back to the same page of users
+            if request.POST.get('cursor'):
+                return redirect(f"{reverse('management')}?cursor={request.POST['cursor']}")
 
         # if OS options edit is submitted
         elif form_type == 'os_options':
@@ -463,12 +700,105 @@ def management(request):
                 except OSOption.DoesNotExist:
                     messages.error(request, "OS option not found.")
 
+        # If a background job is queued (sync, import or export)
+        elif form_type == 'job':
+            _queue_job(request)
+
+        # If a failed job is retried
+        elif form_type == 'job_retry':
+            job_id = request.POST.get('job_id', '')
+            job = Job.objects.filter(id=job_id).first() if job_id.isdigit() else None
+
+            if job is not None and jobs.retry(job):
+                messages.success(request, f"Queued job #{job.pk} again.")
+            else:
+                messages.error(request, "Only failed jobs can be retried.")
+
         return redirect('management')
 
+    # One page of users, with their group ids from one membership query
+    page = paginate_keyset(users, 'username', request)
+    memberships = User.groups.through.objects.filter(
+        user_id__in=[user.id for user in page.object_list]
+    ).values_list('user_id', 'group_id')
+
+    group_ids = {}
+    for user_id, group_id in memberships:
+        group_ids.setdefault(user_id, set()).add(group_id)
+
+    for user in page.object_list:
+        user.group_ids = group_ids.get(user.id, set())
+
     context = {
-        'users': users,
+        'users': page.object_list,
+        'page': page,
         'groups': groups,
-        'os_options': os_options
+        'os_options': os_options,
+        # Latest background jobs, polled by jobs.js while unfinished
+        'recent_jobs': [jobs.job_status(job) for job in Job.objects.order_by('-pk')[:20]],
+        'import_formats': importers.IMPORT_FORMATS,
+        'export_formats': exports.EXPORT_FORMATS,
     }
     
     return render(request, 'inventory/management.html', context)
+
+def _queue_job(request):
+    """
+    Queues the background job of the management page job forms: Entra
+    sync (full), asset import (file) or export (resource, format), if the
+    user may run it. Reports the outcome in a message.
+    """
+    kind = request.POST.get('kind')
+
+    if kind not in jobs.JOB_KINDS or not request.user.has_perm(jobs.JOB_KINDS[kind]['permission']):
+        messages.error(request, "You can't run this job.")
+        return
+
+    if kind == 'entra_sync':
+        params = {'full': request.POST.get('full') == '1'}
+
+    elif kind == 'import_assets':
+        upload = request.FILES.get('file')
+        if upload is None or not upload.name.lower().endswith(tuple(importers.IMPORT_FORMATS)):
+            messages.error(request, f"Choose a file to import ({', '.join(importers.IMPORT_FORMATS)}).")
+            return
+        params = {'file': jobs.save_upload(upload), 'filename': upload.name}
+
+    else:
+        if request.POST.get('resource') not in jobs.EXPORT_RESOURCES:
+            messages.error(request, "Unknown export.")
+            return
+        params = {key: request.POST.get(key, '') for key in ['resource', 'format', 'query']}
+
+    job, created = jobs.enqueue(kind, params, request.user, unique=kind == 'entra_sync')
+    label = jobs.JOB_KINDS[kind]['label']
+
+    if created:
+        messages.success(request, f"Queued {label.lower()} job #{job.pk}.")
+    else:
+        messages.warning(request, f"{label} job #{job.pk} is already {job.status}.")
+
+def _update_group_memberships(user_ids, selected):
+    """
+    Makes the group memberships of user_ids exactly the (user_id, group_id)
+    pairs in selected, with one query for the current memberships, one
+    DELETE and one INSERT, in one transaction.
+    Returns the number of memberships added and removed.
+    """
+    Membership = User.groups.through
+
+    with transaction.atomic():
+        current = {
+            (user_id, group_id): pk
+            for pk, user_id, group_id in Membership.objects.filter(
+                user_id__in=user_ids
+            ).values_list('pk', 'user_id', 'group_id')
+        }
+
+        to_remove = [pk for pair, pk in current.items() if pair not in selected]
+        to_add = [Membership(user_id=user_id, group_id=group_id) for user_id, group_id in selected - current.keys()]
+
+        Membership.objects.filter(pk__in=to_remove).delete()
+        Membership.objects.bulk_create(to_add)
+
+    return len(to_add), len(to_remove)
@@ -0,0 +1,42 @@
+from django import forms
+from django.urls import reverse
+
+# <select> that only renders its selected option instead of every row of
+# its queryset; other options are fetched while typing from a JSON
+# autocomplete endpoint (see autocomplete.js). The form field still
+# validates the submitted primary key against its queryset.
+class AutocompleteSelect(forms.Select):
+
+    class Media:
+        js = ['inventory/js/autocomplete.js']
+
+    def __init__(self, url_name, attrs=None, query=''):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.query = query
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        url = reverse(self.url_name)
+        context['widget']['attrs']['data-autocomplete-url'] = f"{url}?{self.query}" if self.query else url
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        """
+        Only the empty option and the selected object (one query by pk).
+        """
+        selected = [str(v) for v in value if v not in (None, '')]
+        options = [self.create_option(name, '', '---------', not selected, 0)]
+
+        queryset = getattr(self.choices, 'queryset', None)
+        if selected and queryset is not None:
+            try:
+                objects = list(queryset.filter(pk__in=selected))
+            except (ValueError, TypeError):
+                # Malformed submitted value, reported by the form field
+                objects = []
+
+            for index, obj in enumerate(objects, start=1):
+                options.append(self.create_option(name, obj.pk, str(obj), True, index))
+
+        return [(None, options, 0)]